@@ -0,0 +1,138 @@
+/*
+ * Minimal stand-in for jQuery + DataTables (server-side processing) used by
+ * the mock sharesansar pages. Only the API the scrapers call is provided:
+ *   jQuery('#id').DataTable()  .page(n)  .page.len(n)  .page.info()
+ *   .draw()  .one('draw.dt', fn)  .ajax.url()  .settings()  jQuery.fn.dataTable.isDataTable('#id')
+ * plus the length <select> and the Previous/Next links.
+ *
+ * A table is registered as a DataTable only after its first draw, like a real
+ * ajax DataTable that is not usable before the first response arrives.
+ */
+(function () {
+    var tables = {};   // drawn at least once (isDataTable)
+    var pending = {};  // created, first draw still in flight
+
+    function Table(el) {
+        var self = this;
+        this.el = el;
+        this.id = el.id;
+        this.source = el.getAttribute('data-source');
+        this.length = parseInt(el.getAttribute('data-page-length') || '20', 10);
+        this.pageIndex = 0;
+        this.recordsTotal = 0;
+        this.recordsDisplay = 0;
+        this.params = {};
+        this.handlers = [];
+        this.drawCounter = 0;
+
+        this.page = function (n) {
+            if (n === undefined) { return self.pageIndex; }
+            self.pageIndex = n === 'next' ? self.pageIndex + 1 : n === 'previous' ? Math.max(0, self.pageIndex - 1) : n;
+            return self;
+        };
+        this.page.len = function (n) {
+            if (n === undefined) { return self.length; }
+            self.length = parseInt(n, 10);
+            return self;
+        };
+        this.ajax = {url: function () { return self.source; }};
+        // Server-side processing; rows are arrays, so column i reads cell i unrendered
+        this.settings = function () {
+            var headers = self.el.tHead ? self.el.tHead.rows[0].cells : [];
+            return [{
+                oFeatures: {bServerSide: true},
+                aoColumns: Array.prototype.map.call(headers, function (_, i) { return {mData: i, mRender: null}; })
+            }];
+        };
+        this.page.info = function () {
+            var pages = self.length < 0 ? 1 : Math.max(1, Math.ceil(self.recordsDisplay / self.length));
+            var start = self.length < 0 ? 0 : self.pageIndex * self.length;
+            var end = self.length < 0 ? self.recordsDisplay : Math.min(start + self.length, self.recordsDisplay);
+            return {
+                page: self.pageIndex, pages: pages, start: start, end: end, length: self.length,
+                recordsTotal: self.recordsTotal, recordsDisplay: self.recordsDisplay, serverSide: true
+            };
+        };
+    }
+
+    Table.prototype.one = function (event, handler) {
+        if (event === 'draw.dt' || event === 'draw') { this.handlers.push(handler); }
+        return this;
+    };
+
+    Table.prototype.draw = function () {
+        var self = this;
+        var start = self.length < 0 ? 0 : self.pageIndex * self.length;
+        var query = ['draw=' + (++self.drawCounter), 'start=' + start, 'length=' + self.length];
+        Object.keys(self.params).forEach(function (key) {
+            query.push(encodeURIComponent(key) + '=' + encodeURIComponent(self.params[key]));
+        });
+        var xhr = new XMLHttpRequest();
+        xhr.open('GET', self.source + (self.source.indexOf('?') < 0 ? '?' : '&') + query.join('&'));
+        xhr.onload = function () {
+            var response = JSON.parse(xhr.responseText);
+            self.recordsTotal = response.recordsTotal;
+            self.recordsDisplay = response.recordsFiltered;
+            self.render(response.data);
+            tables[self.id] = self;
+            var handlers = self.handlers;
+            self.handlers = [];
+            handlers.forEach(function (handler) { handler(); });
+        };
+        xhr.send();
+        return self;
+    };
+
+    Table.prototype.render = function (rows) {
+        var body = this.el.tBodies[0];
+        var html = rows.map(function (row) {
+            return '<tr>' + row.map(function (cell) { return '<td>' + cell + '</td>'; }).join('') + '</tr>';
+        }).join('');
+        body.innerHTML = html;
+
+        var info = this.page.info();
+        var next = document.getElementById(this.id + '_next');
+        var previous = document.getElementById(this.id + '_previous');
+        if (next) { next.className = 'paginate_button next' + (info.page >= info.pages - 1 ? ' disabled' : ''); }
+        if (previous) { previous.className = 'paginate_button previous' + (info.page === 0 ? ' disabled' : ''); }
+    };
+
+    function tableFor(selector) {
+        var id = selector.replace(/^#/, '');
+        return tables[id] || pending[id];
+    }
+
+    function jQuery(selector) {
+        return {
+            DataTable: function () { return tableFor(selector); }
+        };
+    }
+    jQuery.fn = { dataTable: { isDataTable: function (selector) { return !!tables[selector.replace(/^#/, '')]; } } };
+
+    // Wires a table, its length <select> and paging links, then draws page 0
+    jQuery.initTable = function (id, params) {
+        var table = pending[id] || new Table(document.getElementById(id));
+        pending[id] = table;
+        delete tables[id];  // a re-submitted table is not ready until it redraws
+        table.params = params || {};
+        var select = document.querySelector('select[name="' + id + '_length"]');
+        if (select && !select.dataset.bound) {
+            select.dataset.bound = '1';
+            select.addEventListener('change', function () { table.page.len(select.value).page(0).draw(); });
+        }
+        ['next', 'previous'].forEach(function (direction) {
+            var link = document.getElementById(id + '_' + direction);
+            if (link && !link.dataset.bound) {
+                link.dataset.bound = '1';
+                link.addEventListener('click', function (event) {
+                    event.preventDefault();
+                    if (link.className.indexOf('disabled') < 0) { table.page(direction).draw(); }
+                });
+            }
+        });
+        table.page(0).draw();
+        return table;
+    };
+
+    window.jQuery = window.$ = jQuery;
+})();
@@ -0,0 +1,128 @@
+"""
+Git growth of the flat vs the year-sharded price history layout.
+
+Replays the last --days trading days of a sample of symbols into two scratch
+git repositories, one per layout (see nepse_shards):
+1. Each repository starts with the sample's histories minus the replayed days,
+   committed and repacked
+2. Every replayed day is upserted with nepse_shards.upsert() and committed,
+   like one daily update
+3. Per day it records the changed lines, the patch bytes (git show) and the
+   thin pack a push of that commit would send; at the end the repository is
+   repacked and the packfile growth over the replay is reported
+
+The real Nepse_Data is only read.
+
+Usage:
+    python benchmarks/layout_growth.py                    # 80 symbols, 20 days
+    python benchmarks/layout_growth.py --symbols 200 --days 40
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_FOLDER)
+sys.path.insert(0, REPO_ROOT)
+
+import nepse_merge  # noqa: E402
+import nepse_shards  # noqa: E402
+import nepse_staging  # noqa: E402
+from nepse_common import BASE_FOLDER  # noqa: E402
+
+LAYOUTS = ("flat", "sharded")
+
+
+def git(repo, *args, stdin=None):
+    return subprocess.run(["git", "-C", repo, *args], input=stdin, capture_output=True, check=True).stdout
+
+
+def pack_bytes(repo):
+    """Repack everything and return the packfile size"""
+    git(repo, "repack", "-adq")
+    return sum(os.path.getsize(path) for path in glob.glob(os.path.join(repo, ".git", "objects", "pack", "*.pack")))
+
+
+def sample_histories(count):
+    """Return [(relative csv path, history frame)] of count symbols spread over all sectors"""
+    paths = sorted(glob.glob(os.path.join(REPO_ROOT, BASE_FOLDER, "*", "*.csv")))
+    step = max(1, len(paths) // count)
+    return [(os.path.relpath(path, REPO_ROOT), nepse_merge.read_history(path)) for path in paths[::step][:count]]
+
+
+def replay(layout, histories, days, workspace):
+    """Replay days into a fresh repository in layout; returns per-day stats and the pack growth"""
+    repo = os.path.join(workspace, layout)
+    os.makedirs(repo)
+    git(repo, "init", "-q")
+    git(repo, "config", "user.email", "bench@example.com")
+    git(repo, "config", "user.name", "bench")
+    with open(os.path.join(repo, ".gitignore"), "w") as file:
+        file.write(".staging/\n")
+
+    cwd = os.getcwd()
+    os.chdir(repo)
+    try:
+        nepse_staging.begin("layout_growth")
+        for csv_path, history in histories:
+            initial = history[~history["Date"].isin(days)]
+            merged_df, _ = nepse_merge.upsert_rows(None, initial)
+            with nepse_staging.staged(csv_path) as tmp_path:
+                merged_df.to_csv(tmp_path, index=False, encoding="utf-8")
+            if layout == "sharded":
+                nepse_staging.commit()
+                nepse_shards.split(csv_path)
+        nepse_staging.commit()
+        git(repo, "add", "-A")
+        git(repo, "commit", "-qm", "initial")
+        initial_pack = pack_bytes(repo)
+
+        stats = []
+        for day in days:
+            for csv_path, history in histories:
+                rows = history[history["Date"] == day]
+                if len(rows):
+                    nepse_shards.upsert(csv_path, rows, layout=layout)
+            nepse_staging.commit()
+            git(repo, "add", "-A")
+            git(repo, "commit", "-qm", day)
+            numstat = git(repo, "show", "--format=", "--numstat", "HEAD").decode().split("\n")
+            lines = sum(int(added) + int(removed) for added, removed, _ in (line.split("\t") for line in numstat if line))
+            patch = len(git(repo, "show", "--format=", "HEAD"))
+            push = len(git(repo, "pack-objects", "--revs", "--thin", "--stdout", "-q", stdin=b"HEAD\n^HEAD~1\n"))
+            stats.append((lines, patch, push))
+        return stats, pack_bytes(repo) - initial_pack
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the git growth of the flat and the year-sharded layout")
+    parser.add_argument("--symbols", type=int, default=80, help="Symbols in the sample")
+    parser.add_argument("--days", type=int, default=20, help="Trading days to replay")
+    args = parser.parse_args()
+
+    histories = sample_histories(args.symbols)
+    all_days = sorted({day for _, history in histories for day in history["Date"]})
+    days = all_days[-args.days:]
+    print(f"📦 Replaying {len(days)} day(s) ({days[0]} → {days[-1]}) of {len(histories)} symbol(s)")
+
+    workspace = tempfile.mkdtemp(prefix="layout_growth_")
+    try:
+        results = {layout: replay(layout, histories, days, workspace) for layout in LAYOUTS}
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    print(f"\n{'Layout':<10}{'Lines/day':>12}{'Patch KiB/day':>15}{'Push KiB/day':>14}{'Pack growth KiB':>17}")
+    for layout, (stats, growth) in results.items():
+        lines, patch, push = (sum(values) / len(stats) for values in zip(*stats))
+        print(f"{layout:<10}{lines:>12,.0f}{patch / 1024:>15,.1f}{push / 1024:>14,.1f}{growth / 1024:>17,.1f}")
+
+
+if __name__ == "__main__":
+    main()
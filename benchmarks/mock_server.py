@@ -0,0 +1,242 @@
+"""
+Local stand-in for sharesansar.com and nepalstock.com.np.
+
+Serves the recorded pages in benchmarks/fixtures/pages and answers their data
+requests from the fixture CSVs, so every scraper can run offline:
+1. /company/<symbol>           price history page (DataTables, server-side)
+2. /company-price-history      rows of fixtures/price_history/<SYMBOL>.csv
+3. /company-list               company list page with the sector dropdown
+4. /company-list-data          rows of fixtures/company_list.csv
+5. /holiday-listing            holiday listing page with the year dropdown
+6. /holiday-data               rows of fixtures/holidays.csv for one year
+7. /api/nots/holiday/list      the JSON API behind the holiday page: every
+                               holiday of ?year= as {id, holidayDate, description}
+8. /live-trading               replays fixtures/live_session.csv: every request
+                               serves the next recorded snapshot; after the last
+                               one the page reports the market closed.
+                               /live-trading/restart rewinds the replay
+
+Latency is added to every request and the page length can be capped, like a
+backend that ignores large "Show N entries" values. Every response carries an
+ETag and answers If-None-Match with 304, like the real sites' static pages.
+
+Point the scrapers at it with SHARESANSAR_URL / NEPALSTOCK_URL.
+
+Usage:
+    python benchmarks/mock_server.py --port 8765 --latency 0.2 --max-page-size 50
+    SHARESANSAR_URL=http://127.0.0.1:8765 python company_full_data_scrap.py --symbols NABIL
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+FIXTURE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGES_FOLDER = os.path.join(FIXTURE_FOLDER, "pages")
+STATIC_FOLDER = os.path.join(FIXTURE_FOLDER, "static")
+PRICE_HISTORY_FOLDER = os.path.join(FIXTURE_FOLDER, "price_history")
+COMPANY_LIST_PATH = os.path.join(FIXTURE_FOLDER, "company_list.csv")
+HOLIDAYS_PATH = os.path.join(FIXTURE_FOLDER, "holidays.csv")
+LIVE_SESSION_PATH = os.path.join(FIXTURE_FOLDER, "live_session.csv")
+
+HOLIDAY_PAGE_SIZE = 20
+
+CONTENT_TYPES = {".html": "text/html; charset=utf-8", ".js": "application/javascript", ".json": "application/json"}
+
+
+def load_fixtures():
+    """Read every fixture CSV into memory once"""
+    price_history = {}
+    for name in sorted(os.listdir(PRICE_HISTORY_FOLDER)):
+        if name.endswith(".csv"):
+            with open(os.path.join(PRICE_HISTORY_FOLDER, name), "r", encoding="utf-8", newline="") as file:
+                # S.N. is dropped; the endpoint numbers rows by position
+                price_history[os.path.splitext(name)[0].upper()] = [row[1:] for row in list(csv.reader(file))[1:]]
+    with open(COMPANY_LIST_PATH, "r", encoding="utf-8", newline="") as file:
+        companies = list(csv.reader(file))[1:]
+    with open(HOLIDAYS_PATH, "r", encoding="utf-8", newline="") as file:
+        holidays = list(csv.reader(file))[1:]
+    live_session = {}
+    with open(LIVE_SESSION_PATH, "r", encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            live_session.setdefault(row["Time"], []).append(row)
+    return {"price_history": price_history, "companies": companies, "holidays": holidays,
+            "live_session": [live_session[time] for time in sorted(live_session)]}
+
+
+def read_page(name):
+    """Return a recorded page template"""
+    with open(os.path.join(PAGES_FOLDER, name), "r", encoding="utf-8") as file:
+        return file.read()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Routes requests to the fixture pages and their JSON data endpoints"""
+
+    fixtures = None
+    latency = 0.0
+    max_page_size = None
+    live_state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type, status=200):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, payload):
+        self.send_body(json.dumps(payload), CONTENT_TYPES[".json"])
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        path = url.path.rstrip("/")
+
+        if path.startswith("/company/"):
+            symbol = unquote(path[len("/company/"):]).upper()
+            if symbol not in self.fixtures["price_history"]:
+                return self.send_body("Not found", "text/plain", 404)
+            return self.send_body(read_page("company.html").replace("{symbol}", escape(symbol)), CONTENT_TYPES[".html"])
+        if path == "/company-price-history":
+            rows = self.fixtures["price_history"].get(query.get("company", "").upper(), [])
+            return self.send_json(self.datatables_page(rows, query))
+        if path == "/company-list":
+            return self.send_body(self.company_list_page(), CONTENT_TYPES[".html"])
+        if path == "/company-list-data":
+            sector = query.get("sector", "")
+            rows = [company for company in self.fixtures["companies"] if not sector or company[1] == sector]
+            return self.send_json(self.datatables_page(rows, query))
+        if path == "/holiday-listing":
+            return self.send_body(self.holiday_page(), CONTENT_TYPES[".html"])
+        if path == "/holiday-data":
+            return self.send_json(self.holiday_data(query))
+        if path == "/api/nots/holiday/list":
+            return self.send_json(self.holiday_api(query))
+        if path == "/live-trading":
+            return self.send_body(self.live_trading_page(), CONTENT_TYPES[".html"])
+        if path == "/live-trading/restart":
+            with self.live_state["lock"]:
+                self.live_state["next"] = 0
+            return self.send_body("Restarted", "text/plain")
+        if path.startswith("/static/"):
+            file_path = os.path.join(STATIC_FOLDER, os.path.basename(path))
+            if os.path.exists(file_path):
+                with open(file_path, "rb") as file:
+                    return self.send_body(file.read(), CONTENT_TYPES.get(os.path.splitext(file_path)[1], "text/plain"))
+        return self.send_body("Not found", "text/plain", 404)
+
+    def datatables_page(self, rows, query):
+        """Slice rows like a DataTables server-side endpoint (S.N. is prepended)"""
+        start = int(query.get("start", 0))
+        length = int(query.get("length", 20))
+        if self.max_page_size and (length < 0 or length > self.max_page_size):
+            length = self.max_page_size
+        end = len(rows) if length < 0 else start + length
+        data = [[str(start + offset + 1)] + row for offset, row in enumerate(rows[start:end])]
+        return {"draw": int(query.get("draw", 1)), "recordsTotal": len(rows), "recordsFiltered": len(rows), "data": data}
+
+    def company_list_page(self):
+        sectors = sorted({sector for _, sector in self.fixtures["companies"]})
+        options = ['<option value="">All Sectors</option>']
+        options += [f'<option value="{escape(sector)}">{escape(sector)}</option>' for sector in sectors]
+        return read_page("company_list.html").replace("{sector_options}", "\n            ".join(options))
+
+    def holiday_years(self):
+        return sorted({date[:4] for date, _ in self.fixtures["holidays"]}, reverse=True)
+
+    def holiday_page(self):
+        years = self.holiday_years()
+        options = [f'<div class="ng-option"><span class="ng-option-label">{year}</span></div>' for year in years]
+        page = read_page("holiday_listing.html").replace("{year_options}", "\n            ".join(options))
+        return page.replace("{current_year}", years[0] if years else "")
+
+    def holiday_data(self, query):
+        year = query.get("year", "")
+        holidays = sorted((row for row in self.fixtures["holidays"] if row[0].startswith(year)), key=lambda row: row[0])
+        pages = max(1, math.ceil(len(holidays) / HOLIDAY_PAGE_SIZE))
+        page = min(max(1, int(query.get("page", 1))), pages)
+        start = (page - 1) * HOLIDAY_PAGE_SIZE
+        rows = [[str(start + offset + 1), date, escape(name)]
+                for offset, (date, name) in enumerate(holidays[start:start + HOLIDAY_PAGE_SIZE])]
+        return {"year": year, "page": page, "pages": pages, "rows": rows}
+
+    def holiday_api(self, query):
+        year = query.get("year", "")
+        holidays = sorted((row for row in self.fixtures["holidays"] if row[0].startswith(year)), key=lambda row: row[0])
+        return [{"id": idx, "holidayDate": date, "description": name} for idx, (date, name) in enumerate(holidays, start=1)]
+
+    def live_trading_page(self):
+        snapshots = self.fixtures["live_session"]
+        with self.live_state["lock"]:
+            index = self.live_state["next"]
+            self.live_state["next"] = index + 1
+        snapshot = snapshots[min(index, len(snapshots) - 1)]
+        rows = []
+        for number, tick in enumerate(snapshot, start=1):
+            change = float(tick["LTP"]) - float(tick["PrevClose"])
+            percent = change / float(tick["PrevClose"]) * 100 if float(tick["PrevClose"]) else 0.0
+            cells = [str(number), f'<a href="/company/{escape(tick["Symbol"].lower())}">{escape(tick["Symbol"])}</a>',
+                     tick["LTP"], f"{change:.2f}", f"{percent:.2f}", tick["Open"], tick["High"], tick["Low"],
+                     f'{int(tick["Volume"]):,}', tick["PrevClose"]]
+            rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+        page = read_page("live_trading.html").replace("{rows}", "\n            ".join(rows))
+        page = page.replace("{as_of}", snapshot[0]["Time"])
+        return page.replace("{status}", "Market Closed" if index >= len(snapshots) - 1 else "Market Open")
+
+
+def start_server(port=0, latency=0.0, max_page_size=None):
+    """Start the mock server in a background thread; returns (server, base_url)"""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "fixtures": load_fixtures(),
+        "latency": latency,
+        "max_page_size": max_page_size,
+        "live_state": {"next": 0, "lock": threading.Lock()},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded sharesansar/nepalstock pages locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--max-page-size", type=int, help="Largest page length the backend honours")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.latency, args.max_page_size)
+    print(f"🌐 Mock server running at {base_url} (latency {args.latency}s, max page size {args.max_page_size or 'unlimited'})")
+    print(f"   SHARESANSAR_URL={base_url} NEPALSTOCK_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
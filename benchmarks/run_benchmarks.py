@@ -0,0 +1,498 @@
+"""
+Offline benchmark suite for the NEPSE scrapers and data paths.
+
+Every benchmark runs against the recorded fixtures in benchmarks/fixtures, so
+results are comparable across commits:
+1. merge_daily         upsert 20 new rows into the NABIL history
+2. merge_rescrape      upsert a full re-scrape (every row overlaps)
+3. write_csv           write the merged NABIL history
+4. calendar_build      weekend/weekday fill of the whole fixture calendar
+5. load_dataset        parse every Nepse_Data CSV into one frame
+6. validate_dataset    run the vectorized validation checks
+7. dom_extraction      read one 500-row page with a single script call
+8. dom_extraction_per_cell
+                       the same page with one WebDriver call per cell
+9. scrape_end_to_end   company_full_data_scrap.py --symbols NABIL BGWT against
+                       the mock server, in a scratch copy of the repo
+10. update_longest_in_memory
+                       daily update of the longest Nepse_Data histories with
+                       read_history + upsert_rows + to_csv
+11. update_longest_streaming
+                       the same update with stream_upsert
+12. holiday_api        every fixture year from the mock holiday JSON API with
+                       nepse_holidays (cold cache); fails if the parsed
+                       holidays differ from fixtures/holidays.csv
+13. update_pipeline    nepse_data_update.py --all --fetch-workers 2 against the
+                       mock server, in a scratch copy whose NABIL and BGWT
+                       histories lack their newest PIPELINE_NEW_ROWS rows;
+                       fails unless the pipeline restores them
+14. live_replay        nepse_live.py polls the mock server's replay of
+                       fixtures/live_session.csv to the close and flushes the
+                       bars into a scratch copy; fails unless the flushed
+                       rows match the session's OHLC and volume
+15. returns_reindex    reindex every Nepse_Data history onto the trading
+                       calendar and compute its returns with pandas, the
+                       alignment every research job used to repeat
+16. returns_build      nepse_returns.py build of the whole dataset in a scratch
+                       copy (Nepse_Data linked read-only)
+17. returns_load       memory-map that matrix and average its full simple
+                       returns frame; fails unless its prices on the calendar
+                       days match the reindex of returns_reindex
+
+7-9 and 13 need selenium and Chrome and are skipped without them. 10-11 (and every
+benchmark with --memory) also report the tracemalloc peak of one run. Results
+are saved to benchmarks/results/<commit>.json.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # all benchmarks
+    python benchmarks/run_benchmarks.py --only merge_daily write_csv --repeat 10
+    python benchmarks/run_benchmarks.py --latency 0.05 --max-page-size 100
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/abc1234.json
+    python benchmarks/run_benchmarks.py --only update_longest_in_memory update_longest_streaming
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_FOLDER = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_FOLDER)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCHMARK_FOLDER)
+
+import pandas as pd  # noqa: E402
+from dateutil.relativedelta import relativedelta  # noqa: E402
+
+import mock_server  # noqa: E402
+import nepse_merge  # noqa: E402
+import nepse_staging  # noqa: E402
+from nepse_common import BASE_FOLDER  # noqa: E402
+
+FIXTURE_FOLDER = os.path.join(BENCHMARK_FOLDER, "fixtures")
+RESULTS_FOLDER = os.path.join(BENCHMARK_FOLDER, "results")
+FIXTURE_HISTORY = os.path.join(FIXTURE_FOLDER, "price_history", "NABIL.csv")
+FIXTURE_CALENDAR = os.path.join(FIXTURE_FOLDER, "trading_calendar.csv")
+FIXTURE_HOLIDAYS = os.path.join(FIXTURE_FOLDER, "holidays.csv")
+FIXTURE_LIVE_SESSION = os.path.join(FIXTURE_FOLDER, "live_session.csv")
+
+# Benchmarks slower than this many seconds run once regardless of --repeat
+SLOW_BENCHMARK = 2.0
+
+# Histories used by the update_longest_* memory benchmarks
+LONGEST_HISTORIES = 3
+
+# Rows the update_pipeline benchmark drops from each history for the update to fetch
+PIPELINE_NEW_ROWS = 60
+
+
+def selenium_available():
+    """Return True when selenium (and so Chrome-driven benchmarks) can run"""
+    return importlib.util.find_spec("selenium") is not None
+
+
+def bench_merge_daily(context):
+    existing = nepse_merge.read_history(FIXTURE_HISTORY)
+    new = existing.head(20).copy()
+    return lambda: nepse_merge.upsert_rows(existing.iloc[20:], new, "NABIL")
+
+
+def bench_merge_rescrape(context):
+    existing = nepse_merge.read_history(FIXTURE_HISTORY)
+    new = existing.copy()
+    return lambda: nepse_merge.upsert_rows(existing, new, "NABIL")
+
+
+def bench_write_csv(context):
+    merged, _ = nepse_merge.upsert_rows(None, nepse_merge.read_history(FIXTURE_HISTORY))
+    path = os.path.join(context["scratch"], "NABIL.csv")
+    return lambda: merged.to_csv(path, index=False, encoding="utf-8")
+
+
+def bench_calendar_build(context):
+    from nepse_calendar import add_weekend_holidays_for_month
+
+    base = pd.read_csv(FIXTURE_CALENDAR, parse_dates=["Date"])
+    base["date_str"] = base["Date"].dt.strftime("%Y-%m-%d")
+
+    def run():
+        calendar_df = base.copy()
+        month = calendar_df["Date"].min().replace(day=1)
+        last = calendar_df["Date"].max()
+        with contextlib.redirect_stdout(io.StringIO()):
+            while month <= last:
+                calendar_df, _, _ = add_weekend_holidays_for_month(month.year, month.month, calendar_df)
+                month += relativedelta(months=1)
+        return calendar_df
+    return run
+
+
+def bench_load_dataset(context):
+    from nepse_common import load_price_dataset
+    return lambda: load_price_dataset(os.path.join(REPO_ROOT, BASE_FOLDER))
+
+
+def bench_validate_dataset(context):
+    from nepse_common import load_price_dataset
+    from nepse_validation import run_checks
+    df = load_price_dataset(os.path.join(REPO_ROOT, BASE_FOLDER))
+    return lambda: run_checks(df)
+
+
+def _longest_histories(context):
+    """Copy the longest Nepse_Data histories to scratch; returns [(path, newest_row_df)]"""
+    paths = sorted(glob.glob(os.path.join(REPO_ROOT, BASE_FOLDER, "*", "*.csv")), key=os.path.getsize, reverse=True)
+    copies = []
+    for path in paths[:LONGEST_HISTORIES]:
+        copy = os.path.join(context["scratch"], f"longest_{os.path.basename(path)}")
+        shutil.copy(path, copy)
+        # Re-applying the newest row is a daily update that leaves the file unchanged
+        copies.append((copy, nepse_merge.read_history(path).head(1)))
+    return copies
+
+
+def bench_update_longest_in_memory(context):
+    histories = _longest_histories(context)
+
+    def run():
+        for path, new in histories:
+            merged, _ = nepse_merge.upsert_rows(nepse_merge.read_history(path), new)
+            merged.to_csv(path, index=False, encoding="utf-8")
+    return run
+
+
+def bench_update_longest_streaming(context):
+    histories = _longest_histories(context)
+    # Staged files must be on the scratch filesystem for the atomic rename
+    nepse_staging.begin("run_benchmarks", os.path.join(context["scratch"], ".staging"))
+
+    def run():
+        for path, new in histories:
+            nepse_merge.stream_upsert(path, new)
+        nepse_staging.commit()
+    return run
+
+
+def _open_price_table(context, page_size):
+    """Open the mock NABIL page in a shared headless Chrome and draw one page"""
+    import nepse_browser
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    if "driver" not in context:
+        context["driver"] = nepse_browser.create_driver(Service(ChromeDriverManager().install()))
+    driver = context["driver"]
+    driver.get(f"{context['base_url']}/company/nabil")
+    driver.find_element("id", "btn_cpricehistory").click()
+    nepse_browser.wait_for_table(driver, "myTableCPriceHistory")
+    nepse_browser.draw_table(driver, "myTableCPriceHistory", 0, page_size)
+    return driver
+
+
+def bench_dom_extraction(context):
+    import nepse_browser
+    driver = _open_price_table(context, 500)
+    return lambda: nepse_browser.read_table_rows(driver, "myTableCPriceHistory", min_cells=9)
+
+
+def bench_dom_extraction_per_cell(context):
+    driver = _open_price_table(context, 500)
+
+    def run():
+        rows = driver.find_elements("xpath", "//table[@id='myTableCPriceHistory']/tbody/tr")
+        return [[cell.text.strip() for cell in row.find_elements("tag name", "td")] for row in rows]
+    return run
+
+
+def bench_scrape_end_to_end(context):
+    workspace = os.path.join(context["scratch"], "workspace")
+
+    def run():
+        # A scratch copy of the code with an empty data folder, so the real
+        # Nepse_Data and git history are never touched
+        shutil.rmtree(workspace, ignore_errors=True)
+        os.makedirs(os.path.join(workspace, "other_nepse_detail"))
+        for path in glob.glob(os.path.join(REPO_ROOT, "*.py")):
+            shutil.copy(path, workspace)
+        for name in ("listed_company.csv", "symbol_registry.csv"):
+            shutil.copy(os.path.join(REPO_ROOT, "other_nepse_detail", name), os.path.join(workspace, "other_nepse_detail"))
+        env = dict(os.environ, SHARESANSAR_URL=context["base_url"], NEPSE_METRICS_DIR=os.path.join(workspace, "metrics"))
+        subprocess.run(
+            [sys.executable, "company_full_data_scrap.py", "--symbols", "NABIL", "BGWT", "--workers", "2"],
+            cwd=workspace, env=env, check=True, stdout=subprocess.DEVNULL)
+    return run
+
+
+def bench_update_pipeline(context):
+    workspace = os.path.join(context["scratch"], "pipeline")
+    fixtures = {os.path.splitext(name)[0]: os.path.join(FIXTURE_FOLDER, "price_history", name)
+                for name in os.listdir(os.path.join(FIXTURE_FOLDER, "price_history"))}
+
+    def run():
+        # A scratch git repo listing only the fixture symbols, each missing its
+        # newest rows, so the run fetches across pages, writes and commits
+        shutil.rmtree(workspace, ignore_errors=True)
+        os.makedirs(os.path.join(workspace, "other_nepse_detail"))
+        for path in glob.glob(os.path.join(REPO_ROOT, "*.py")):
+            shutil.copy(path, workspace)
+        shutil.copy(FIXTURE_CALENDAR, os.path.join(workspace, "other_nepse_detail"))
+        shutil.copy(os.path.join(REPO_ROOT, "other_nepse_detail", "listed_company.csv"), os.path.join(workspace, "other_nepse_detail"))
+        registry = pd.read_csv(os.path.join(REPO_ROOT, "other_nepse_detail", "symbol_registry.csv"), dtype=str)
+        registry = registry[registry["Symbol"].isin(list(fixtures))]
+        registry.to_csv(os.path.join(workspace, "other_nepse_detail", "symbol_registry.csv"), index=False)
+        for symbol, path in zip(registry["Symbol"], registry["FilePath"]):
+            os.makedirs(os.path.dirname(os.path.join(workspace, path)), exist_ok=True)
+            pd.read_csv(fixtures[symbol], dtype=str).iloc[PIPELINE_NEW_ROWS:].to_csv(os.path.join(workspace, path), index=False)
+        subprocess.run("git init -q && git add -A && git -c user.name=bench -c user.email=bench@localhost commit -qm fixtures",
+                       shell=True, cwd=workspace, check=True)
+
+        env = {key: value for key, value in os.environ.items() if key != "TOKEN_GITHUB"}
+        env.update(SHARESANSAR_URL=context["base_url"], NEPSE_METRICS_DIR=os.path.join(workspace, "metrics"),
+                   HOME=workspace, REPO_GITHUB="Nepal_Stock_Data", USERNAME_GITHUB="bench", USER_EMAIL_GITHUB="bench@localhost")
+        subprocess.run([sys.executable, "nepse_data_update.py", "--all", "--fetch-workers", "2"],
+                       cwd=workspace, env=env, check=True, stdout=subprocess.DEVNULL)
+        for symbol, path in zip(registry["Symbol"], registry["FilePath"]):
+            written = set(pd.read_csv(os.path.join(workspace, path), dtype=str)["Date"])
+            if written != set(pd.read_csv(fixtures[symbol], dtype=str)["Date"]):
+                raise AssertionError(f"the pipeline did not restore the newest rows of {symbol}")
+    return run
+
+
+def bench_live_replay(context):
+    import requests
+
+    workspace = os.path.join(context["scratch"], "live")
+    session = pd.read_csv(FIXTURE_LIVE_SESSION)
+    session = session[session["Volume"] > 0]
+    expected = {symbol: ticks for symbol, ticks in session.groupby("Symbol")}
+
+    def run():
+        shutil.rmtree(workspace, ignore_errors=True)
+        os.makedirs(os.path.join(workspace, "other_nepse_detail"))
+        for path in glob.glob(os.path.join(REPO_ROOT, "*.py")):
+            shutil.copy(path, workspace)
+        registry = pd.read_csv(os.path.join(REPO_ROOT, "other_nepse_detail", "symbol_registry.csv"), dtype=str)
+        registry = registry[registry["Symbol"].isin(list(expected))]
+        registry.to_csv(os.path.join(workspace, "other_nepse_detail", "symbol_registry.csv"), index=False)
+        for symbol, path in zip(registry["Symbol"], registry["FilePath"]):
+            os.makedirs(os.path.dirname(os.path.join(workspace, path)), exist_ok=True)
+            shutil.copy(os.path.join(FIXTURE_FOLDER, "price_history", f"{symbol}.csv"), os.path.join(workspace, path))
+
+        requests.get(f"{context['base_url']}/live-trading/restart", timeout=10).raise_for_status()
+        env = dict(os.environ, NEPSE_METRICS_DIR=os.path.join(workspace, "metrics"), NEPSE_HTTP_CACHE_DIR=os.path.join(workspace, "http_cache"))
+        subprocess.run([sys.executable, "nepse_live.py", "--url", f"{context['base_url']}/live-trading", "--interval", "0"],
+                       cwd=workspace, env=env, check=True, stdout=subprocess.DEVNULL)
+
+        for symbol, path in zip(registry["Symbol"], registry["FilePath"]):
+            ticks = expected[symbol]
+            row = pd.read_csv(os.path.join(workspace, path), dtype=str).iloc[0]
+            got = [float(row[col].replace(",", "")) for col in ("Open", "High", "Low", "Ltp", "Qty")]
+            want = [ticks["Open"].iloc[0], ticks["High"].max(), ticks["Low"].min(), ticks["LTP"].iloc[-1], ticks["Volume"].iloc[-1]]
+            if row["Date"] != ticks["Time"].iloc[-1][:10] or got != want:
+                raise AssertionError(f"live bar of {symbol} is {row['Date']} {got}, expected {want}")
+    return run
+
+
+def _returns_workspace(context):
+    """Build the returns matrix once in a scratch copy; returns the workspace"""
+    workspace = os.path.join(context["scratch"], "returns")
+    if not os.path.exists(workspace):
+        os.makedirs(workspace)
+        for path in glob.glob(os.path.join(REPO_ROOT, "*.py")):
+            shutil.copy(path, workspace)
+        shutil.copytree(os.path.join(REPO_ROOT, "other_nepse_detail"), os.path.join(workspace, "other_nepse_detail"))
+        os.symlink(os.path.join(REPO_ROOT, BASE_FOLDER), os.path.join(workspace, BASE_FOLDER))
+        subprocess.run([sys.executable, "nepse_returns.py", "build"], cwd=workspace, check=True, stdout=subprocess.DEVNULL)
+    return workspace
+
+
+def _reindexed_prices():
+    """Each history's Ltp on the calendar's trading days, one symbol at a time"""
+    from nepse_common import read_price_csv, symbol_csv_paths
+
+    calendar = pd.read_csv(os.path.join(REPO_ROOT, "other_nepse_detail", "trading_calendar.csv"))
+    days = pd.DatetimeIndex(sorted(calendar.loc[calendar["IsTradingDay"], "Date"]))
+    prices = {}
+    for symbol, (_, csv_path) in symbol_csv_paths(os.path.join(REPO_ROOT, BASE_FOLDER)).items():
+        df = read_price_csv(csv_path).drop_duplicates("Date")
+        prices[symbol] = df[df["Ltp"] > 0].set_index("Date")["Ltp"].reindex(days)
+    return pd.DataFrame(prices)
+
+
+def bench_returns_reindex(context):
+    return lambda: _reindexed_prices().pct_change(fill_method=None)
+
+
+def bench_returns_build(context):
+    workspace = _returns_workspace(context)
+    return lambda: subprocess.run([sys.executable, "nepse_returns.py", "build"], cwd=workspace, check=True, stdout=subprocess.DEVNULL)
+
+
+def bench_returns_load(context):
+    import nepse_returns
+
+    folder = os.path.join(_returns_workspace(context), nepse_returns.RETURNS_FOLDER)
+    expected = _reindexed_prices()
+    stored = nepse_returns.ReturnsMatrix.load(folder).frame("ltp").reindex(index=expected.index, columns=expected.columns)
+    if not stored.equals(expected):
+        raise AssertionError("the returns matrix prices differ from the calendar reindex of the histories")
+
+    def run():
+        matrix = nepse_returns.ReturnsMatrix.load(folder)
+        return matrix.frame("simple").mean()
+    return run
+
+
+def bench_holiday_api(context):
+    import nepse_holidays
+    import nepse_http
+
+    expected = sorted(map(tuple, pd.read_csv(FIXTURE_HOLIDAYS, dtype=str).values.tolist()))
+    years = sorted({day[:4] for day, _ in expected}, reverse=True)
+    nepse_http.CACHE_FOLDER = os.path.join(context["scratch"], "http_cache")
+
+    def run():
+        nepse_http.clear()
+        fetched = nepse_holidays.fetch_years(years, url=f"{context['base_url']}/api/nots/holiday/list")
+        got = sorted((e["Holiday Date"], e["Holiday Description"]) for entries in fetched.values() for e in entries)
+        if got != expected:
+            raise AssertionError("holiday API entries differ from fixtures/holidays.csv")
+    return run
+
+
+BENCHMARKS = {
+    "merge_daily": (bench_merge_daily, False),
+    "merge_rescrape": (bench_merge_rescrape, False),
+    "write_csv": (bench_write_csv, False),
+    "calendar_build": (bench_calendar_build, False),
+    "load_dataset": (bench_load_dataset, False),
+    "validate_dataset": (bench_validate_dataset, False),
+    "dom_extraction": (bench_dom_extraction, True),
+    "dom_extraction_per_cell": (bench_dom_extraction_per_cell, True),
+    "scrape_end_to_end": (bench_scrape_end_to_end, True),
+    "update_longest_in_memory": (bench_update_longest_in_memory, False),
+    "update_longest_streaming": (bench_update_longest_streaming, False),
+    "holiday_api": (bench_holiday_api, False),
+    "update_pipeline": (bench_update_pipeline, True),
+    "live_replay": (bench_live_replay, False),
+    "returns_reindex": (bench_returns_reindex, False),
+    "returns_build": (bench_returns_build, False),
+    "returns_load": (bench_returns_load, False),
+}
+
+# Benchmarks whose memory peak is always measured
+MEMORY_BENCHMARKS = ("update_longest_in_memory", "update_longest_streaming")
+
+
+def time_benchmark(setup, context, repeat, measure_memory=False):
+    """Return (wall-clock timings of repeat runs, tracemalloc peak of one extra run or None)"""
+    run = setup(context)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+        if timings[0] > SLOW_BENCHMARK:
+            break
+    peak = None
+    if measure_memory:
+        # Traced separately: tracemalloc slows the run down too much to time it
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return timings, peak
+
+
+def current_commit():
+    """Return the short hash of HEAD, or 'worktree' outside git"""
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or "worktree"
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'Benchmark':<26}{'Runs':>6}{'Min s':>11}{'Median s':>11}{'Peak MiB':>10}" + (f"{'Baseline s':>12}{'Change':>9}" if baseline else ""))
+    for name, result in results.items():
+        if result.get("skipped"):
+            print(f"{name:<26}{'skipped: ' + result['skipped']:>28}")
+            continue
+        peak = f"{result['peak_bytes'] / 2**20:>10.2f}" if result.get("peak_bytes") is not None else f"{'-':>10}"
+        line = f"{name:<26}{result['runs']:>6}{result['min']:>11.4f}{result['median']:>11.4f}{peak}"
+        previous = (baseline or {}).get(name, {})
+        if previous.get("median"):
+            change = result["median"] / previous["median"] - 1
+            line += f"{previous['median']:>12.4f}{change:>+9.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline NEPSE benchmarks")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark (slow ones run once)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency per request, seconds")
+    parser.add_argument("--max-page-size", type=int, help="Largest page length the mock backend honours")
+    parser.add_argument("--memory", action="store_true", help="Also measure the tracemalloc peak of every benchmark")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--no-save", action="store_true", help="Do not write benchmarks/results/<commit>.json")
+    args = parser.parse_args()
+
+    server, base_url = mock_server.start_server(latency=args.latency, max_page_size=args.max_page_size)
+    has_selenium = selenium_available()
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        context = {"base_url": base_url, "scratch": scratch}
+        try:
+            for name in args.only or BENCHMARKS:
+                setup, needs_browser = BENCHMARKS[name]
+                if needs_browser and not has_selenium:
+                    results[name] = {"skipped": "selenium not installed"}
+                    continue
+                print(f"⏱️ {name}...", flush=True)
+                try:
+                    timings, peak = time_benchmark(setup, context, max(1, args.repeat), args.memory or name in MEMORY_BENCHMARKS)
+                except Exception as e:
+                    results[name] = {"skipped": f"{type(e).__name__}: {e}"[:60]}
+                    continue
+                results[name] = {"runs": len(timings), "min": min(timings), "median": statistics.median(timings),
+                                 "peak_bytes": peak, "timings": timings}
+        finally:
+            if "driver" in context:
+                context["driver"].quit()
+            server.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        commit = current_commit()
+        path = os.path.join(RESULTS_FOLDER, f"{commit}.json")
+        payload = {
+            "commit": commit,
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version.split()[0],
+            "settings": {"repeat": args.repeat, "memory": args.memory, "latency": args.latency, "max_page_size": args.max_page_size},
+            "results": results,
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(payload, file, indent=2)
+        print(f"\n💾 Results saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,47 @@
+"""
+Scrapes the full price history of one or more companies from sharesansar.
+
+Modes:
+- Interactive (no arguments): prompts for one symbol at a time
+- Batch: python company_full_data_scrap.py --symbols ADBL NABIL --workers 3
+         python company_full_data_scrap.py --file symbols.txt
+
+Batch mode is built for onboarding new or broken symbols:
+1. Asks the price-history DataTable for the largest page size the backend
+   accepts (falls back to the size it actually returns when capped)
+2. Reads each page with a single script call instead of per-cell lookups
+3. Checkpoints rows and the next page after every page in .scrape_checkpoints/
+   and resumes by jumping straight to that page on the next run
+4. Scrapes several symbols at once, one browser per worker
+"""
+
+import argparse
 import csv
+import json
+import math
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 import requests
 import sys
+import nepse_browser
+import nepse_changes
+import nepse_http
+import nepse_merge
+import nepse_metrics
+import nepse_profiling
+import nepse_registry
+import nepse_shards
+import nepse_snapshot
+import nepse_staging
+from nepse_common import PRICE_COLUMNS, SHARESANSAR_URL, filename_safe
 
 # Determine root path depending on environment
 IN_COLAB = 'google.colab' in sys.modules
@@ -29,6 +60,10 @@ os.chdir(root_path)
 BASE_FOLDER = "Nepse_Data"
 listed_company = "other_nepse_detail/listed_company.csv"
 
+# Held by a worker while it stages a symbol's files and by the batch commit,
+# so a commit never renames a half-written staged file into place
+write_lock = threading.Lock()
+
 # GitHub raw file URL for listed_company.csv
 # Uses the repository variable to build the URL dynamically
 GITHUB_RAW_URL = "https://raw.githubusercontent.com/${{ github.repository }}/main/other_nepse_detail/listed_company.csv"
@@ -37,33 +72,271 @@ GITHUB_RAW_URL = "https://raw.githubusercontent.com/${{ github.repository }}/mai
 if not os.path.exists(listed_company):
     print(f"⚠️ File '{listed_company}' not found! Downloading from GitHub...")
     try:
-        response = requests.get(GITHUB_RAW_URL, timeout=10)
+        response = nepse_http.get(GITHUB_RAW_URL, ttl=24 * 3600)
         response.raise_for_status()
         os.makedirs(os.path.dirname(listed_company), exist_ok=True)
-        with open(listed_company, "wb") as file:
+        with nepse_staging.open_staged(listed_company, "wb") as file:
             file.write(response.content)
+        nepse_staging.commit()
         print(f"✅ Successfully downloaded '{listed_company}' from GitHub.")
     except requests.RequestException as e:
         print(f"❌ Failed to download file: {e}")
         exit(1)
 
-# Read the CSV file
-with open(listed_company, 'r', encoding='utf-8') as file:
-    reader = list(csv.reader(file))
-    categories = reader[0]
-    symbols_by_category = list(zip(*reader[1:]))
+# Symbol -> sector lookups go through the symbol registry (loaded once)
+nepse_registry.load_registry()
 print("✅ Successfully loaded symbol data.")
 
-# Configure Selenium WebDriver
-chrome_options = Options()
-chrome_options.add_argument("--headless=new")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920x1080")
-chrome_options.add_argument("--log-level=3")
+CHECKPOINT_FOLDER = ".scrape_checkpoints"
+PRICE_TABLE_ID = "myTableCPriceHistory"
+# Page sizes tried from the largest down; the UI only offers up to 50. A bounded
+# size (rather than every row at once) keeps per-page checkpoints meaningful.
+PAGE_SIZE_CANDIDATES = [1000, 500, 200, 100, 50]
+# Finished symbols whose staged files are committed together in batch mode
+COMMIT_EVERY = 10
+
+
+def create_driver():
+    """Start a headless Chrome instance that reads table pages from their XHR responses"""
+    return nepse_browser.create_driver(service, capture_network=True)
+
+
+def find_category(symbol):
+    """Return the sector of a symbol from the symbol registry, or None"""
+    return nepse_registry.sector_of(symbol)
+
+
+def csv_path_for(symbol, category):
+    """Return the data CSV path for a symbol, creating its sector folder"""
+    category_folder = os.path.join(BASE_FOLDER, category)
+    os.makedirs(category_folder, exist_ok=True)
+    return os.path.join(category_folder, f"{filename_safe(symbol)}.csv")
+
+
+def open_price_history(driver, wait, symbol):
+    """Load the company page and open its price history tab"""
+    with nepse_metrics.timer("page_load", symbol=symbol):
+        driver.get(f"{SHARESANSAR_URL}/company/{symbol.lower()}")
+    price_history_button = wait.until(EC.element_to_be_clickable((By.ID, "btn_cpricehistory")))
+    price_history_button.click()
+    wait.until(EC.presence_of_element_located((By.NAME, f"{PRICE_TABLE_ID}_length")))
+
+
+def draw_page(driver, page, page_size=None):
+    """Redraw the price table at the given page (and page size) and return its rows"""
+    return nepse_browser.draw_table(driver, PRICE_TABLE_ID, page, page_size, min_cells=9)
+
+
+def checkpoint_paths(symbol):
+    """Return the (state json, partial rows csv) checkpoint paths for a symbol"""
+    stem = os.path.join(CHECKPOINT_FOLDER, filename_safe(symbol))
+    return f"{stem}.json", f"{stem}.csv"
+
+
+def load_checkpoint(symbol):
+    """Return (state, rows) for an unfinished scrape, or (None, [])"""
+    state_path, rows_path = checkpoint_paths(symbol)
+    if not (os.path.exists(state_path) and os.path.exists(rows_path)):
+        return None, []
+    with open(state_path, "r", encoding="utf-8") as file:
+        state = json.load(file)
+    with open(rows_path, "r", encoding="utf-8", newline="") as file:
+        rows = list(csv.reader(file))[1:]
+    return state, rows
+
+
+def save_checkpoint(symbol, state, page_rows):
+    """Append one page of rows and record the next page to fetch"""
+    # Written in place, not staged: a checkpoint must survive a crash before the
+    # batch commits, and it is only cleared once the batch holding its rows has
+    # committed (see flush() in run_batch)
+    os.makedirs(CHECKPOINT_FOLDER, exist_ok=True)
+    state_path, rows_path = checkpoint_paths(symbol)
+    new_file = not os.path.exists(rows_path)
+    with open(rows_path, "a", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(PRICE_COLUMNS)
+        writer.writerows(row[:9] for row in page_rows)
+    # Write the state after the rows so a crash can only repeat a page, never skip one
+    with open(state_path, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+
+
+def clear_checkpoint(symbol):
+    """Remove a finished symbol's checkpoint files"""
+    for path in checkpoint_paths(symbol):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def save_history(symbol, csv_filename, rows, category):
+    """Upsert scraped rows into the symbol's CSV, queue the new or changed ones for the change feed and refresh its snapshot row"""
+    df = pd.DataFrame([row[:9] for row in rows], columns=PRICE_COLUMNS)
+    changed = nepse_changes.changed_rows(csv_filename, df)
+    # Upsert into any existing file so overlapping pages or re-runs never duplicate dates;
+    # the stored history is streamed through (or split per year shard), never loaded
+    # next to the scraped rows
+    with nepse_metrics.timer("write", symbol=symbol):
+        written, conflicts = nepse_shards.upsert(csv_filename, df, symbol)
+    nepse_merge.log_conflicts(conflicts)
+    nepse_changes.record(symbol, category.strip(), changed)
+    nepse_registry.update_dates(symbol, csv_filename)
+    nepse_snapshot.update(symbol, category.strip(), csv_filename)
+    return written
+
+
+def scrape_symbol_batch(driver, symbol):
+    """Scrape a symbol's full history with checkpoints; returns rows saved"""
+    category = find_category(symbol)
+    if not category:
+        print(f"❌ Symbol '{symbol}' not found in the symbol registry.")
+        nepse_metrics.inc("failures", symbol=symbol)
+        return 0
+    csv_filename = csv_path_for(symbol, category)
+    wait = WebDriverWait(driver, 10)
+
+    open_price_history(driver, wait, symbol)
+    nepse_browser.wait_for_table(driver, PRICE_TABLE_ID)
+    records_total = nepse_browser.table_info(driver, PRICE_TABLE_ID)["recordsTotal"]
+    state, rows = load_checkpoint(symbol)
+
+    if state and state.get("records_total") == records_total:
+        page_size = state["page_size"]
+        next_page = state["next_page"]
+        print(f"⏯️ {symbol}: resuming at page {next_page + 1} ({len(rows)} rows checkpointed)")
+        nepse_metrics.inc("retries", symbol=symbol, sector=category)
+    else:
+        # No usable checkpoint (or new rows were published since): start over
+        clear_checkpoint(symbol)
+        rows = []
+        page_size, first_rows = nepse_browser.pick_page_size(
+            driver, PRICE_TABLE_ID, records_total, min_cells=9, candidates=PAGE_SIZE_CANDIDATES)
+        state = {"page_size": page_size, "records_total": records_total, "next_page": 1}
+        save_checkpoint(symbol, state, first_rows)
+        rows.extend(first_rows)
+        next_page = 1
+        print(f"📏 {symbol}: {records_total} records at {page_size} rows per page")
+
+    total_pages = max(1, math.ceil(records_total / page_size))
+    for page in range(next_page, total_pages):
+        page_rows = draw_page(driver, page, page_size if page == next_page else None)
+        if not page_rows:
+            print(f"⚠️ {symbol}: page {page + 1} came back empty, stopping")
+            break
+        rows.extend(page_rows)
+        state["next_page"] = page + 1
+        save_checkpoint(symbol, state, page_rows)
+        print(f"🔍 {symbol}: page {page + 1}/{total_pages} ({len(rows)} rows)")
+
+    if not rows:
+        print(f"⚠️ No data found for {symbol}.")
+        clear_checkpoint(symbol)
+        return 0
+    # Staged only: the checkpoint is cleared once the batch is committed
+    with write_lock:
+        saved = save_history(symbol, csv_filename, rows, category)
+    nepse_metrics.inc("rows", len(rows), sector=category)
+    print(f"✅ {symbol}: full data staged for {csv_filename} ({saved} rows)")
+    return saved
+
+
+def read_symbols(args):
+    """Collect symbols from --symbols and --file, preserving order"""
+    symbols = list(args.symbols or [])
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as file:
+            for line in file:
+                symbols.extend(part for part in line.replace(",", " ").split())
+    seen = set()
+    return [s.upper() for s in symbols if not (s.upper() in seen or seen.add(s.upper()))]
+
+
+def run_batch(symbols, workers):
+    """Scrape symbols with a pool of browsers; each worker keeps its own driver"""
+    local = threading.local()
+    drivers = []
+    drivers_lock = threading.Lock()
+
+    def worker(symbol):
+        if not hasattr(local, "driver"):
+            local.driver = create_driver()
+            with drivers_lock:
+                drivers.append(local.driver)
+        return scrape_symbol_batch(local.driver, symbol)
+
+    failed = []
+    finished = []
+
+    def flush():
+        # Commit the finished symbols' files and their feed entries together,
+        # then drop their checkpoints; workers wait to stage until it is done
+        with write_lock:
+            nepse_changes.flush("company_full_data_scrap")
+            committed = nepse_staging.commit()
+        for symbol in finished:
+            clear_checkpoint(symbol)
+        if committed:
+            print(f"💾 Committed {committed} file(s) for {len(finished)} symbol(s)")
+        finished.clear()
+
+    def record(symbol, run):
+        try:
+            if run():
+                finished.append(symbol)
+                if len(finished) >= COMMIT_EVERY:
+                    flush()
+            else:
+                failed.append(symbol)
+        except Exception as e:
+            print(f"❌ {symbol}: {e} (checkpoint kept, rerun to resume)")
+            nepse_metrics.inc("failures", symbol=symbol)
+            failed.append(symbol)
+
+    try:
+        if workers == 1:
+            # Sequential runs stay in this thread, where --profile can follow them
+            for symbol in symbols:
+                record(symbol, lambda: worker(symbol))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(worker, symbol): symbol for symbol in symbols}
+                for future in as_completed(futures):
+                    record(futures[future], future.result)
+        flush()
+    finally:
+        for driver in drivers:
+            driver.quit()
+    return failed
+
+
+parser = argparse.ArgumentParser(description="Scrape full price history from sharesansar")
+parser.add_argument("--symbols", nargs="*", help="Symbols to scrape in batch mode")
+parser.add_argument("--file", help="File with symbols (whitespace, comma or newline separated)")
+parser.add_argument("--workers", type=int, default=2, help="Browsers to run in parallel in batch mode")
+parser.add_argument("--profile", action="store_true", help="Profile the main stages (implies --workers 1)")
+args = parser.parse_args()
+nepse_metrics.start_job("company_full_data_scrap")
+if args.profile:
+    nepse_profiling.enable("company_full_data_scrap")
+    args.workers = 1
+nepse_staging.begin("company_full_data_scrap")
+
 service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=chrome_options)
+batch_symbols = read_symbols(args)
+
+if batch_symbols:
+    print(f"🚀 Batch scraping {len(batch_symbols)} symbol(s) with {args.workers} worker(s)")
+    failed = run_batch(batch_symbols, max(1, args.workers))
+    nepse_registry.save_registry()
+    nepse_snapshot.save_snapshot()
+    nepse_staging.commit()
+    if failed:
+        print(f"⚠️ Unfinished symbols: {', '.join(sorted(failed))}")
+    print("🎉 Scraping completed!")
+    sys.exit(1 if failed else 0)
+
+driver = create_driver()
 wait = WebDriverWait(driver, 3)
 
 while True:
@@ -74,27 +347,19 @@ while True:
     symbol_input = symbol_input.upper()
 
     # Find the category for the symbol
-    category = None
-    for i, sym_list in enumerate(symbols_by_category):
-        cleaned_sym_list = [s.strip() for s in sym_list if s.strip()]
-        if symbol_input in cleaned_sym_list:
-            category = categories[i].strip()
-            break
+    category = find_category(symbol_input)
 
     if not category:
-        print(f"❌ Symbol '{symbol_input}' not found in listed_company.csv.")
+        print(f"❌ Symbol '{symbol_input}' not found in the symbol registry.")
         continue
 
     print(f"🔍 Found symbol '{symbol_input}' in category: {category}")
 
     # Prepare folder and filename
-    category_folder = os.path.join(BASE_FOLDER, category)
-    os.makedirs(category_folder, exist_ok=True)
-    filename_safe = symbol_input.replace('/', '_')
-    csv_filename = os.path.join(category_folder, f"{filename_safe}.csv")
+    csv_filename = csv_path_for(symbol_input, category)
 
     # URL with original symbol (lowercase for compatibility)
-    url = f"https://www.sharesansar.com/company/{symbol_input.lower()}"
+    url = f"{SHARESANSAR_URL}/company/{symbol_input.lower()}"
     driver.get(url)
     time.sleep(1)
 
@@ -149,13 +414,11 @@ while True:
             break
 
     if all_data:
-        df = pd.DataFrame(all_data, columns=["S.N.", "Date", "Open", "High", "Low", "Ltp", "% Change", "Qty", "Turnover"])
-        df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce")
-        df = df.sort_values(by="Date", ascending=False).reset_index(drop=True)
-        df["S.N."] = df.index + 1
-        cols = ["S.N.", "Date", "Open", "High", "Low", "Ltp", "% Change", "Qty", "Turnover"]
-        df = df[cols]
-        df.to_csv(csv_filename, index=False, encoding='utf-8')
+        save_history(symbol_input, csv_filename, all_data, category)
+        nepse_registry.save_registry()
+        nepse_snapshot.save_snapshot()
+        nepse_changes.flush("company_full_data_scrap")
+        nepse_staging.commit()
         print(f"✅ Full data scraped and saved to {csv_filename}")
     else:
         print(f"⚠️ No data found for {symbol_input}.")
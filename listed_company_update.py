@@ -1,10 +1,26 @@
+"""
+Syncs other_nepse_detail/listed_company.csv with the sharesansar company list.
+
+Runs weekly via GitHub Actions and only touches what changed:
+1. Fetches the whole company list in as few requests as possible: the
+   unfiltered list once (sector read from its Sector column), falling back to
+   one full-length draw per sector when the table has no Sector column; the
+   rows are parsed from the table's XHR responses (nepse_browser network capture)
+2. Diffs it against the stored list: added, removed and moved symbols
+3. Moves the data file of a symbol that changed sector into its new folder
+4. Archives the data file of a delisted symbol into Nepse_Data_Archive/
+5. Updates the symbol registry (symbol_registry.csv), re-exports
+   listed_company.csv from it and appends to listed_company_changes.csv only
+   when something changed
+6. Fetches the full history of newly listed symbols with
+   company_full_data_scrap.py in batch mode
+"""
+
 import csv
 import os
 import time
-from collections import defaultdict
-from selenium import webdriver
+from datetime import datetime
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
@@ -19,6 +35,16 @@ from selenium.webdriver.chrome.service import Service
 import sys
 from dotenv import load_dotenv
 import subprocess
+import nepse_browser
+import nepse_changes
+import nepse_metrics
+import nepse_profiling
+import nepse_registry
+import nepse_shards
+import nepse_snapshot
+import nepse_staging
+from nepse_common import BASE_FOLDER, SHARESANSAR_URL
+from nepse_registry import ARCHIVE_FOLDER, DELISTED, LISTED, REGISTRY_PATH, data_path
 
 load_dotenv()
 
@@ -47,6 +73,10 @@ else:
 
 print(f"📂 Root path set to: {root_path}")
 os.chdir(root_path)
+nepse_metrics.start_job("listed_company_update")
+if nepse_profiling.profile_requested():
+    nepse_profiling.enable("listed_company_update")
+nepse_staging.begin("listed_company_update")
 
 # Step 1: Set Git user credentials
 os.system(f"git config --global user.email {GITHUB_USER_EMAIL}")
@@ -54,6 +84,12 @@ os.system(f"git config --global user.name {GITHUB_USERNAME}")
 
 # Define paths
 listed_company_path = "other_nepse_detail/listed_company.csv"
+changes_log_path = "other_nepse_detail/listed_company_changes.csv"
+COMPANY_TABLE_ID = "myTable"
+
+# Refuse to archive more than this share of the listed symbols in one run;
+# a mass "delisting" almost always means the scrape was incomplete
+MAX_REMOVED_FRACTION = 0.1
 
 # Mapping from website sector names to CSV sector names (with underscores)
 SECTOR_MAPPING = {
@@ -81,21 +117,6 @@ print("="*60)
 print("🔄 Starting Listed Company Update Process")
 print("="*60)
 
-# Configure Selenium WebDriver
-chrome_options = Options()
-chrome_options.add_argument("--headless=new")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920x1080")
-chrome_options.add_argument("--log-level=3")
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=chrome_options)
-wait = WebDriverWait(driver, 10)
-
-url = "https://www.sharesansar.com/company-list"
-driver.get(url)
-time.sleep(3)
 
 def _dismiss_overlays(driver):
     # Best-effort close for common overlays/banners that can intercept clicks
@@ -142,212 +163,279 @@ def safe_click(driver, wait, by, locator, timeout=10):
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", element)
         driver.execute_script("arguments[0].click()", element)
 
-# Dictionary to store symbols by sector
-sector_data = defaultdict(list)
 
-# Get all sector options from the dropdown
+def load_listed_companies():
+    """Return {symbol: sector} of listed symbols and the sector column order"""
+    companies = {
+        symbol: record["Sector"]
+        for symbol, record in nepse_registry.load_registry().items()
+        if record["Status"] == LISTED
+    }
+    return companies, nepse_registry.legacy_sector_order()
+
+
+def csv_sector_name(sector_name):
+    """Map a website sector name to the folder/column name used in this repo"""
+    return SECTOR_MAPPING.get(sector_name, sector_name.replace(" ", "_").replace("&", "And"))
+
+
+def submit_sector(driver, wait, sector_value):
+    """Select a sector (empty value for all) and submit the search form"""
+    Select(driver.find_element(By.ID, "sector")).select_by_value(sector_value)
+    safe_click(driver, wait, By.ID, "btn_listed_submit")
+    nepse_browser.wait_for_table(driver, COMPANY_TABLE_ID)
+
+
+def fetch_unfiltered(driver, wait, all_sectors):
+    """
+    Return {symbol: sector} from the unfiltered list, or None if unavailable.
+
+    Needs an option for all sectors in the dropdown and a Sector column in
+    the table; both are checked rather than assumed.
+    """
+    all_value = next((value for name, value in all_sectors if value in ("", "all", "0")), None)
+    if all_value is None:
+        return None
+    submit_sector(driver, wait, all_value)
+    headers = [h.lower() for h in nepse_browser.read_table_headers(driver, COMPANY_TABLE_ID)]
+    if "sector" not in headers or "symbol" not in headers:
+        return None
+    symbol_idx, sector_idx = headers.index("symbol"), headers.index("sector")
+    rows = nepse_browser.read_all_rows(driver, COMPANY_TABLE_ID, min_cells=max(symbol_idx, sector_idx) + 1)
+    companies = {row[symbol_idx].strip(): csv_sector_name(row[sector_idx].strip()) for row in rows if row[symbol_idx].strip()}
+    return companies or None
+
+
+def fetch_by_sector(driver, wait, all_sectors):
+    """Return ({symbol: sector}, scraped sectors) with one full-length draw per sector"""
+    companies = {}
+    scraped_sectors = set()
+    for sector_name, sector_value in all_sectors:
+        if sector_value in ("", "all", "0"):
+            continue
+        sector = csv_sector_name(sector_name)
+        print(f"🔍 Fetching sector: {sector_name}")
+        try:
+            submit_sector(driver, wait, sector_value)
+            rows = nepse_browser.read_all_rows(driver, COMPANY_TABLE_ID, min_cells=2)
+        except Exception as e:
+            print(f"❌ Error processing sector {sector_name}: {e}")
+            nepse_metrics.inc("failures", sector=sector)
+            continue
+        symbols = [row[1].strip() for row in rows if row[1].strip()]
+        nepse_metrics.inc("rows", len(symbols), sector=sector)
+        for symbol in symbols:
+            companies[symbol] = sector
+        scraped_sectors.add(sector)
+        print(f"✅ {sector}: {len(symbols)} symbols")
+    return companies, scraped_sectors
+
+
+def compute_diff(old, new, scraped_sectors):
+    """
+    Return (added, removed, moved) between two {symbol: sector} maps.
+
+    Removals are only trusted for sectors that were actually scraped this run.
+    """
+    added = {symbol: sector for symbol, sector in new.items() if symbol not in old}
+    removed = {symbol: sector for symbol, sector in old.items() if symbol not in new and sector in scraped_sectors}
+    moved = {symbol: (old[symbol], sector) for symbol, sector in new.items() if symbol in old and old[symbol] != sector}
+    return added, removed, moved
+
+
+def write_listed_companies(path, companies, previous_order):
+    """Export the registry to the column-per-sector listed_company.csv layout"""
+    sectors = set(companies.values())
+
+    # Keep the previous column order, then the mapping order, then new sectors
+    ordered_sectors = [sector for sector in previous_order if sector in sectors]
+    for sector in list(SECTOR_MAPPING.values()) + sorted(sectors):
+        if sector in sectors and sector not in ordered_sectors:
+            ordered_sectors.append(sector)
+    return nepse_registry.export_legacy_csv(path, ordered_sectors)
+
+
+def log_changes(path, added, removed, moved):
+    """Append this run's diff to the listed company change log (staged; lands with the commit)"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    write_header = not os.path.exists(nepse_staging.current_path(path))
+    with nepse_staging.open_appended(path, newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if write_header:
+            writer.writerow(["Date", "Symbol", "Change", "OldSector", "NewSector"])
+        for symbol, sector in sorted(added.items()):
+            writer.writerow([today, symbol, "added", "", sector])
+        for symbol, sector in sorted(removed.items()):
+            writer.writerow([today, symbol, "removed", sector, ""])
+        for symbol, (old_sector, new_sector) in sorted(moved.items()):
+            writer.writerow([today, symbol, "moved", old_sector, new_sector])
+
+
+def git_commit_and_push(paths, commit_message):
+    """Stage paths (including deletions), commit and push if anything is staged"""
+    quoted = " ".join(f'"{path}"' for path in paths)
+    with nepse_metrics.timer("git"):
+        result = subprocess.run(f"git add -A -- {quoted}", shell=True, capture_output=True, text=True)
+    print(f"Git add output: {result.stdout}")
+    if result.returncode != 0:
+        print(f"❌ Git add failed: {result.stderr}")
+        exit(1)
+
+    with nepse_metrics.timer("git"):
+        result = subprocess.run(f'git commit -m "{commit_message}"', shell=True, capture_output=True, text=True)
+    print(f"Git commit output: {result.stdout}")
+    if result.returncode != 0:
+        # Check if it's a "nothing to commit" case (exit code 1 is normal)
+        if "nothing to commit" in result.stdout.lower():
+            print(f"ℹ️ No changes to commit (data already up-to-date)")
+            return
+        print(f"❌ Git commit failed: {result.stderr}")
+        exit(1)
+
+    # Git push (only if token is available)
+    if push_enabled:
+        with nepse_metrics.timer("git"):
+            result = subprocess.run("git push origin main", shell=True, capture_output=True, text=True)
+        print(f"Git push output: {result.stdout}")
+        if result.returncode != 0:
+            print(f"❌ Git push failed: {result.stderr}")
+            print("Hint: Ensure GITHUB_TOKEN is set in your .env file and has write access to the repository for pushing changes.")
+        else:
+            print(f"✅ Successfully pushed changes to repository.")
+    else:
+        print(f"⚠️ Git push skipped because GITHUB_TOKEN is not set or push is disabled.")
+
+
+old_companies, previous_order = load_listed_companies()
+print(f"✅ Loaded {len(old_companies)} listed symbols from {REGISTRY_PATH}")
+
+# Configure Selenium WebDriver
+service = Service(ChromeDriverManager().install())
+driver = nepse_browser.create_driver(service, capture_network=True)
+wait = WebDriverWait(driver, 10)
+
+url = f"{SHARESANSAR_URL}/company-list"
+with nepse_metrics.timer("page_load"):
+    driver.get(url)
+
 try:
     sector_dropdown = wait.until(EC.presence_of_element_located((By.ID, "sector")))
-    sector_select = Select(sector_dropdown)
-    all_sectors = [(option.text, option.get_attribute("value")) for option in sector_select.options]
-    print(f"✅ Found {len(all_sectors)} sectors to process")
+    all_sectors = [(option.text.strip(), option.get_attribute("value")) for option in Select(sector_dropdown).options]
+    print(f"✅ Found {len(all_sectors)} sector options")
 except Exception as e:
     print(f"❌ Error finding sector dropdown: {e}")
     driver.quit()
     exit(1)
 
-# Process each sector
-for sector_name, sector_value in all_sectors:
-    print(f"\n{'='*60}")
-    print(f"🔍 Processing Sector: {sector_name}")
-    print(f"{'='*60}")
-    
-    # Map sector name to CSV format
-    csv_sector_name = SECTOR_MAPPING.get(sector_name, sector_name.replace(" ", "_").replace("&", "And"))
-    
+try:
+    new_companies = None
     try:
-        # Select the sector
-        sector_dropdown = driver.find_element(By.ID, "sector")
-        sector_select = Select(sector_dropdown)
-        sector_select.select_by_value(sector_value)
-        time.sleep(1)
-        
-        # Click the search button
-        safe_click(driver, wait, By.ID, "btn_listed_submit")
-        print(f"⏳ Waiting for data to load...")
-        time.sleep(3)
-        
-        # Change entries to 50
-        try:
-            length_select = wait.until(EC.presence_of_element_located((By.NAME, "myTable_length")))
-            Select(length_select).select_by_value("50")
-            print(f"✅ Set display to 50 entries")
-            time.sleep(2)  # Wait for table to reload
-        except Exception as e:
-            print(f"⚠️ Could not change display length: {e}")
-        
-        page_count = 0
-        sector_symbols = []
-        
-        # Loop through all pages
-        while True:
-            page_count += 1
-            print(f"📄 Scraping page {page_count}...")
-            
-            try:
-                # Wait for table to load
-                table = wait.until(EC.presence_of_element_located((By.ID, "myTable")))
-                rows = table.find_elements(By.XPATH, ".//tbody/tr")
-                
-                page_symbols = []
-                for row in rows:
-                    try:
-                        cells = row.find_elements(By.TAG_NAME, "td")
-                        if len(cells) >= 2:
-                            # Symbol is in the second column (index 1)
-                            symbol_cell = cells[1]
-                            symbol_link = symbol_cell.find_element(By.TAG_NAME, "a")
-                            symbol = symbol_link.text.strip()
-                            if symbol:
-                                page_symbols.append(symbol)
-                    except Exception:
-                        continue
-                
-                if page_symbols:
-                    sector_symbols.extend(page_symbols)
-                    print(f"✅ Found {len(page_symbols)} symbols on page {page_count}")
-                else:
-                    print(f"⚠️ No symbols found on page {page_count}")
-                
-            except Exception as e:
-                print(f"⚠️ Error reading table: {e}")
-                break
-            
-            # Check if there's a next page
-            try:
-                next_button = driver.find_element(By.ID, "myTable_next")
-                
-                # Check if next button is disabled
-                if "disabled" in next_button.get_attribute("class"):
-                    print(f"⏹️ Reached last page (page {page_count})")
-                    break
-                
-                # Click next button
-                safe_click(driver, wait, By.ID, "myTable_next")
-                print(f"➡️ Moving to next page...")
-                time.sleep(2)  # Wait for next page to load
-                
-            except Exception as e:
-                print(f"⏹️ No more pages available")
-                break
-        
-        # Sort symbols alphabetically
-        sector_symbols.sort()
-        
-        # Store in dictionary
-        if sector_symbols:
-            sector_data[csv_sector_name] = sector_symbols
-            print(f"✅ Total symbols collected for {csv_sector_name}: {len(sector_symbols)}")
-            print(f"📊 Symbols: {', '.join(sector_symbols[:10])}{'...' if len(sector_symbols) > 10 else ''}")
-        else:
-            print(f"⚠️ No symbols found for {csv_sector_name}")
-    
+        new_companies = fetch_unfiltered(driver, wait, all_sectors)
     except Exception as e:
-        print(f"❌ Error processing sector {sector_name}: {e}")
-        continue
+        print(f"⚠️ Unfiltered company list unavailable: {e}")
+
+    if new_companies:
+        scraped_sectors = set(new_companies.values())
+        print(f"✅ Fetched {len(new_companies)} symbols from the unfiltered list")
+    else:
+        print("ℹ️ Falling back to one request per sector")
+        nepse_metrics.inc("retries")
+        new_companies, scraped_sectors = fetch_by_sector(driver, wait, all_sectors)
+finally:
+    driver.quit()
+
+if not new_companies:
+    print("❌ No companies fetched; leaving listed_company.csv untouched")
+    exit(1)
 
-driver.quit()
+# --- Diff against the stored list ---
+
+added, removed, moved = compute_diff(old_companies, new_companies, scraped_sectors)
 
 print(f"\n{'='*60}")
-print(f"📝 Writing data to CSV file")
+print(f"📊 Changes: {len(added)} added, {len(removed)} removed, {len(moved)} moved")
 print(f"{'='*60}")
+for symbol, sector in sorted(added.items()):
+    print(f"  ➕ {symbol} ({sector})")
+for symbol, sector in sorted(removed.items()):
+    print(f"  ➖ {symbol} ({sector})")
+for symbol, (old_sector, new_sector) in sorted(moved.items()):
+    print(f"  🔀 {symbol}: {old_sector} → {new_sector}")
 
-# Find the maximum number of rows needed
-max_rows = max([len(symbols) for symbols in sector_data.values()]) if sector_data else 0
+if not (added or removed or moved):
+    print("ℹ️ Listed companies unchanged - nothing to write")
+    exit(0)
 
-# Sort sectors to maintain consistent order
-# Preserve original order from SECTOR_MAPPING but only include scraped sectors
-ordered_sectors = []
-for original_sector in SECTOR_MAPPING.values():
-    if original_sector in sector_data:
-        ordered_sectors.append(original_sector)
+if old_companies and len(removed) > MAX_REMOVED_FRACTION * len(old_companies):
+    print(f"❌ {len(removed)} removals exceed {MAX_REMOVED_FRACTION:.0%} of listed symbols; assuming an incomplete scrape")
+    exit(1)
 
-# Add any new sectors not in the mapping
-for sector in sorted(sector_data.keys()):
-    if sector not in ordered_sectors:
-        ordered_sectors.append(sector)
+# Symbols from sectors that failed to scrape keep their previous sector
+for symbol, sector in old_companies.items():
+    if symbol not in new_companies and symbol not in removed:
+        new_companies[symbol] = sector
 
-print(f"✅ Found {len(ordered_sectors)} sectors with data")
-print(f"✅ Maximum rows needed: {max_rows}")
+changed_paths = [listed_company_path, changes_log_path, REGISTRY_PATH, nepse_snapshot.SNAPSHOT_PATH]
 
-# Write to CSV
-try:
-    with open(listed_company_path, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        
-        # Write header (sector names)
-        writer.writerow(ordered_sectors)
-        
-        # Write data rows
-        for row_idx in range(max_rows):
-            row_data = []
-            for sector in ordered_sectors:
-                symbols = sector_data.get(sector, [])
-                if row_idx < len(symbols):
-                    row_data.append(symbols[row_idx])
-                else:
-                    row_data.append('')  # Empty cell if no more symbols
-            writer.writerow(row_data)
-    
-    print(f"✅ Successfully wrote data to {listed_company_path}")
-    
-    # Display summary
-    print(f"\n{'='*60}")
-    print(f"📊 Summary")
-    print(f"{'='*60}")
-    for sector in ordered_sectors:
-        count = len(sector_data[sector])
-        print(f"  {sector}: {count} companies")
-    
-except Exception as e:
-    print(f"❌ Error writing to CSV: {e}")
-    exit(1)
+for symbol, (old_sector, new_sector) in moved.items():
+    source = data_path(old_sector, symbol, BASE_FOLDER)
+    destination = data_path(new_sector, symbol, BASE_FOLDER)
+    if nepse_shards.exists(source):
+        source_path = nepse_shards.storage_path(source)
+        nepse_shards.relocate(source, destination)
+        nepse_changes.record_event("move", symbol, sector=new_sector, previous_sector=old_sector)
+        nepse_snapshot.update(symbol, new_sector, destination)
+        changed_paths += [source_path, nepse_shards.storage_path(destination)]
+        print(f"🔀 Moved {source} → {destination}")
+    nepse_registry.set_symbol(symbol, new_sector, LISTED)
+
+for symbol, sector in removed.items():
+    source = data_path(sector, symbol, BASE_FOLDER)
+    destination = data_path(sector, symbol, ARCHIVE_FOLDER)
+    if nepse_shards.exists(source):
+        source_path = nepse_shards.storage_path(source)
+        nepse_shards.relocate(source, destination)
+        nepse_changes.record_event("delist", symbol, sector=sector)
+        changed_paths += [source_path, nepse_shards.storage_path(destination)]
+        print(f"📦 Archived {source} → {destination}")
+    nepse_registry.set_symbol(symbol, sector, DELISTED)
+    nepse_snapshot.remove(symbol)
+
+for symbol, sector in added.items():
+    nepse_registry.set_symbol(symbol, sector, LISTED)
+
+nepse_registry.save_registry()
+nepse_snapshot.save_snapshot()
+
+ordered_sectors = write_listed_companies(listed_company_path, new_companies, previous_order)
+log_changes(changes_log_path, added, removed, moved)
+if nepse_changes.flush("listed_company_update"):
+    changed_paths.append(nepse_changes.FEED_FOLDER)
+# Moves, archives, the registry, listed_company.csv and the change feed land together
+nepse_staging.commit()
+print(f"✅ Successfully wrote {len(new_companies)} symbols in {len(ordered_sectors)} sectors to {listed_company_path}")
 
 # Git operations
 print(f"\n{'='*60}")
 print(f"💾 Committing changes to Git")
 print(f"{'='*60}")
 
-# Git add
-result = subprocess.run("git add other_nepse_detail/listed_company.csv", shell=True, capture_output=True, text=True)
-print(f"Git add output: {result.stdout}")
-if result.returncode != 0:
-    print(f"❌ Git add failed: {result.stderr}")
-    exit(1)
-
-# Git commit
-commit_message = "Updated listed company data"
-result = subprocess.run(f'git commit -m "{commit_message}"', shell=True, capture_output=True, text=True)
-print(f"Git commit output: {result.stdout}")
-if result.returncode != 0:
-    # Check if it's a "nothing to commit" case (exit code 1 is normal)
-    if "nothing to commit" in result.stdout.lower():
-        print(f"ℹ️ No changes to commit (data already up-to-date)")
-    else:
-        print(f"❌ Git commit failed: {result.stderr}")
-        exit(1)
+git_commit_and_push(changed_paths, f"Updated listed company data ({len(added)} added, {len(removed)} removed, {len(moved)} moved)")
 
-# Git push (only if token is available)
-if push_enabled:
-    result = subprocess.run("git push origin main", shell=True, capture_output=True, text=True)
-    print(f"Git push output: {result.stdout}")
+# Full history for newly listed symbols
+if added:
+    print(f"\n{'='*60}")
+    print(f"📥 Fetching full history for {len(added)} new symbol(s)")
+    print(f"{'='*60}")
+    result = subprocess.run([sys.executable, "company_full_data_scrap.py", "--symbols", *sorted(added)], text=True)
     if result.returncode != 0:
-        print(f"❌ Git push failed: {result.stderr}")
-        print("Hint: Ensure GITHUB_TOKEN is set in your .env file and has write access to the repository for pushing changes.")
-    else:
-        print(f"✅ Successfully pushed changes to repository.")
-else:
-    print(f"⚠️ Git push skipped because GITHUB_TOKEN is not set or push is disabled.")
+        print("⚠️ Some new symbols could not be fetched; rerun company_full_data_scrap.py to resume them")
+    new_files = [data_path(sector, symbol, BASE_FOLDER) for symbol, sector in added.items()]
+    new_files = [nepse_shards.storage_path(path) for path in new_files if nepse_shards.exists(path)]
+    if new_files:
+        # The scraper filled in FirstDate/LastDate of the new registry rows,
+        # added the new rows to the change feed and their snapshot rows
+        git_commit_and_push(new_files + [REGISTRY_PATH, nepse_snapshot.SNAPSHOT_PATH, nepse_changes.FEED_FOLDER], f"Added full history for {len(new_files)} newly listed symbol(s)")
 
 print(f"\n{'='*60}")
 print(f"🎉 Listed Company Update Completed Successfully!")
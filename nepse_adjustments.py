@@ -0,0 +1,207 @@
+"""
+Corporate-action adjustment factors for the NEPSE price history.
+
+The Open/High/Low/Ltp series stored in Nepse_Data are raw prices, so bonus and
+rights issues show up as large drops on the ex-date. This module:
+
+1. Detects adjustment events per symbol from the stored history, and merges in
+   manual events from other_nepse_detail/corporate_actions.csv (if present)
+2. Caches the per-symbol event factors in other_nepse_detail/adjustment_factors.json
+3. Recomputes a symbol only when its CSV or its manual events changed
+4. Serves adjusted series lazily via adjusted_history(symbol)
+
+Detection:
+- Since 2019 sharesansar reports % Change against the adjusted previous close,
+  so the ex-date factor is (Ltp / (1 + % Change / 100)) / previous Ltp
+- Older rows carry a 0.00 % Change; a close-to-close drop beyond the daily
+  circuit band is then taken as the event and the raw ratio as its factor
+
+Manual events (corporate_actions.csv columns: Symbol, ExDate, Factor, Note)
+override detected events on the same ExDate. A Factor of 1 suppresses a false
+positive.
+
+Usage:
+    python nepse_adjustments.py             # refresh stale symbols
+    python nepse_adjustments.py NABIL ADBL  # refresh selected symbols only
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import nepse_shards
+import nepse_staging
+from nepse_common import BASE_FOLDER, OTHER_DETAIL_FOLDER, read_price_csv, symbol_csv_paths
+
+CACHE_PATH = os.path.join(OTHER_DETAIL_FOLDER, "adjustment_factors.json")
+MANUAL_EVENTS_PATH = os.path.join(OTHER_DETAIL_FOLDER, "corporate_actions.csv")
+
+# An implied previous close this far below the stored one is a corporate action
+MIN_IMPLIED_DROP = 0.03
+# Without a reported % Change, only drops beyond the daily circuit band count
+MIN_RAW_DROP = 0.15
+
+PRICE_FIELDS = ["Open", "High", "Low", "Ltp"]
+
+_cache = None
+_manual_events = None
+
+
+def _file_hash(csv_path):
+    """Return the sha1 of a symbol's history bytes (its flat file or its year shards in order)"""
+    digest = hashlib.sha1()
+    for path in nepse_shards.history_files(csv_path):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def load_cache(path=CACHE_PATH):
+    """Load the adjustment factor cache (symbol -> entry), empty if missing"""
+    path = nepse_staging.current_path(path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_cache(cache, path=CACHE_PATH):
+    """Write the adjustment factor cache with a stable key order"""
+    with nepse_staging.open_staged(path, "w", encoding="utf-8") as file:
+        json.dump(cache, file, indent=1, sort_keys=True)
+        file.write("\n")
+
+
+def load_manual_events(path=MANUAL_EVENTS_PATH):
+    """Return {symbol: [(ex_date, factor), ...]} from corporate_actions.csv"""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, dtype={"Symbol": str, "ExDate": str})
+    events = {}
+    for symbol, ex_date, factor in zip(df["Symbol"], df["ExDate"], df["Factor"]):
+        events.setdefault(symbol.strip(), []).append((ex_date.strip(), float(factor)))
+    return events
+
+
+def detect_events(df):
+    """
+    Detect ex-dates in an oldest-first price history.
+
+    Returns a list of (date_str, factor) where factor < 1 multiplies every
+    price before date_str.
+    """
+    ltp = df["Ltp"].to_numpy(dtype=float)
+    pct = df["% Change"].to_numpy(dtype=float)
+    if len(ltp) < 2:
+        return []
+
+    prev_ltp = ltp[:-1]
+    cur_ltp = ltp[1:]
+    cur_pct = pct[1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        implied = (cur_ltp / (1 + cur_pct / 100)) / prev_ltp
+        raw = cur_ltp / prev_ltp
+
+    has_pct = cur_pct != 0
+    factor = np.where(has_pct, implied, raw)
+    threshold = np.where(has_pct, 1 - MIN_IMPLIED_DROP, 1 - MIN_RAW_DROP)
+    hits = np.flatnonzero(np.isfinite(factor) & (factor > 0) & (factor < threshold))
+
+    dates = df["Date"].dt.strftime("%Y-%m-%d").to_numpy()
+    return [(dates[i + 1], round(float(factor[i]), 6)) for i in hits]
+
+
+def _merge_events(detected, manual):
+    """Combine detected and manual events; manual wins on the same ex-date"""
+    events = dict(detected)
+    events.update(manual)
+    return [[date, factor] for date, factor in sorted(events.items()) if factor != 1]
+
+
+def refresh(symbols=None, cache=None, base_folder=BASE_FOLDER):
+    """
+    Recompute factors for stale symbols and return the list of symbols updated.
+
+    A symbol is stale when its CSV hash or its manual events differ from the
+    cached entry. Pass symbols to limit the check to those names.
+    """
+    global _manual_events
+    if cache is None:
+        cache = _get_cache()
+    _manual_events = load_manual_events()
+    paths = symbol_csv_paths(base_folder)
+    if symbols is None:
+        symbols = list(paths)
+
+    refreshed = []
+    for symbol in symbols:
+        if symbol not in paths:
+            continue
+        sector, csv_path = paths[symbol]
+        source_hash = _file_hash(csv_path)
+        manual = _manual_events.get(symbol, [])
+        entry = cache.get(symbol)
+        if entry and entry["source_hash"] == source_hash and entry["manual"] == [list(e) for e in manual]:
+            continue
+
+        df = read_price_csv(csv_path)
+        cache[symbol] = {
+            "sector": sector,
+            "source_hash": source_hash,
+            "manual": [list(e) for e in manual],
+            "events": _merge_events(detect_events(df), manual),
+        }
+        refreshed.append(symbol)
+    return refreshed
+
+
+def _get_cache():
+    """Return the module-level cache, loading it from disk on first use"""
+    global _cache
+    if _cache is None:
+        _cache = load_cache()
+    return _cache
+
+
+def cumulative_factors(dates, events):
+    """Return the cumulative adjustment factor for each date (datetime64 array)"""
+    if not events:
+        return np.ones(len(dates))
+    ev_dates = np.array([date for date, _ in events], dtype="datetime64[ns]")
+    ev_factors = np.array([factor for _, factor in events], dtype=float)
+    # suffix[k] = product of all event factors from k onwards; suffix[-1] = 1
+    suffix = np.append(np.cumprod(ev_factors[::-1])[::-1], 1.0)
+    # Rows dated on or after an ex-date are already in post-event terms
+    idx = np.searchsorted(ev_dates, np.asarray(dates, dtype="datetime64[ns]"), side="right")
+    return suffix[idx]
+
+
+def adjusted_history(symbol, base_folder=BASE_FOLDER):
+    """Return the symbol's oldest-first history with prices and Qty adjusted"""
+    cache = _get_cache()
+    refresh([symbol], cache=cache, base_folder=base_folder)
+    if symbol not in cache:
+        raise KeyError(f"Unknown symbol: {symbol}")
+
+    df = read_price_csv(os.path.join(base_folder, cache[symbol]["sector"], f"{symbol}.csv"))
+    factor = cumulative_factors(df["Date"].to_numpy(), cache[symbol]["events"])
+    for col in PRICE_FIELDS:
+        df[col] = df[col] * factor
+    df["Qty"] = df["Qty"] / factor
+    df["Adj Factor"] = factor
+    return df
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    selected = [s.strip().upper() for s in sys.argv[1:]] or None
+    cache = _get_cache()
+    updated = refresh(selected, cache=cache)
+    save_cache(cache)
+    nepse_staging.commit()
+    events = sum(len(entry["events"]) for entry in cache.values())
+    print(f"✅ Refreshed {len(updated)} symbol(s); {events} adjustment events cached in {CACHE_PATH}")
@@ -0,0 +1,265 @@
+"""
+Shared Selenium helpers for the sharesansar DataTables pages.
+
+The company list and the price history are jQuery DataTables. Driving them
+through the DataTables API (page length, page number, draw events) avoids
+clicking "Next", fixed sleeps and one WebDriver call per cell:
+- draw_table() redraws a page and waits for the table's own draw event
+- read_table_rows() returns every cell of the current page in one script call
+- read_all_rows() fetches all rows with as few draws as the backend allows
+
+Drivers started with capture_network=True also record the page's XHR/Fetch
+responses through the Chrome DevTools performance log. draw_table() then
+parses the rows of a server-side table from its ajax JSON instead of reading
+them back from the DOM (it still waits for the draw event); client-side
+tables and payloads that cannot be mapped to columns fall back to reading
+the DOM. wait_for_response() reads any other XHR-driven page the same way
+(the holiday listing). The browser still loads
+the pages, so sessions and cookies work as before.
+"""
+
+import base64
+import html
+import json
+import math
+import re
+import time
+
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.support.ui import WebDriverWait
+
+import nepse_metrics
+
+# Page lengths tried from the largest down; -1 asks DataTables for every row
+PAGE_SIZE_CANDIDATES = [-1, 1000, 500, 200, 100, 50]
+
+READ_ROWS_JS = """
+return Array.from(document.querySelectorAll('#' + arguments[0] + ' tbody tr'))
+    .map(tr => Array.from(tr.cells).map(td => td.innerText.trim()));
+"""
+
+READ_HEADERS_JS = """
+return Array.from(document.querySelectorAll('#' + arguments[0] + ' thead th'))
+    .map(th => th.innerText.trim());
+"""
+
+# Redraws the table (new page length and/or page) and flags when it is done;
+# returns the ajax URL, whether draws hit the server, and the data key of
+# every column for network capture
+DRAW_JS = """
+var table = jQuery('#' + arguments[0]).DataTable();
+window.__nepseDrawDone = false;
+table.one('draw.dt', function () { window.__nepseDrawDone = true; });
+if (arguments[1] !== null) { table.page.len(arguments[1]); }
+var url = table.ajax && table.ajax.url ? table.ajax.url() : null;
+var serverSide = !!(table.settings && table.settings()[0].oFeatures.bServerSide);
+// A rendered column (thousands separators, formatted dates) maps to null: its
+// raw JSON value is not what the page shows, so the page is read from the DOM
+var columns = table.settings ? table.settings()[0].aoColumns.map(function (c) {
+    if (c.mRender || c.render) { return null; }
+    return typeof c.mData === 'string' || typeof c.mData === 'number' ? c.mData : null;
+}) : null;
+table.page(arguments[2]).draw('page');
+return {url: typeof url === 'string' ? url : null, serverSide: serverSide, columns: columns};
+"""
+
+IS_READY_JS = """
+return !!(window.jQuery && jQuery.fn.dataTable && jQuery.fn.dataTable.isDataTable('#' + arguments[0]));
+"""
+
+PAGE_INFO_JS = "return jQuery('#' + arguments[0]).DataTable().page.info();"
+
+XHR_TYPES = ("XHR", "Fetch")
+RESPONSE_POLL_SECONDS = 0.05
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+# session id -> {"requests": {requestId: url}, "finished": [requestId]} of capturing drivers
+_captures = {}
+
+
+def chrome_options(extra_arguments=(), capture_network=False):
+    """Return the headless Chrome options shared by every scraper"""
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920x1080")
+    options.add_argument("--log-level=3")
+    for argument in extra_arguments:
+        options.add_argument(argument)
+    if capture_network:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def create_driver(service, extra_arguments=(), capture_network=False):
+    """Start a headless Chrome instance, optionally recording its XHR responses"""
+    with nepse_metrics.timer("driver_start"):
+        driver = webdriver.Chrome(service=service, options=chrome_options(extra_arguments, capture_network))
+    if capture_network:
+        enable_network_capture(driver)
+    return driver
+
+
+def enable_network_capture(driver):
+    """Turn on the DevTools Network domain for a driver started with the performance log"""
+    driver.execute_cdp_cmd("Network.enable", {})
+    _captures[driver.session_id] = {"requests": {}, "finished": []}
+    driver.get_log("performance")  # Drop what the start-up produced
+
+
+def is_capturing(driver):
+    return driver.session_id in _captures
+
+
+def cell_text(value):
+    """Return the visible text of a payload cell (tags stripped, entities decoded)"""
+    if value is None:
+        return ""
+    return html.unescape(TAG_PATTERN.sub("", str(value))).strip()
+
+
+def _poll_network(driver):
+    """Move finished XHR/Fetch requests from the performance log into the capture state"""
+    capture = _captures[driver.session_id]
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        method, params = message.get("method"), message.get("params", {})
+        if method == "Network.responseReceived" and params.get("type") in XHR_TYPES:
+            capture["requests"][params["requestId"]] = params["response"]["url"]
+        elif method == "Network.loadingFinished" and params.get("requestId") in capture["requests"]:
+            capture["finished"].append(params["requestId"])
+
+
+def captured_responses(driver, url_part=""):
+    """Return [(url, body text)] of the finished XHR/Fetch responses since the last call whose URL contains url_part"""
+    _poll_network(driver)
+    capture = _captures[driver.session_id]
+    responses = []
+    for request_id in capture["finished"]:
+        url = capture["requests"].pop(request_id, "")
+        if url_part not in url:
+            continue
+        try:
+            body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except WebDriverException:
+            continue  # Evicted from the DevTools buffer; the caller falls back to the DOM
+        text = base64.b64decode(body["body"]).decode("utf-8") if body.get("base64Encoded") else body["body"]
+        responses.append((url, text))
+    capture["finished"].clear()
+    return responses
+
+
+def wait_for_response(driver, url_part, timeout=30):
+    """Return the parsed JSON of the next XHR/Fetch response whose URL contains url_part"""
+    deadline = time.monotonic() + timeout
+    while True:
+        for _, text in captured_responses(driver, url_part):
+            try:
+                return json.loads(text)
+            except ValueError:
+                continue
+        if time.monotonic() > deadline:
+            raise TimeoutException(f"no XHR response from {url_part!r} within {timeout}s")
+        time.sleep(RESPONSE_POLL_SECONDS)
+
+
+def payload_rows(payload, columns=None):
+    """
+    Return the rows of a DataTables server-side payload as lists of cell text.
+
+    Rows may be arrays, or objects mapped through the columns' data keys;
+    returns None when they cannot be mapped, including when a column is
+    rendered client-side (its data key is None).
+    """
+    rows = payload.get("data", payload.get("aaData")) if isinstance(payload, dict) else None
+    if not isinstance(rows, list):
+        return None
+    if columns is not None and any(key is None for key in columns):
+        return None
+    if rows and isinstance(rows[0], dict):
+        if not columns:
+            return None
+        return [[cell_text(row.get(key)) for key in columns] for row in rows]
+    return [[cell_text(cell) for cell in row] for row in rows]
+
+
+def wait_for_table(driver, table_id, timeout=20):
+    """Wait until the DataTable is initialised"""
+    WebDriverWait(driver, timeout).until(lambda d: d.execute_script(IS_READY_JS, table_id))
+
+
+def table_info(driver, table_id):
+    """Return DataTables page.info() (page, pages, length, recordsTotal, recordsDisplay)"""
+    return driver.execute_script(PAGE_INFO_JS, table_id)
+
+
+def read_table_headers(driver, table_id):
+    """Return the header labels of the table"""
+    return driver.execute_script(READ_HEADERS_JS, table_id)
+
+
+def read_table_rows(driver, table_id, min_cells=1):
+    """Return the current page's rows as lists of cell text"""
+    with nepse_metrics.timer("table_extract", table=table_id):
+        rows = driver.execute_script(READ_ROWS_JS, table_id)
+    return [row for row in rows if len(row) >= min_cells]
+
+
+def draw_table(driver, table_id, page=0, page_size=None, min_cells=1, timeout=30):
+    """Redraw the table at page (and page length) and return its rows"""
+    capturing = is_capturing(driver)
+    with nepse_metrics.timer("table_draw", table=table_id, page=page):
+        if capturing:
+            captured_responses(driver)  # Only responses to this draw count
+        source = driver.execute_script(DRAW_JS, table_id, page_size, page) or {}
+        rows = None
+        if capturing and source.get("url") and source.get("serverSide"):
+            # The rows come straight from the ajax response instead of being
+            # read back from the DOM; a client-side table sends no request on a
+            # page draw
+            try:
+                rows = payload_rows(wait_for_response(driver, source["url"].split("?")[0], timeout), source.get("columns"))
+            except TimeoutException:
+                rows = None
+        # Always let the draw finish, so the next draw (or a DOM read) never
+        # overlaps this one and page.info() reflects the page just returned
+        WebDriverWait(driver, timeout).until(lambda d: d.execute_script("return window.__nepseDrawDone === true"))
+    nepse_metrics.inc("pages", table=table_id)
+    if rows is None:
+        return read_table_rows(driver, table_id, min_cells)
+    nepse_metrics.inc("xhr_pages", table=table_id)
+    return [row for row in rows if len(row) >= min_cells]
+
+
+def pick_page_size(driver, table_id, records_total, min_cells=1, candidates=PAGE_SIZE_CANDIDATES):
+    """
+    Return (page_size, first_page_rows) using the largest length the backend honours.
+
+    When the server caps the length it returns fewer rows than requested while
+    more records remain; the size it actually returned is used instead so page
+    offsets stay aligned.
+    """
+    for candidate in candidates:
+        try:
+            rows = draw_table(driver, table_id, 0, candidate, min_cells)
+        except Exception:
+            continue
+        expected = records_total if candidate < 0 else min(candidate, records_total)
+        if len(rows) >= expected:
+            return (max(records_total, 1) if candidate < 0 else candidate), rows
+        if rows:
+            return len(rows), draw_table(driver, table_id, 0, len(rows), min_cells)
+    return 50, draw_table(driver, table_id, 0, 50, min_cells)
+
+
+def read_all_rows(driver, table_id, min_cells=1):
+    """Return every row of the table using the fewest draws possible"""
+    records_total = table_info(driver, table_id)["recordsDisplay"]
+    page_size, rows = pick_page_size(driver, table_id, records_total, min_cells)
+    for page in range(1, math.ceil(records_total / page_size)):
+        rows.extend(draw_table(driver, table_id, page, None, min_cells))
+    return rows
@@ -0,0 +1,108 @@
+"""
+Trading calendar helpers.
+
+The calendar (other_nepse_detail/trading_calendar.csv) has one row per day:
+Date, IsTradingDay, HolidayName. Fridays and Saturdays are weekends; public
+holidays come from the nepalstock holiday listing.
+"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+
+def add_weekend_holidays_for_month(year, month, calendar_df):
+    """
+    Add weekend holidays (Friday and Saturday) and weekday trading days for a given month
+    """
+    month_name = datetime(year, month, 1).strftime("%B %Y")
+    print(f"\n🔍 Processing {month_name}...")
+    
+    # Get first and last day of the month
+    first_day = datetime(year, month, 1)
+    if month == 12:
+        last_day = datetime(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        last_day = datetime(year, month + 1, 1) - timedelta(days=1)
+    
+    # Get all dates in the month
+    current = first_day
+    weekends_added = 0
+    weekdays_added = 0
+    weekends_existing = 0
+    weekends_corrected = 0
+    
+    while current <= last_day:
+        date_str = current.strftime("%Y-%m-%d")
+        weekday = current.weekday()
+        
+        # Friday = 4, Saturday = 5
+        if weekday in [4, 5]:
+            # Check if date exists in calendar
+            mask = calendar_df['date_str'] == date_str
+            
+            if mask.any():
+                # Date exists - check if it's correctly marked as weekend
+                existing_row = calendar_df[mask].iloc[0]
+                is_trading_day = existing_row['IsTradingDay']
+                holiday_name = existing_row['HolidayName']
+                
+                if is_trading_day == False:
+                    # Already marked as non-trading day (weekend or holiday)
+                    # Only update HolidayName to "Weekend" if it's empty/None (don't overwrite public holidays)
+                    if pd.isna(holiday_name) or holiday_name == '' or holiday_name == 'Weekend':
+                        if holiday_name != 'Weekend':
+                            calendar_df.loc[mask, 'HolidayName'] = 'Weekend'
+                            weekends_corrected += 1
+                            print(f"  ✏️ Corrected {date_str} to Weekend")
+                        else:
+                            weekends_existing += 1
+                    else:
+                        # Already has a public holiday name - don't overwrite it
+                        weekends_existing += 1
+                else:
+                    # IsTradingDay is True but it's a weekend - correct it
+                    calendar_df.loc[mask, 'IsTradingDay'] = False
+                    calendar_df.loc[mask, 'HolidayName'] = 'Weekend'
+                    weekends_corrected += 1
+                    print(f"  ✏️ Corrected {date_str} to Weekend")
+            else:
+                # Date doesn't exist - add it as weekend
+                new_row = pd.DataFrame([{
+                    'Date': current,
+                    'IsTradingDay': False,
+                    'HolidayName': 'Weekend'
+                }])
+                calendar_df = pd.concat([calendar_df, new_row], ignore_index=True)
+                calendar_df['date_str'] = calendar_df['Date'].dt.strftime("%Y-%m-%d")  # Update date_str
+                weekends_added += 1
+                print(f"  ➕ Added {date_str} as Weekend")
+        else:
+            # Weekday (not weekend) - ensure it exists as trading day
+            mask = calendar_df['date_str'] == date_str
+            if not mask.any():
+                # Date doesn't exist - add it as trading day (will be updated if it's a public holiday)
+                new_row = pd.DataFrame([{
+                    'Date': current,
+                    'IsTradingDay': True,
+                    'HolidayName': ''
+                }])
+                calendar_df = pd.concat([calendar_df, new_row], ignore_index=True)
+                calendar_df['date_str'] = calendar_df['Date'].dt.strftime("%Y-%m-%d")  # Update date_str
+                weekdays_added += 1
+        
+        current += timedelta(days=1)
+    
+    # Only print summary if something changed
+    if weekends_added > 0 or weekends_corrected > 0 or weekdays_added > 0:
+        print(f"  📊 Summary for {month_name}:")
+        if weekends_existing > 0:
+            print(f"    - Existing weekends: {weekends_existing}")
+        if weekends_added > 0:
+            print(f"    - Added weekends: {weekends_added}")
+        if weekdays_added > 0:
+            print(f"    - Added weekdays: {weekdays_added}")
+        if weekends_corrected > 0:
+            print(f"    - Corrected weekends: {weekends_corrected}")
+    
+    return calendar_df, weekends_added, weekends_corrected
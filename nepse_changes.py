@@ -0,0 +1,201 @@
+"""
+Change feed for incremental downstream sync.
+
+Every git commit of new data also adds one feed file with only the rows that
+commit added or changed, so a consumer can stay in sync by applying the feed
+files in order instead of re-reading every CSV:
+
+    changes/<SEQ>_<YYYY-MM-DD>.jsonl     one JSON object per line
+    changes/index.csv                    Seq, File, Job, CreatedAt, Records,
+                                         Symbols, FirstDate, LastDate, Sha256
+
+Records ("op" field):
+- upsert  {"seq", "op", "symbol", "sector", "Date", "Open", ..., "Turnover"};
+          values are the stored strings, so an applied row is byte-identical
+- move    {"seq", "op", "symbol", "sector", "previous_sector"}
+- delist  {"seq", "op", "symbol", "sector"}; the history moves to the archive
+
+The writers call changed_rows() before an upsert (only the stored rows from
+the oldest scraped Date on are read), record() after it, discard() when a
+validation rollback drops a symbol, and flush() right before the staged
+commit that precedes git, so feed files and data always land together.
+Sequence numbers are consecutive, so a consumer can tell when it missed one.
+
+Usage:
+    python nepse_changes.py                               # list the feed
+    python nepse_changes.py apply --feed ../Nepal_Stock_Data/changes --since 41
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+from datetime import date, datetime
+
+import pandas as pd
+
+import nepse_shards
+import nepse_staging
+from nepse_common import BASE_FOLDER, PRICE_COLUMNS, filename_safe
+from nepse_registry import ARCHIVE_FOLDER
+
+FEED_FOLDER = "changes"
+INDEX_NAME = "index.csv"
+INDEX_COLUMNS = ["Seq", "File", "Job", "CreatedAt", "Records", "Symbols", "FirstDate", "LastDate", "Sha256"]
+ROW_COLUMNS = PRICE_COLUMNS[1:]
+
+_lock = threading.Lock()
+_pending = []
+
+
+def load_index(feed_folder=FEED_FOLDER):
+    """Return the feed index rows in sequence order"""
+    path = nepse_staging.current_path(os.path.join(feed_folder, INDEX_NAME))
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return sorted(csv.DictReader(file), key=lambda row: int(row["Seq"]))
+
+
+def changed_rows(csv_path, new_df):
+    """
+    Return the rows of new_df that are new or differ from the stored history.
+
+    Call it before upserting new_df. Duplicate Dates keep the first row (the
+    row the upsert keeps); only stored rows from the oldest new Date on are read.
+    """
+    new_df = new_df.drop_duplicates("Date", keep="first")
+    if new_df.empty:
+        return new_df
+    stored = {row[1]: row[2:9] for row in nepse_shards.iter_rows(csv_path, start=min(new_df["Date"]))}
+    values = new_df[ROW_COLUMNS[1:]].astype(str).values.tolist()
+    keep = [stored.get(day) != row for day, row in zip(new_df["Date"], values)]
+    return new_df[keep]
+
+
+def record(symbol, sector, rows_df):
+    """Queue upsert records for rows (PRICE_COLUMNS frame) written to symbol's history"""
+    records = [
+        {"op": "upsert", "symbol": symbol, "sector": sector, **dict(zip(ROW_COLUMNS, map(str, row)))}
+        for row in rows_df[ROW_COLUMNS].itertuples(index=False)
+    ]
+    with _lock:
+        _pending.extend(records)
+
+
+def record_event(op, symbol, **fields):
+    """Queue a move or delist record"""
+    with _lock:
+        _pending.append({"op": op, "symbol": symbol, **fields})
+
+
+def discard(symbol):
+    """Drop the queued records of symbol (its writes were rolled back)"""
+    with _lock:
+        _pending[:] = [item for item in _pending if item["symbol"] != symbol]
+
+
+def flush(job, feed_folder=FEED_FOLDER, today=None):
+    """Stage the queued records as the next feed file and index row; returns its Seq (None if nothing queued)"""
+    with _lock:
+        records = list(_pending)
+        _pending.clear()
+    if not records:
+        return None
+
+    index = load_index(feed_folder)
+    seq = int(index[-1]["Seq"]) + 1 if index else 1
+    name = f"{seq:06d}_{today or date.today().isoformat()}.jsonl"
+    body = "".join(json.dumps({"seq": seq, **item}, separators=(",", ":")) + "\n" for item in records).encode("utf-8")
+    with nepse_staging.open_staged(os.path.join(feed_folder, name), "wb") as file:
+        file.write(body)
+
+    dates = [item["Date"] for item in records if item["op"] == "upsert"]
+    index.append({
+        "Seq": seq,
+        "File": name,
+        "Job": job,
+        "CreatedAt": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "Records": len(records),
+        "Symbols": len({item["symbol"] for item in records}),
+        "FirstDate": min(dates, default=""),
+        "LastDate": max(dates, default=""),
+        "Sha256": hashlib.sha256(body).hexdigest(),
+    })
+    with nepse_staging.open_staged(os.path.join(feed_folder, INDEX_NAME), "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=INDEX_COLUMNS)
+        writer.writeheader()
+        writer.writerows(index)
+    print(f"📰 Change feed #{seq}: {len(records)} record(s) in {name}")
+    return seq
+
+
+def _data_path(folder, sector, symbol):
+    return os.path.join(folder, sector, f"{filename_safe(symbol)}.csv")
+
+
+def apply(feed_folder, since=0, base_folder=BASE_FOLDER, archive_folder=ARCHIVE_FOLDER):
+    """
+    Apply the feed files after Seq since to a copy of the dataset; returns the last applied Seq.
+
+    Each feed file is checked against its index checksum and committed as one
+    staged batch, so an interrupted sync resumes from the last applied file.
+    """
+    last = since
+    for entry in load_index(feed_folder):
+        seq = int(entry["Seq"])
+        if seq <= since:
+            continue
+        if seq != last + 1:
+            raise ValueError(f"feed file #{last + 1} is missing (next is #{seq})")
+        with open(os.path.join(feed_folder, entry["File"]), "rb") as file:
+            body = file.read()
+        if hashlib.sha256(body).hexdigest() != entry["Sha256"]:
+            raise ValueError(f"checksum mismatch in {entry['File']}")
+
+        upserts = {}
+        for line in body.decode("utf-8").splitlines():
+            item = json.loads(line)
+            if item["op"] == "upsert":
+                upserts.setdefault((item["symbol"], item["sector"]), []).append(["", *(item[col] for col in ROW_COLUMNS)])
+                continue
+            # Rows queued before a move or delist belong to the old location
+            for (symbol, sector), rows in list(upserts.items()):
+                if symbol == item["symbol"]:
+                    nepse_shards.upsert(_data_path(base_folder, sector, symbol), pd.DataFrame(rows, columns=PRICE_COLUMNS), symbol)
+                    del upserts[(symbol, sector)]
+            if item["op"] == "move":
+                source = _data_path(base_folder, item["previous_sector"], item["symbol"])
+                destination = _data_path(base_folder, item["sector"], item["symbol"])
+            else:
+                source = _data_path(base_folder, item["sector"], item["symbol"])
+                destination = _data_path(archive_folder, item["sector"], item["symbol"])
+            if nepse_shards.exists(source):
+                nepse_shards.relocate(source, destination)
+        for (symbol, sector), rows in upserts.items():
+            nepse_shards.upsert(_data_path(base_folder, sector, symbol), pd.DataFrame(rows, columns=PRICE_COLUMNS), symbol)
+        nepse_staging.commit()
+        last = seq
+    return last
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the change feed, or apply it to a copy of the dataset")
+    parser.add_argument("action", nargs="?", choices=["list", "apply"], default="list")
+    parser.add_argument("--feed", default=FEED_FOLDER, help="Feed folder to read")
+    parser.add_argument("--since", type=int, default=0, help="Last Seq already applied")
+    parser.add_argument("--data", default=BASE_FOLDER, help="Dataset folder to apply the feed to")
+    args = parser.parse_args()
+
+    if args.action == "list":
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        for entry in load_index(args.feed)[-30:]:
+            print(f"#{entry['Seq']:>6} {entry['CreatedAt']} {entry['Job']:<24} {entry['Records']:>6} record(s), "
+                  f"{entry['Symbols']:>4} symbol(s), {entry['FirstDate']} → {entry['LastDate']}")
+    else:
+        nepse_staging.begin("nepse_changes")
+        archive = os.path.join(os.path.dirname(os.path.abspath(args.data)), ARCHIVE_FOLDER)
+        last = apply(args.feed, args.since, args.data, archive)
+        print(f"✅ Applied the feed up to #{last}; pass --since {last} next time")
@@ -0,0 +1,134 @@
+"""
+Shared constants and helpers for the NEPSE price history CSVs.
+
+Every file under Nepse_Data/<Sector>/<SYMBOL>.csv has the same layout as the
+sharesansar price-history table: S.N., Date, Open, High, Low, Ltp, % Change,
+Qty, Turnover. Qty and Turnover are stored with quoted thousands separators. A symbol can
+also be stored as year shards (Nepse_Data/<Sector>/<SYMBOL>/<YEAR>.csv, see
+nepse_shards); the loaders here read both layouts.
+"""
+
+import glob
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_FOLDER = "Nepse_Data"
+OTHER_DETAIL_FOLDER = "other_nepse_detail"
+LISTED_COMPANY_PATH = os.path.join(OTHER_DETAIL_FOLDER, "listed_company.csv")
+
+PRICE_COLUMNS = ["S.N.", "Date", "Open", "High", "Low", "Ltp", "% Change", "Qty", "Turnover"]
+NUMERIC_COLUMNS = ["Open", "High", "Low", "Ltp", "% Change", "Qty", "Turnover"]
+
+# Site roots; point them at benchmarks/mock_server.py to scrape offline
+SHARESANSAR_URL = os.getenv("SHARESANSAR_URL", "https://www.sharesansar.com").rstrip("/")
+NEPALSTOCK_URL = os.getenv("NEPALSTOCK_URL", "https://nepalstock.com.np").rstrip("/")
+
+
+def filename_safe(symbol):
+    """Return the file name stem used for a symbol ('/' is not allowed in paths)"""
+    return symbol.strip().replace('/', '_')
+
+
+def listed_sectors():
+    """Map every file-safe listed symbol to its sector, from the symbol registry"""
+    import nepse_registry  # Deferred: nepse_registry imports this module
+
+    return {
+        filename_safe(record["Symbol"]): record["Sector"]
+        for record in nepse_registry.load_registry().values()
+        if record["Status"] == nepse_registry.LISTED
+    }
+
+
+def symbol_csv_paths(base_folder=BASE_FOLDER):
+    """
+    Map every file-safe symbol to its (sector, csv path) under base_folder.
+
+    A symbol that moved sectors can have a stale file left in its old sector
+    folder; the sector listed in the symbol registry wins in that case.
+    """
+    listed = listed_sectors()
+    paths = {}
+    flat = glob.glob(os.path.join(base_folder, "*", "*.csv"))
+    sharded = [f"{folder}.csv" for folder in glob.glob(os.path.join(base_folder, "*", "*")) if os.path.isdir(folder)]
+    for csv_path in sorted(set(flat) | set(sharded)):
+        sector = os.path.basename(os.path.dirname(csv_path))
+        symbol = os.path.splitext(os.path.basename(csv_path))[0]
+        if symbol in paths and listed.get(symbol) != sector:
+            continue
+        paths[symbol] = (sector, csv_path)
+    return paths
+
+
+def read_price_csv(csv_path):
+    """Read a price history CSV (or its year shards) with numeric columns parsed, oldest row first"""
+    import nepse_shards  # Deferred: nepse_shards imports this module
+
+    files = nepse_shards.history_files(csv_path) or [csv_path]
+    df = pd.concat([pd.read_csv(path, encoding="utf-8", thousands=",") for path in files], ignore_index=True)
+    df["Date"] = pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce")
+    return df.sort_values("Date", kind="stable").reset_index(drop=True)
+
+
+def load_price_dataset(base_folder=BASE_FOLDER, symbols=None):
+    """
+    Read many price CSVs in a single parse and return one frame in file order.
+
+    The header line of every file is dropped and the bodies are concatenated,
+    which is several times faster than one read_csv per file. A categorical
+    Symbol column and a Sector column identify the source file of each row;
+    Date is kept as the raw string so unparseable values can be reported.
+
+    df.attrs["file_rows"] and df.attrs["file_oldest_first"] give the row count
+    and order of each source file in turn (year shards are oldest-first, flat
+    files newest-first).
+    """
+    import nepse_shards  # Deferred: nepse_shards imports this module
+
+    paths = symbol_csv_paths(base_folder)
+    if symbols is not None:
+        paths = {symbol: paths[symbol] for symbol in symbols if symbol in paths}
+
+    chunks = []
+    counts = []
+    file_rows = []
+    file_oldest_first = []
+    for symbol, (sector, csv_path) in paths.items():
+        count = 0
+        sharded = nepse_shards.is_sharded(csv_path)
+        for path in nepse_shards.history_files(csv_path):
+            with open(path, "rb") as file:
+                data = file.read()
+            header_end = data.find(b"\n") + 1
+            body = data[header_end:] if header_end else b""
+            if body and not body.endswith(b"\n"):
+                body += b"\n"
+            chunks.append(body)
+            count += body.count(b"\n")
+            file_rows.append(body.count(b"\n"))
+            file_oldest_first.append(sharded)
+        counts.append(count)
+
+    data = b"".join(chunks)
+    if not data:
+        return pd.DataFrame(columns=PRICE_COLUMNS + ["Symbol", "Sector"])
+    df = pd.read_csv(
+        io.BytesIO(data),
+        header=None,
+        names=PRICE_COLUMNS,
+        thousands=",",
+        dtype={"Date": str},
+        skip_blank_lines=False,
+    )
+    symbol_names = list(paths)
+    sector_names = sorted({sector for sector, _ in paths.values()})
+    sector_codes = np.array([sector_names.index(paths[s][0]) for s in symbol_names], dtype=int)
+    codes = np.repeat(np.arange(len(symbol_names)), counts)
+    df["Symbol"] = pd.Categorical.from_codes(codes, categories=symbol_names)
+    df["Sector"] = pd.Categorical.from_codes(sector_codes[codes], categories=sector_names)
+    df.attrs["file_rows"] = file_rows
+    df.attrs["file_oldest_first"] = file_oldest_first
+    return df
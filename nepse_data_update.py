@@ -1,19 +1,38 @@
-import csv
+import argparse
+import math
 import os
+import shutil
 import time
 import pandas as pd
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import StaleElementReferenceException
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 import requests
 import sys
+import threading
 from dotenv import load_dotenv
 import subprocess
+import nepse_adjustments
+import nepse_browser
+import nepse_changes
+import nepse_http
+import nepse_live
+import nepse_merge
+import nepse_metrics
+import nepse_partition
+import nepse_pipeline
+import nepse_profiling
+import nepse_registry
+import nepse_returns
+import nepse_scheduler
+import nepse_shards
+import nepse_snapshot
+import nepse_staging
+import nepse_validation
+from nepse_common import PRICE_COLUMNS, SHARESANSAR_URL
 
 load_dotenv()
 # GitHub Credentials
@@ -41,6 +60,25 @@ else:
 
 print(f"📂 Root path set to: {root_path}")
 os.chdir(root_path)
+parser = argparse.ArgumentParser(description="Scrape the latest NEPSE prices into Nepse_Data")
+parser.add_argument("--all", action="store_true", help="Visit every listed symbol, ignoring the adaptive schedule")
+parser.add_argument("--budget", type=nepse_scheduler.parse_duration,
+                    help="Stop cleanly before this run time (seconds, or e.g. 90m, 4h); the rest waits for the next run")
+parser.add_argument("--profile", action="store_true", help="Profile the main stages")
+parser.add_argument("--fetch-workers", type=int, default=1,
+                    help="Browsers fetching pages in parallel while earlier symbols are parsed and written")
+sharding = parser.add_mutually_exclusive_group()
+sharding.add_argument("--shard", type=nepse_partition.parse_shard, metavar="i/N",
+                      help="Scrape only shard i of N and leave the results in shard_results/ instead of committing")
+sharding.add_argument("--merge-shards", metavar="FOLDER",
+                      help="Skip the browser: write, validate and commit the shard artifacts under FOLDER once")
+args, _ = parser.parse_known_args()  # Tolerates the extra arguments of notebook kernels
+run_started = time.perf_counter()
+deadline = run_started + args.budget - nepse_scheduler.WRAP_UP_SECONDS if args.budget else None
+nepse_metrics.start_job("nepse_data_update")
+if nepse_profiling.profile_requested():
+    nepse_profiling.enable("nepse_data_update")
+nepse_staging.begin("nepse_data_update")
 
 # Define path to repo folder
 folder_path = os.path.join(root_path, GITHUB_REPO)
@@ -74,6 +112,40 @@ os.system(f"git config --global user.name {GITHUB_USERNAME}")
 
 # Define base directory
 BASE_FOLDER = "Nepse_Data"
+BOOKKEEPING_PATHS = [nepse_adjustments.CACHE_PATH, nepse_validation.REPORT_PATH, nepse_merge.CONFLICT_LOG_PATH, nepse_registry.REGISTRY_PATH,
+                     nepse_scheduler.SCHEDULE_PATH, nepse_snapshot.SNAPSHOT_PATH, nepse_changes.FEED_FOLDER, nepse_live.LIVE_BARS_PATH]
+
+
+def git_commit_and_push(directories, commit_message, name, sector=""):
+    """Git add the directories and the bookkeeping files that exist, commit and push; returns True once committed"""
+    add_paths = " ".join(f'"{path}"' for path in directories + BOOKKEEPING_PATHS if os.path.exists(path))
+    with nepse_metrics.timer("git", sector=sector):
+        result = subprocess.run(f'git add {add_paths}', shell=True, capture_output=True, text=True)
+    print(f"Git add output: {result.stdout}")
+    if result.returncode != 0:
+        print(f"❌ Git add failed: {result.stderr}")
+        return False
+
+    with nepse_metrics.timer("git", sector=sector):
+        result = subprocess.run(f'git commit -m "{commit_message}" --allow-empty', shell=True, capture_output=True, text=True)
+    print(f"Git commit output: {result.stdout}")
+    if result.returncode != 0:
+        print(f"❌ Git commit failed: {result.stderr}")
+        return False
+
+    if push_enabled:
+        with nepse_metrics.timer("git", sector=sector):
+            result = subprocess.run("git push origin main", shell=True, capture_output=True, text=True)
+        print(f"Git push output: {result.stdout}")
+        if result.returncode != 0:
+            print(f"❌ Git push failed: {result.stderr}")
+            print("Hint: Ensure GITHUB_TOKEN is set in your .env file and has write access to the repository for pushing changes.")
+        else:
+            print(f"✅ Successfully pushed {name} data to repository.\n")
+    else:
+        print(f"⚠️ Git push skipped for {name} because GITHUB_TOKEN is not set or push is disabled.\n")
+    return True
+
 listed_company = "other_nepse_detail/listed_company.csv"
 
 # GitHub raw file URL
@@ -84,11 +156,12 @@ if not os.path.exists(listed_company):
     print(f"⚠️ File '{listed_company}' not found! Downloading from GitHub...")
 
     try:
-        response = requests.get(GITHUB_RAW_URL, timeout=10)
+        response = nepse_http.get(GITHUB_RAW_URL, ttl=24 * 3600)
         response.raise_for_status()  # Raise error for bad responses (4xx, 5xx)
 
-        with open(listed_company, "wb") as file:
+        with nepse_staging.open_staged(listed_company, "wb") as file:
             file.write(response.content)
+        nepse_staging.commit()
 
         print(f"✅ Successfully downloaded '{listed_company}' from GitHub.")
 
@@ -96,205 +169,322 @@ if not os.path.exists(listed_company):
         print(f"❌ Failed to download file: {e}")
         exit(1)  # Exit script if download fails
 
-# Read the CSV file
-with open(listed_company, 'r', encoding='utf-8') as file:
-    reader = list(csv.reader(file))
-    categories = reader[0]
-    symbols_by_category = list(zip(*reader[1:]))
-print("✅ Successfully loaded symbol data.")
-
-# Configure Selenium WebDriver
-chrome_options = Options()
-chrome_options.add_argument("--headless=new")  # New headless mode (recommended)
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920x1080")
-chrome_options.add_argument("--log-level=3")
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=chrome_options)
-wait = WebDriverWait(driver, 3)
-
-# Process each category and its symbols
-for category, symbols in zip(categories, symbols_by_category):
-    if not category.strip():
-        continue
-
-    category_folder = os.path.join(BASE_FOLDER, category.strip())
-    os.makedirs(category_folder, exist_ok=True)
-    
-    # Track sector-level updates
-    sector_has_updates = False
-    sector_latest_date = None
-    sector_updated_symbols = []
-
-    print(f"\n{'='*60}")
-    print(f"🔄 Processing Sector: {category.strip()}")
-    print(f"{'='*60}")
-
-    for symbol in symbols:
-        symbol = symbol.strip()
-        if not symbol:
-            continue
-
-        # make a filename-safe symbol for saving (replace '/' with '_')
-        filename_safe = symbol.replace('/', '_')
-        csv_filename = os.path.join(category_folder, f"{filename_safe}.csv")
-
-        # use the original symbol (lowercased) when constructing the site URL
-        url = f"https://www.sharesansar.com/company/{symbol.lower()}"
+# Plan the run from the adaptive schedule: frequently traded symbols every
+# day and first, rarely traded ones only when their cadence is due. A shard
+# runner plans only its own slice; the merge job replays what the shards visited
+schedule = nepse_scheduler.refresh()
+merged_rows = merged_checked = None
+if args.merge_shards:
+    try:
+        merged_rows, merged_checked = nepse_partition.load_artifacts(args.merge_shards)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Shard artifacts under {args.merge_shards} are incomplete or invalid: {e}")
+        exit(1)
+    planned = [symbol for symbol in merged_checked if symbol in schedule]
+else:
+    scope = {symbol: schedule[symbol] for symbol in nepse_partition.select(schedule, args.shard)} if args.shard else schedule
+    planned = nepse_scheduler.plan(scope, budget_seconds=args.budget or nepse_scheduler.DEFAULT_BUDGET_SECONDS, force_all=args.all)
+sector_batches = nepse_scheduler.group_by_sector(planned, schedule)
+print(f"✅ Planned {len(planned)} of {len(schedule)} listed symbols:")
+print(nepse_scheduler.summary(schedule, planned))
+if args.shard:
+    print(f"🧩 Shard {args.shard[0]}/{args.shard[1]}: results go to {nepse_partition.shard_folder(args.shard)}, nothing is committed")
+elif args.merge_shards:
+    print(f"🧩 Merging {len(merged_checked)} visited symbol(s) and {sum(map(len, merged_rows.values()))} row(s) from {args.merge_shards}")
+if deadline:
+    print(f"⏱️ Run budget {args.budget / 60:.0f} min; stopping before the deadline if needed")
+
+# Configure Selenium WebDriver; table pages are read from the captured XHR
+# responses instead of the rendered DOM. Every fetch worker drives its own browser
+PRICE_TABLE_ID = "myTableCPriceHistory"
+PAGE_SIZE = 50
+service = Service(ChromeDriverManager().install()) if merged_rows is None else None
+browser = threading.local()
+drivers = []
+drivers_lock = threading.Lock()
+
+
+def fetch_rows(symbol, csv_filename, category):
+    """Return the rows of symbol newer than its stored history (None if its page failed)"""
+    if not hasattr(browser, "driver"):
+        browser.driver = nepse_browser.create_driver(service, capture_network=True)
+        browser.wait = WebDriverWait(browser.driver, 3)
+        with drivers_lock:
+            drivers.append(browser.driver)
+    driver, wait = browser.driver, browser.wait
+
+    # use the original symbol (lowercased) when constructing the site URL
+    url = f"{SHARESANSAR_URL}/company/{symbol.lower()}"
+    with nepse_metrics.timer("page_load", symbol=symbol):
         driver.get(url)
-        time.sleep(1)
 
-        try:
+    try:
+        with nepse_metrics.timer("open_price_history", symbol=symbol):
             price_history_button = wait.until(EC.element_to_be_clickable((By.ID, "btn_cpricehistory")))
             price_history_button.click()
-            time.sleep(1)
-        except Exception as e:
-            print(f"⚠️ Error accessing price history for {symbol}: {e}")
-            continue
-
+            nepse_browser.wait_for_table(driver, PRICE_TABLE_ID)
+        records_total = nepse_browser.table_info(driver, PRICE_TABLE_ID)["recordsDisplay"]
+    except Exception as e:
+        print(f"⚠️ Error accessing price history for {symbol}: {e}")
+        nepse_metrics.inc("failures", symbol=symbol, sector=category)
+        return None
+
+    # Determine the latest date already present (if any); the history is
+    # streamed, never loaded, so memory does not grow with its length
+    latest_date = None
+    if nepse_shards.exists(csv_filename):
         try:
-            select_element = wait.until(EC.presence_of_element_located((By.NAME, "myTableCPriceHistory_length")))
-            Select(select_element).select_by_value("50")
-            time.sleep(1)
+            latest_date = nepse_shards.latest_stored_date(csv_filename)
+            print(f"📌 {symbol}: Latest data in CSV is from {latest_date}")
         except Exception as e:
-            print(f"⚠️ Failed to change display option for {symbol}: {e}")
-            continue
-
-        # Determine the latest date already present (if any)
-        latest_date = None
-        existing_df = None
-        if os.path.exists(csv_filename):
-            try:
-                existing_df = pd.read_csv(csv_filename, encoding="utf-8")
-                latest_date = existing_df["Date"].astype(str).max()
-                print(f"📌 {symbol}: Latest data in CSV is from {latest_date}")
-            except Exception as e:
-                print(f"⚠️ Error reading {csv_filename}: {e}")
-
-        new_data = []
-        page_count = 0
-        stop_scraping = False
-
-        # Loop until the "Next" button is disabled or no longer available
-        while True:
-            page_count += 1
-            print(f"🔍 Scraping {symbol} - processing page {page_count}")
+            print(f"⚠️ Error reading {csv_filename}: {e}")
+    # A live bar (nepse_live) of the newest day is provisional: that day is
+    # scraped again so the official row replaces it
+    provisional = latest_date is not None and nepse_live.is_provisional(symbol, latest_date)
+
+    new_data = []
+    stop_scraping = False
+
+    with nepse_metrics.timer("scrape_pages", symbol=symbol):
+        # Newest rows first, PAGE_SIZE per page, until stored dates are reached
+        for page in range(max(1, math.ceil(records_total / PAGE_SIZE))):
+            print(f"🔍 Scraping {symbol} - processing page {page + 1}")
+            extract_start = time.perf_counter()
             try:
-                # Re-locate the table on each page to avoid stale element reference
-                table = wait.until(EC.presence_of_element_located((By.XPATH, "//div[@id='cpricehistory']//table")))
-                rows = table.find_elements(By.XPATH, ".//tbody/tr")
-
-                # Iterate through rows and extract data
-                for row in rows:
-                    # Re-locate cells within each row
-                    cells = row.find_elements(By.TAG_NAME, "td")
-                    if len(cells) < 9:
-                        continue
-
-                    data = [cell.text.strip() for cell in cells]
-                    row_date = data[1]
-
-                    # If we already have data and this row is not new, flag to stop scraping further pages
-                    if latest_date and row_date <= latest_date:
-                        stop_scraping = True
-                        break
-                    new_data.append(data)
-
+                rows = nepse_browser.draw_table(driver, PRICE_TABLE_ID, page, PAGE_SIZE if page == 0 else None, min_cells=9)
             except Exception as e:
                 print(f"⚠️ No table found for {symbol}: {e}")
+                nepse_metrics.inc("failures", symbol=symbol, sector=category)
                 break
+            nepse_metrics.observe("table_extract_seconds", time.perf_counter() - extract_start, symbol=symbol)
+
+            for data in rows:
+                row_date = data[1]
+
+                # If we already have data and this row is not new, flag to stop scraping further pages
+                if latest_date and (row_date < latest_date or (row_date == latest_date and not provisional)):
+                    stop_scraping = True
+                    break
+                new_data.append(data)
 
             if stop_scraping:
                 print(f"⏸️ Stopping further scraping for {symbol} as older data encountered.")
                 break
-
-            # Try to find and click the "Next" button; if not available or disabled, break the loop
-            try:
-                next_button = driver.find_element(By.XPATH, "//a[contains(text(),'Next')]")
-                if "disabled" in next_button.get_attribute("class").lower():
-                    print("⏹️ Next button is disabled. Reached last page.")
-                    break
-                next_button.click()
-                time.sleep(1)  # You might need to adjust the wait time
-            except Exception:
-                print("⏹️ No 'Next' button found or an error occurred. Ending pagination.")
+            if not rows:
                 break
+    return new_data
 
-        if new_data:
-            new_df = pd.DataFrame(new_data, columns=["S.N.", "Date", "Open", "High", "Low", "Ltp", "% Change", "Qty", "Turnover"])
-            latest_scraped_date = new_df["Date"].max()  # Get the latest date from new data
-
-            if os.path.exists(csv_filename):
-                updated_df = pd.concat([new_df, existing_df], ignore_index=True)
-            else:
-                updated_df = new_df
-
-            # Optional: convert Date column to datetime and sort (adjust ascending/descending as needed)
-            updated_df["Date"] = pd.to_datetime(updated_df["Date"], format="%Y-%m-%d", errors="coerce")
-            # Sort so that the newest dates appear first; change ascending=True for oldest-first
-            updated_df = updated_df.sort_values(by="Date", ascending=False).reset_index(drop=True)
-            # Reassign S.N. sequentially starting from 1
-            updated_df["S.N."] = updated_df.index + 1
-            # Rearrange columns to place S.N. first
-            cols = ["S.N.", "Date", "Open", "High", "Low", "Ltp", "% Change", "Qty", "Turnover"]
-            updated_df = updated_df[cols]
-
-            # Save updated CSV file
-            updated_df.to_csv(csv_filename, index=False, encoding='utf-8')
-            print(f"✅ New data added for {symbol} in {csv_filename}")
-            
-            # Track sector-level updates
-            sector_has_updates = True
-            sector_updated_symbols.append(symbol)
-            
-            # Update sector latest date (keep the most recent date)
-            if sector_latest_date is None or latest_scraped_date > sector_latest_date:
-                sector_latest_date = latest_scraped_date
 
-        else:
-            print(f"⚠️ No new data found for {symbol}. Skipping update.")
+# Per-batch progress, so the writer commits a sector batch once its last symbol is written
+batches = [{"category": category, "remaining": len(symbols), "updated": [], "latest_date": None}
+           for category, symbols in sector_batches]
+run_state = {"budget_reached": False, "attempted": 0, "deferred": 0}
+run_state_lock = threading.Lock()
+merged_sectors = []
 
-    # Git Add, Commit, and Push for the entire sector
-    if sector_has_updates:
-        print(f"\n{'='*60}")
-        print(f"💾 Committing updates for sector: {category.strip()}")
-        print(f"📊 Updated {len(sector_updated_symbols)} companies: {', '.join(sector_updated_symbols)}")
-        print(f"{'='*60}\n")
-        
-        # Git add only the specific sector directory
-        sector_directory = os.path.join(BASE_FOLDER, category.strip())
-        result = subprocess.run(f'git add "{sector_directory}"', shell=True, capture_output=True, text=True)
-        print(f"Git add output: {result.stdout}")
-        if result.returncode != 0:
-            print(f"❌ Git add failed: {result.stderr}")
-            continue
 
-        # Create commit message with sector name and latest date
-        sector_name = category.strip().replace('_', ' ')
-        commit_message = f'Updated {sector_name} data up to {sector_latest_date}' if sector_latest_date else f'Updated {sector_name} data'
-        
-        result = subprocess.run(f'git commit -m "{commit_message}" --allow-empty', shell=True, capture_output=True, text=True)
-        print(f"Git commit output: {result.stdout}")
-        if result.returncode != 0:
-            print(f"❌ Git commit failed: {result.stderr}")
-            continue
-        
-        if push_enabled:
-            result = subprocess.run("git push origin main", shell=True, capture_output=True, text=True)
-            print(f"Git push output: {result.stdout}")
-            if result.returncode != 0:
-                print(f"❌ Git push failed: {result.stderr}")
-                print("Hint: Ensure GITHUB_TOKEN is set in your .env file and has write access to the repository for pushing changes.")
-            else:
-                print(f"✅ Successfully pushed {sector_name} data to repository.\n")
-        else:
-            print(f"⚠️ Git push skipped for sector {sector_name} because GITHUB_TOKEN is not set or push is disabled.\n")
+def fetch_stage(item):
+    """Pipeline stage 1: load the symbol's page and scrape its new rows (browser time)"""
+    batch_index, symbol = item
+    category = batches[batch_index]["category"]
+    category_folder = os.path.join(BASE_FOLDER, category.strip())
+    # make a filename-safe symbol for saving (replace '/' with '_')
+    csv_filename = os.path.join(category_folder, f"{symbol.replace('/', '_')}.csv")
+    task = {"batch": batch_index, "symbol": symbol, "category": category, "csv": csv_filename, "rows": None, "seconds": 0.0}
+
+    with run_state_lock:
+        if run_state["budget_reached"] or nepse_scheduler.out_of_time(schedule, symbol, deadline):
+            # Stop before the deadline; the finished symbols are still committed
+            run_state["budget_reached"] = True
+            task["deferred"] = True
+            return task
+        run_state["attempted"] += 1
+    symbol_started = time.perf_counter()
+    os.makedirs(category_folder, exist_ok=True)
+
+    if merged_rows is not None:
+        # Merge job: the shard runners already scraped these rows
+        task["rows"] = merged_rows.get(symbol, [])
+        task["seconds"] = merged_checked[symbol][1]
     else:
-        print(f"⚠️ No updates found for sector: {category.strip()}\n")
+        task["rows"] = fetch_rows(symbol, csv_filename, category)
+        task["seconds"] = time.perf_counter() - symbol_started
+    return task
+
+
+def parse_stage(task):
+    """Pipeline stage 2: build the rows frame and diff it against the stored history (CPU)"""
+    if task["rows"] and not args.shard:
+        task["new_df"] = pd.DataFrame(task["rows"], columns=PRICE_COLUMNS)
+        task["changed"] = nepse_changes.changed_rows(task["csv"], task["new_df"])
+    return task
+
+
+def write_stage(task):
+    """Pipeline stage 3 (single thread): upsert, bookkeeping, and the sector commit"""
+    symbol, category = task["symbol"], task["category"]
+    batch = batches[task["batch"]]
+    if task.get("deferred"):
+        run_state["deferred"] += 1
+    elif task["rows"] is None:
+        pass  # Failed visits are not recorded, so the symbol stays due
+    elif args.shard:
+        nepse_partition.record(symbol, category.strip(), task["rows"], task["seconds"])
+        print(f"🧩 {symbol}: {len(task['rows'])} new row(s) kept for the merge")
+    else:
+        write_symbol(task, batch)
+        nepse_scheduler.mark_checked(schedule, symbol, task["seconds"])
+
+    batch["remaining"] -= 1
+    if batch["remaining"] == 0:
+        finish_batch(batch)
+
+
+def write_symbol(task, batch):
+    symbol, category, csv_filename = task["symbol"], task["category"], task["csv"]
+    if not task["rows"]:
+        print(f"⚠️ No new data found for {symbol}. Skipping update.")
+        return
+    new_df = task["new_df"]
+    latest_scraped_date = new_df["Date"].max()  # Get the latest date from new data
+
+    # Upsert keyed on Date: overlapping or repeated scrapes never duplicate rows.
+    # The new rows and the stored file are merged straight into the updated CSV
+    # (or only into the touched year shards of a sharded history).
+    with nepse_metrics.timer("write", symbol=symbol):
+        _, conflicts = nepse_shards.upsert(csv_filename, new_df, symbol)
+    nepse_changes.record(symbol, category.strip(), task["changed"])
+    nepse_metrics.inc("rows", len(new_df), sector=category)
+    if conflicts:
+        nepse_merge.log_conflicts(conflicts)
+        print(f"⚠️ {symbol}: {len(conflicts)} stored value(s) replaced by re-scraped data (see {nepse_merge.CONFLICT_LOG_PATH})")
+    nepse_registry.update_dates(symbol, csv_filename)
+    nepse_snapshot.update(symbol, category.strip(), csv_filename)
+    if nepse_live.confirm(symbol):
+        batch["live_confirmed"] = True
+    print(f"✅ New data added for {symbol} in {csv_filename}")
+
+    # Track sector-level updates, keeping the most recent date
+    batch["updated"].append(symbol)
+    if batch["latest_date"] is None or latest_scraped_date > batch["latest_date"]:
+        batch["latest_date"] = latest_scraped_date
+
+
+def finish_batch(batch):
+    """Validate, flush and commit one sector batch once all its symbols are written"""
+    category = batch["category"]
+    sector_updated_symbols = batch["updated"]
+    sector_latest_date = batch["latest_date"]
+    if args.shard:
+        return  # Shard runners write and commit nothing; the merge job does
 
-driver.quit()
+    print(f"\n{'='*60}")
+    print(f"🔄 Finished Sector: {category.strip()}")
+    print(f"{'='*60}")
+
+    # Flush the sector's staged writes together, then validate them before
+    # committing; symbols with new hard failures are rolled back
+    nepse_scheduler.save_schedule(schedule)
+    nepse_staging.commit()
+    if sector_updated_symbols:
+        with nepse_metrics.timer("validate", sector=category):
+            violations, blocking = nepse_validation.validate([s.replace('/', '_') for s in sector_updated_symbols])
+        if len(blocking):
+            print(f"❌ Validation found {len(blocking)} new hard failure(s) in {category.strip()}:")
+            print(blocking.to_string(index=False))
+            for blocked in sorted(set(blocking["Symbol"].astype(str))):
+                nepse_metrics.inc("failures", symbol=blocked, sector=category)
+                blocked_csv = os.path.join(BASE_FOLDER, category.strip(), f"{blocked}.csv")
+                blocked_path = nepse_shards.storage_path(blocked_csv)
+                result = subprocess.run(f'git checkout -- "{blocked_path}"', shell=True, capture_output=True, text=True)
+                if result.returncode != 0 and os.path.isdir(blocked_path):
+                    shutil.rmtree(blocked_path)  # Never committed before, so drop it
+                elif result.returncode != 0 and os.path.exists(blocked_path):
+                    os.remove(blocked_path)
+                elif os.path.isdir(blocked_path):
+                    # Shards of a new year were never committed
+                    subprocess.run(f'git clean -fq -- "{blocked_path}"', shell=True)
+                for restored in [s for s in sector_updated_symbols if s.replace('/', '_') == blocked]:
+                    nepse_registry.update_dates(restored, blocked_csv)
+                    nepse_snapshot.update(restored, category.strip(), blocked_csv)
+                    nepse_changes.discard(restored)
+                    nepse_scheduler.mark_due(schedule, restored)
+                sector_updated_symbols = [s for s in sector_updated_symbols if s.replace('/', '_') != blocked]
+                print(f"↩️ Restored {blocked_csv} to the last committed version")
+
+    # Git Add, Commit, and Push for the entire sector
+    if not sector_updated_symbols:
+        print(f"⚠️ No updates found for sector: {category.strip()}\n")
+        return
+    print(f"\n{'='*60}")
+    print(f"💾 Committing updates for sector: {category.strip()}")
+    print(f"📊 Updated {len(sector_updated_symbols)} companies: {', '.join(sector_updated_symbols)}")
+    print(f"{'='*60}\n")
+
+    # Recompute adjustment factors only for the symbols that changed
+    adjustment_cache = nepse_adjustments.load_cache()
+    with nepse_metrics.timer("adjustments", sector=category):
+        refreshed = nepse_adjustments.refresh([s.replace('/', '_') for s in sector_updated_symbols], cache=adjustment_cache)
+    nepse_adjustments.save_cache(adjustment_cache)
+    print(f"🧮 Refreshed adjustment factors for {len(refreshed)} symbol(s)")
+    nepse_registry.save_registry()
+    nepse_snapshot.save_snapshot()
+    if batch.get("live_confirmed"):
+        nepse_live.save_provisional()
+    nepse_scheduler.save_schedule(schedule)
+    nepse_changes.flush("nepse_data_update")
+    nepse_staging.commit()
+
+    # The merge job commits every sector once, after the last one
+    if merged_rows is not None:
+        merged_sectors.append((category.strip(), sector_latest_date))
+        return
+
+    # Git add only the specific sector directory and the bookkeeping files that exist
+    sector_name = category.strip().replace('_', ' ')
+    commit_message = f'Updated {sector_name} data up to {sector_latest_date}' if sector_latest_date else f'Updated {sector_name} data'
+    git_commit_and_push([os.path.join(BASE_FOLDER, category.strip())], commit_message, sector_name, category)
+
+
+# Process every sector batch, highest priority first, as a pipeline: while a
+# browser loads the next symbol, the previous ones are parsed and written and
+# finished sectors are validated and committed. The writer is a single thread,
+# so staged writes, bookkeeping and git never run concurrently
+items = [(index, symbol.strip()) for index, (_, symbols) in enumerate(sector_batches) for symbol in symbols]
+for batch, (_, symbols) in zip(batches, sector_batches):
+    batch["remaining"] = sum(1 for symbol in symbols if symbol.strip())
+pipeline = nepse_pipeline.Pipeline([
+    nepse_pipeline.Stage("fetch", fetch_stage, workers=1 if merged_rows is not None else args.fetch_workers),
+    nepse_pipeline.Stage("parse", parse_stage),
+    nepse_pipeline.Stage("write", write_stage),
+])
+try:
+    # --profile follows one thread, so a profiled run does not overlap the stages
+    pipeline.run([item for item in items if item[1]], threaded=not nepse_profiling.profile_requested())
+finally:
+    for driver in drivers:
+        driver.quit()
+print(f"\n🧵 Pipeline stages:\n{pipeline.summary()}")
+
+if args.shard:
+    artifact = nepse_partition.write_artifact(args.shard, len(planned))
+    print(f"🧩 Shard {args.shard[0]}/{args.shard[1]}: {run_state['attempted']} symbol(s) visited, results in {artifact}")
+elif merged_sectors:
+    # One commit for every shard's data
+    latest = max((day for _, day in merged_sectors if day), default=None)
+    commit_message = f"Updated {len(merged_sectors)} sector(s) data up to {latest} (merged shards)"
+    git_commit_and_push([os.path.join(BASE_FOLDER, sector) for sector, _ in merged_sectors], commit_message, f"{len(merged_sectors)} sector(s)")
+if not args.shard and nepse_returns.exists():
+    # Extend the research returns matrix (a local cache, never committed to git)
+    with nepse_metrics.timer("returns_matrix"):
+        realigned = nepse_returns.update()
+        nepse_staging.commit()
+    print(f"📐 Returns matrix updated: {len(realigned)} symbol(s) realigned")
 print("\n" + "="*60)
-print("🎉 Scraping completed for all sectors!")
-print("="*60)
\ No newline at end of file
+if run_state["budget_reached"]:
+    nepse_metrics.inc("deferred", run_state["deferred"])
+    print(f"⏰ Run budget reached after {(time.perf_counter() - run_started) / 60:.0f} min: "
+          f"{run_state['deferred']} symbol(s) stay due for the next run")
+else:
+    print("🎉 Scraping completed for all sectors!")
+print("="*60)
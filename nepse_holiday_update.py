@@ -8,26 +8,36 @@ KEY FEATURES:
 2. Fills in ALL missing months between calendar start and current date
 3. When scraping finds holidays in any month, ensures that month has complete data
 4. Dynamic pagination (no hardcoded page counts)
-5. Proper wait times for reliable scraping
+5. Fetches every year from the JSON API behind the holiday page in a few
+   concurrent requests (nepse_holidays), without a browser; only if the API
+   fails does it drive the page, reading each year from its XHR response
+   (falling back to the rendered table when none is captured)
 6. Generates separate CSV for public holidays only and all non-trading days
 7. Commits and pushes only if changes are made (no empty commits)
 """
 
 import os
 import sys
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 import time
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
 import subprocess
+import requests
+import nepse_browser
+import nepse_holidays
+import nepse_metrics
+import nepse_profiling
+import nepse_staging
+from nepse_calendar import add_weekend_holidays_for_month
+from nepse_common import NEPALSTOCK_URL
 
 load_dotenv()
 
@@ -56,6 +66,10 @@ else:
 
 print(f"📂 Root path set to: {root_path}")
 os.chdir(root_path)
+nepse_metrics.start_job("nepse_holiday_update")
+if nepse_profiling.profile_requested():
+    nepse_profiling.enable("nepse_holiday_update")
+nepse_staging.begin("nepse_holiday_update")
 
 # Step 1: Set Git user credentials
 os.system(f"git config --global user.email {GITHUB_USER_EMAIL}")
@@ -93,103 +107,6 @@ end_date = calendar_df['Date'].max()
 print(f"📊 Calendar date range: {start_date.date()} to {end_date.date()}")
 print(f"📅 Current date: {current_date.date()}")
 
-# Function to add weekend holidays for a given month
-def add_weekend_holidays_for_month(year, month, calendar_df):
-    """
-    Add weekend holidays (Friday and Saturday) and weekday trading days for a given month
-    """
-    month_name = datetime(year, month, 1).strftime("%B %Y")
-    print(f"\n🔍 Processing {month_name}...")
-    
-    # Get first and last day of the month
-    first_day = datetime(year, month, 1)
-    if month == 12:
-        last_day = datetime(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = datetime(year, month + 1, 1) - timedelta(days=1)
-    
-    # Get all dates in the month
-    current = first_day
-    weekends_added = 0
-    weekdays_added = 0
-    weekends_existing = 0
-    weekends_corrected = 0
-    
-    while current <= last_day:
-        date_str = current.strftime("%Y-%m-%d")
-        weekday = current.weekday()
-        
-        # Friday = 4, Saturday = 5
-        if weekday in [4, 5]:
-            # Check if date exists in calendar
-            mask = calendar_df['date_str'] == date_str
-            
-            if mask.any():
-                # Date exists - check if it's correctly marked as weekend
-                existing_row = calendar_df[mask].iloc[0]
-                is_trading_day = existing_row['IsTradingDay']
-                holiday_name = existing_row['HolidayName']
-                
-                if is_trading_day == False:
-                    # Already marked as non-trading day (weekend or holiday)
-                    # Only update HolidayName to "Weekend" if it's empty/None (don't overwrite public holidays)
-                    if pd.isna(holiday_name) or holiday_name == '' or holiday_name == 'Weekend':
-                        if holiday_name != 'Weekend':
-                            calendar_df.loc[mask, 'HolidayName'] = 'Weekend'
-                            weekends_corrected += 1
-                            print(f"  ✏️ Corrected {date_str} to Weekend")
-                        else:
-                            weekends_existing += 1
-                    else:
-                        # Already has a public holiday name - don't overwrite it
-                        weekends_existing += 1
-                else:
-                    # IsTradingDay is True but it's a weekend - correct it
-                    calendar_df.loc[mask, 'IsTradingDay'] = False
-                    calendar_df.loc[mask, 'HolidayName'] = 'Weekend'
-                    weekends_corrected += 1
-                    print(f"  ✏️ Corrected {date_str} to Weekend")
-            else:
-                # Date doesn't exist - add it as weekend
-                new_row = pd.DataFrame([{
-                    'Date': current,
-                    'IsTradingDay': False,
-                    'HolidayName': 'Weekend'
-                }])
-                calendar_df = pd.concat([calendar_df, new_row], ignore_index=True)
-                calendar_df['date_str'] = calendar_df['Date'].dt.strftime("%Y-%m-%d")  # Update date_str
-                weekends_added += 1
-                print(f"  ➕ Added {date_str} as Weekend")
-        else:
-            # Weekday (not weekend) - ensure it exists as trading day
-            mask = calendar_df['date_str'] == date_str
-            if not mask.any():
-                # Date doesn't exist - add it as trading day (will be updated if it's a public holiday)
-                new_row = pd.DataFrame([{
-                    'Date': current,
-                    'IsTradingDay': True,
-                    'HolidayName': ''
-                }])
-                calendar_df = pd.concat([calendar_df, new_row], ignore_index=True)
-                calendar_df['date_str'] = calendar_df['Date'].dt.strftime("%Y-%m-%d")  # Update date_str
-                weekdays_added += 1
-        
-        current += timedelta(days=1)
-    
-    # Only print summary if something changed
-    if weekends_added > 0 or weekends_corrected > 0 or weekdays_added > 0:
-        print(f"  📊 Summary for {month_name}:")
-        if weekends_existing > 0:
-            print(f"    - Existing weekends: {weekends_existing}")
-        if weekends_added > 0:
-            print(f"    - Added weekends: {weekends_added}")
-        if weekdays_added > 0:
-            print(f"    - Added weekdays: {weekdays_added}")
-        if weekends_corrected > 0:
-            print(f"    - Corrected weekends: {weekends_corrected}")
-    
-    return calendar_df, weekends_added, weekends_corrected
-
 # CRITICAL FIX: Process ALL months from calendar start to current date
 # This ensures no months are missing (like Nov/Dec 2025)
 
@@ -202,15 +119,16 @@ print(f"\n📌 Step 1: Filling ALL months from {start_date.date()} to {current_d
 process_month = start_date.replace(day=1)
 current_month_start = current_date.replace(day=1)
 
-while process_month <= current_month_start:
-    calendar_df, added, corrected = add_weekend_holidays_for_month(
-        process_month.year, 
-        process_month.month, 
-        calendar_df
-    )
-    total_added += added
-    total_corrected += corrected
-    process_month += relativedelta(months=1)
+with nepse_metrics.timer("calendar_build"):
+    while process_month <= current_month_start:
+        calendar_df, added, corrected = add_weekend_holidays_for_month(
+            process_month.year, 
+            process_month.month, 
+            calendar_df
+        )
+        total_added += added
+        total_corrected += corrected
+        process_month += relativedelta(months=1)
 
 print(f"\n✅ Complete Calendar Processing Complete:")
 print(f"  - Total weekends added: {total_added}")
@@ -237,204 +155,259 @@ years_to_scrape = list(range(start_year, 2006, -1))
 
 print(f"📅 Will scrape years: {', '.join(map(str, years_to_scrape))}")
 
-# Configure Selenium WebDriver
-print(f"\n🔧 Configuring browser...")
-chrome_options = Options()
-chrome_options.add_argument("--headless=new")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--disable-gpu")
-chrome_options.add_argument("--window-size=1920x1080")
-chrome_options.add_argument("--disable-application-cache")
-chrome_options.add_argument("--log-level=3")
-chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
-
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=chrome_options)
-driver.set_page_load_timeout(30)
-
-print(f"✅ Browser configured successfully")
 
+def take_new(entries):
+    """Return the entries not in the calendar yet and remember them"""
+    new_entries = []
+    for e in entries:
+        key = (e['Holiday Date'], e['Holiday Description'])
+        if key not in existing_holidays:
+            new_entries.append(e)
+            existing_holidays.add(key)
+    return new_entries
+
+
+# Fetch every year from the JSON API behind the holiday page in a few
+# concurrent requests; the browser is only needed if the API fails
+all_new = None
 try:
-    driver.get("https://nepalstock.com.np/holiday-listing")
-    print(f"✅ Loaded holiday listing page")
-    # Wait for Angular to render completely
-    WebDriverWait(driver, 30).until(
-        lambda d: d.execute_script("return document.readyState") == "complete"
-    )
-    time.sleep(5)  # Additional wait for ng-select to initialize
-
-    def reset_pagination_to_page_1():
-        """Reset pagination back to page 1"""
-        try:
-            # Try to find and click page 1 link in pagination
-            # Look for the first page number link that is not disabled
-            page_1_xpath = "//ul[contains(@class, 'ngx-pagination')]//li/a[contains(., '1')]"
-            page_1_link = driver.find_elements(By.XPATH, page_1_xpath)
-            
-            if page_1_link:
-                # Click the page 1 link
-                driver.execute_script("arguments[0].scrollIntoView();", page_1_link[0])
-                time.sleep(1)
-                page_1_link[0].click()
-                time.sleep(3)  # Wait for page to load
-                return True
-            return False
-        except Exception as e:
-            print(f"  ⚠️ Error resetting to page 1: {e}")
-            return False
+    print(f"\n🔌 Fetching holidays from {nepse_holidays.HOLIDAY_API_URL}...")
+    fetched = nepse_holidays.fetch_years(years_to_scrape)
+    if not any(fetched.values()):
+        raise ValueError("the holiday API returned no holidays")
+    all_new = []
+    for idx, year in enumerate(years_to_scrape):
+        year_new = take_new(fetched[year])
+        print(f"  📅 {year}: {len(fetched[year])} holiday(s), {len(year_new)} new")
+        all_new.extend(year_new)
+        nepse_metrics.inc("rows", len(year_new), year=year)
+        # Same rule as the browser scrape: past the second year, stop at the first year with nothing new
+        if idx > 0 and not year_new:
+            break
+except (requests.RequestException, ValueError) as e:
+    print(f"⚠️ Holiday API unavailable ({e}); falling back to the browser")
+    nepse_metrics.inc("retries")
+
+if all_new is None:
+    # Configure Selenium WebDriver
+    print(f"\n🔧 Configuring browser...")
+    # URL fragment of the XHR that returns a year's holidays
+    HOLIDAY_XHR_MATCH = "holiday"
+
+    service = Service(ChromeDriverManager().install())
+    driver = nepse_browser.create_driver(service, extra_arguments=(
+        "--disable-application-cache",
+        "--disable-blink-features=AutomationControlled",
+        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    ), capture_network=True)
+    driver.set_page_load_timeout(30)
+
+    print(f"✅ Browser configured successfully")
 
-    def select_year(year):
-        """Select a year from the dropdown"""
-        try:
-            print(f"  🔄 Selecting year {year} via dropdown...")
-            
-            # Click the ng-select dropdown to open it
-            dropdown = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "ng-select .ng-select-container"))
+    try:
+        with nepse_metrics.timer("page_load"):
+            driver.get(f"{NEPALSTOCK_URL}/holiday-listing")
+            print(f"✅ Loaded holiday listing page")
+            # Wait for Angular to render completely
+            WebDriverWait(driver, 30).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
             )
-            dropdown.click()
-            time.sleep(2)  # Wait for dropdown to open
-            
-            # Find and click the year option
-            year_xpath = f"//span[contains(@class, 'ng-option-label') and normalize-space(text())='{year}']"
-            year_option = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, year_xpath))
+            WebDriverWait(driver, 30).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, "ng-select .ng-select-container"))
             )
-            year_option.click()
+
+        def payload_has_next(payload):
+            """True if a paged payload reports more pages; an unpaged one holds the whole year"""
+            if isinstance(payload, dict) and "page" in payload and "pages" in payload:
+                return int(payload["page"]) < int(payload["pages"])
+            return False
+
+        def wait_for_payload():
+            """Return the next captured holiday XHR payload, or None to read the rendered table"""
+            try:
+                return nepse_browser.wait_for_response(driver, HOLIDAY_XHR_MATCH, timeout=20)
+            except TimeoutException:
+                print("  ⚠️ No holiday XHR captured, reading the rendered table")
+                return None
+
+        def reset_pagination_to_page_1():
+            """Reset pagination back to page 1"""
+            try:
+                # Try to find and click page 1 link in pagination
+                # Look for the first page number link that is not disabled
+                page_1_xpath = "//ul[contains(@class, 'ngx-pagination')]//li/a[contains(., '1')]"
+                page_1_link = driver.find_elements(By.XPATH, page_1_xpath)
             
-            # CRITICAL: Wait for Angular to load the data
-            print(f"  ⏳ Waiting for data to load...")
-            time.sleep(7)  # Increased wait time for data loading
+                if page_1_link:
+                    # Click the page 1 link
+                    driver.execute_script("arguments[0].scrollIntoView();", page_1_link[0])
+                    time.sleep(1)
+                    page_1_link[0].click()
+                    time.sleep(3)  # Wait for page to load
+                    return True
+                return False
+            except Exception as e:
+                print(f"  ⚠️ Error resetting to page 1: {e}")
+                return False
+
+        def select_year(year):
+            """Select a year from the dropdown; returns (selected, captured payload or None)"""
+            try:
+                print(f"  🔄 Selecting year {year} via dropdown...")
+                nepse_browser.captured_responses(driver)  # Only the response to this selection counts
             
-            # Wait for table to be present
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "table"))
-            )
+                # Click the ng-select dropdown to open it
+                dropdown = WebDriverWait(driver, 10).until(
+                    EC.element_to_be_clickable((By.CSS_SELECTOR, "ng-select .ng-select-container"))
+                )
+                dropdown.click()
             
-            # Additional wait to ensure table is fully populated
-            time.sleep(3)
+                # Find and click the year option
+                year_xpath = f"//span[contains(@class, 'ng-option-label') and normalize-space(text())='{year}']"
+                year_option = WebDriverWait(driver, 10).until(
+                    EC.element_to_be_clickable((By.XPATH, year_xpath))
+                )
+                year_option.click()
             
-            # Reset pagination to page 1 after year change
-            print(f"  🔄 Resetting pagination to page 1...")
-            reset_pagination_to_page_1()
+                # The year's rows arrive in the XHR response; no render wait needed
+                payload = wait_for_payload()
+                if payload is None:
+                    print(f"  ⏳ Waiting for data to load...")
+                    time.sleep(7)
+                    WebDriverWait(driver, 15).until(
+                        EC.presence_of_element_located((By.CLASS_NAME, "table"))
+                    )
+                    time.sleep(3)
+                
+                    # Reset pagination to page 1 after year change
+                    print(f"  🔄 Resetting pagination to page 1...")
+                    reset_pagination_to_page_1()
             
-            print(f"  ✅ Year {year} selected successfully")
-            return True
-        except Exception as e:
-            print(f"  ⚠️ Error selecting year {year}: {e}")
-            return False
-
-    def has_next_page():
-        """Check if Next button exists and is NOT disabled"""
-        try:
-            # Find the "Next" pagination button
-            next_button = driver.find_element(By.XPATH, "//li[contains(@class, 'pagination-next')]")
+                print(f"  ✅ Year {year} selected successfully")
+                return True, payload
+            except Exception as e:
+                print(f"  ⚠️ Error selecting year {year}: {e}")
+                return False, None
+
+        def has_next_page():
+            """Check if Next button exists and is NOT disabled"""
+            try:
+                # Find the "Next" pagination button
+                next_button = driver.find_element(By.XPATH, "//li[contains(@class, 'pagination-next')]")
             
-            # Check if it has 'disabled' class
-            is_disabled = 'disabled' in next_button.get_attribute('class')
+                # Check if it has 'disabled' class
+                is_disabled = 'disabled' in next_button.get_attribute('class')
             
-            return not is_disabled
-        except Exception as e:
-            # If Next button not found, assume no more pages
-            return False
-
-    def click_next_page():
-        """Click the Next button to go to next page"""
-        try:
-            # Find and click the "Next" button
-            next_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//li[contains(@class, 'pagination-next')]/a"))
-            )
-            driver.execute_script("arguments[0].scrollIntoView();", next_button)
-            time.sleep(1)
-            next_button.click()
-            time.sleep(3)  # Wait for next page to load
-            return True
-        except Exception as e:
-            print(f"  ⚠️ Error clicking Next button: {e}")
-            return False
-
-    def scrape_table():
-        """Scrape holiday data from current page"""
-        try:
-            tbl = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "table.table"))
-            )
-            rows = tbl.find_elements(By.TAG_NAME, "tr")[1:]
-            out = []
-            for row in rows:
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if len(cols) == 3:
-                    out.append({
-                        "Holiday Date": cols[1].text.strip(),
-                        "Holiday Description": cols[2].text.strip()
-                    })
-            return out
-        except Exception as e:
-            print(f"  ⚠️ Error scraping table: {e}")
-            return []
-
-    all_new = []
-
-    for idx, year in enumerate(years_to_scrape):
-        print(f"\n📅 Scraping {year}...")
+                return not is_disabled
+            except Exception as e:
+                # If Next button not found, assume no more pages
+                return False
+
+        def click_next_page(capture=True):
+            """Click the Next button; returns (clicked, captured payload or None)"""
+            try:
+                nepse_browser.captured_responses(driver)
+                # Find and click the "Next" button
+                next_button = WebDriverWait(driver, 10).until(
+                    EC.element_to_be_clickable((By.XPATH, "//li[contains(@class, 'pagination-next')]/a"))
+                )
+                driver.execute_script("arguments[0].scrollIntoView();", next_button)
+                next_button.click()
+                payload = wait_for_payload() if capture else None
+                if payload is None:
+                    time.sleep(3)  # Wait for next page to load
+                return True, payload
+            except Exception as e:
+                print(f"  ⚠️ Error clicking Next button: {e}")
+                return False, None
+
+        def scrape_table():
+            """Scrape holiday data from current page"""
+            try:
+                tbl = WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "table.table"))
+                )
+                rows = tbl.find_elements(By.TAG_NAME, "tr")[1:]
+                out = []
+                for row in rows:
+                    cols = row.find_elements(By.TAG_NAME, "td")
+                    if len(cols) == 3:
+                        out.append({
+                            "Holiday Date": cols[1].text.strip(),
+                            "Holiday Description": cols[2].text.strip()
+                        })
+                return out
+            except Exception as e:
+                print(f"  ⚠️ Error scraping table: {e}")
+                return []
+
+        all_new = []
+
+        for idx, year in enumerate(years_to_scrape):
+            print(f"\n📅 Scraping {year}...")
         
-        if not select_year(year):
-            print(f"  ❌ Failed to select year {year}, skipping...")
-            continue
-
-        year_new = []
-        page_number = 1
-
-        # Scrape pages until no Next button or no more new entries
-        while True:
-            print(f"  📄 Scraping page {page_number}...")
-            page_data = scrape_table()
+            with nepse_metrics.timer("select_year", year=year):
+                year_selected, payload = select_year(year)
+            if not year_selected:
+                print(f"  ❌ Failed to select year {year}, skipping...")
+                nepse_metrics.inc("failures", year=year)
+                continue
+
+            year_new = []
+            page_number = 1
+
+            # Scrape pages until no Next button or no more new entries
+            while True:
+                print(f"  📄 Scraping page {page_number}...")
+                with nepse_metrics.timer("table_extract", year=year):
+                    try:
+                        page_data = nepse_holidays.parse_holidays(payload) if payload is not None else None
+                    except ValueError:
+                        page_data = None  # Unknown payload fields: read the rendered table
+                    if page_data is None:
+                        page_data = scrape_table()
+                nepse_metrics.inc("pages", year=year)
+
+                if not page_data:
+                    print(f"  ⏹️ No data on page {page_number}, stopping year {year}")
+                    break
 
-            if not page_data:
-                print(f"  ⏹️ No data on page {page_number}, stopping year {year}")
-                break
+                new_entries = take_new(page_data)
 
-            new_entries = []
-            for e in page_data:
-                key = (e['Holiday Date'], e['Holiday Description'])
-                if key not in existing_holidays:
-                    new_entries.append(e)
-                    existing_holidays.add(key)
-
-            if new_entries:
-                print(f"  ➕ Found {len(new_entries)} new holiday(s)")
-                year_new.extend(new_entries)
-            else:
-                print(f"  ✅ No new entries on page {page_number}")
-
-            # Check if there's a next page
-            if has_next_page():
-                print(f"  ➡️ Next page available, continuing...")
-                if not click_next_page():
-                    print(f"  ⏹️ Failed to navigate to next page, stopping year {year}")
+                if new_entries:
+                    print(f"  ➕ Found {len(new_entries)} new holiday(s)")
+                    year_new.extend(new_entries)
+                else:
+                    print(f"  ✅ No new entries on page {page_number}")
+
+                # Check if there's a next page
+                if payload_has_next(payload) if payload is not None else has_next_page():
+                    print(f"  ➡️ Next page available, continuing...")
+                    with nepse_metrics.timer("page_next", year=year):
+                        next_clicked, payload = click_next_page(capture=payload is not None)
+                    if not next_clicked:
+                        print(f"  ⏹️ Failed to navigate to next page, stopping year {year}")
+                        break
+                    page_number += 1
+                else:
+                    print(f"  ✅ No more pages for {year} (processed {page_number} page(s))")
                     break
-                page_number += 1
-            else:
-                print(f"  ✅ No more pages for {year} (processed {page_number} page(s))")
-                break
 
-        all_new.extend(year_new)
+            all_new.extend(year_new)
+            nepse_metrics.inc("rows", len(year_new), year=year)
 
-        # Decide whether to continue scraping earlier years
-        if idx == 0:
-            # Always check the second year
-            continue
+            # Decide whether to continue scraping earlier years
+            if idx == 0:
+                # Always check the second year
+                continue
 
-        if len(year_new) == 0:
-            print(f"  ⏹️ No new entries in {year}, stopping further scraping")
-            break
+            if len(year_new) == 0:
+                print(f"  ⏹️ No new entries in {year}, stopping further scraping")
+                break
 
-finally:
-    driver.quit()
-    print(f"\n✅ Browser closed")
+    finally:
+        driver.quit()
+        print(f"\n✅ Browser closed")
 
 # --- Part 3: Process New Public Holidays and Add Future Month Weekends ---
 
@@ -525,7 +498,8 @@ print(f"{'='*70}")
 # Remove temporary column and sort
 calendar_df = calendar_df.drop(columns=['date_str'], errors='ignore')
 calendar_df = calendar_df.sort_values('Date', ascending=False).reset_index(drop=True)
-calendar_df.to_csv(CALENDAR_CSV_PATH, index=False)
+with nepse_metrics.timer("write"), nepse_staging.staged(CALENDAR_CSV_PATH) as tmp_path:
+    calendar_df.to_csv(tmp_path, index=False)
 
 print(f"✅ Saved to {CALENDAR_CSV_PATH}")
 print(f"📊 Total records: {len(calendar_df)}")
@@ -545,7 +519,8 @@ public_holiday_df = public_holiday_df.sort_values('Date', ascending=False).reset
 
 print(f"📊 Found {len(public_holiday_df)} public holidays")
 
-public_holiday_df.to_csv(ONLY_PUBLIC_HOLIDAYS_CSV_PATH, index=False)
+with nepse_staging.staged(ONLY_PUBLIC_HOLIDAYS_CSV_PATH) as tmp_path:
+    public_holiday_df.to_csv(tmp_path, index=False)
 print(f"✅ Saved to {ONLY_PUBLIC_HOLIDAYS_CSV_PATH}")
 
 # --- Part 6: Generate public_and_weekly_holidays.csv ---
@@ -563,7 +538,11 @@ full_holiday_df = full_holiday_df.sort_values('Date', ascending=False).reset_ind
 
 print(f"📊 Found {len(full_holiday_df)} non-trading days (including weekends)")
 
-full_holiday_df.to_csv(FULL_HOLIDAY_LIST_CSV_PATH, index=False)
+with nepse_staging.staged(FULL_HOLIDAY_LIST_CSV_PATH) as tmp_path:
+    full_holiday_df.to_csv(tmp_path, index=False)
+
+# The calendar and both holiday lists are replaced together
+nepse_staging.commit()
 print(f"✅ Saved to {FULL_HOLIDAY_LIST_CSV_PATH}")
 
 # --- Part 7: Git Operations (only if changes) ---
@@ -580,7 +559,8 @@ files_to_check = [
 
 # Add all files (git add is safe even if no changes)
 for file_path in files_to_check:
-    result = subprocess.run(f"git add {file_path}", shell=True, capture_output=True, text=True)
+    with nepse_metrics.timer("git"):
+        result = subprocess.run(f"git add {file_path}", shell=True, capture_output=True, text=True)
     if result.returncode != 0:
         print(f"❌ Git add failed for {file_path}: {result.stderr}")
         exit(1)
@@ -594,14 +574,16 @@ if staged_files:
     commit_message = "Updated holiday lists"
     print(f"📝 Commit message: {commit_message}")
 
-    result = subprocess.run(f'git commit -m "{commit_message}"', shell=True, capture_output=True, text=True)
+    with nepse_metrics.timer("git"):
+        result = subprocess.run(f'git commit -m "{commit_message}"', shell=True, capture_output=True, text=True)
     print(f"Git commit: {result.stdout if result.stdout else 'Done'}")
     if result.returncode != 0:
         print(f"❌ Git commit failed: {result.stderr}")
         exit(1)
 
     if push_enabled:
-        result = subprocess.run("git push origin main", shell=True, capture_output=True, text=True)
+        with nepse_metrics.timer("git"):
+            result = subprocess.run("git push origin main", shell=True, capture_output=True, text=True)
         print(f"Git push: {result.stdout if result.stdout else 'Done'}")
         if result.returncode != 0:
             print(f"❌ Git push failed: {result.stderr}")
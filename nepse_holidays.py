@@ -0,0 +1,113 @@
+"""
+Browserless client for the nepalstock public holiday list.
+
+The /holiday-listing page is an Angular app that loads each year's holidays
+from a JSON endpoint; this module calls that endpoint directly:
+1. fetch_year(year) GETs HOLIDAY_API_URL?year=<year> through nepse_http, so
+   repeated runs revalidate with ETag/Last-Modified instead of refetching;
+   a paged response (page / pages) is followed to its last page
+2. fetch_years(years) fetches every year concurrently, WORKERS at a time
+3. parse_holidays() turns a payload (array rows, or objects keyed by the
+   field names in DATE_KEYS / NAME_KEYS) into the {"Holiday Date",
+   "Holiday Description"} entries the browser scrape of
+   nepse_holiday_update.py produces, so both feed the same merge; an object
+   row without a known date field raises ValueError, so the caller falls back
+   to the browser instead of guessing a field such as updatedDate
+
+Past years rarely change and are cached for PAST_YEAR_TTL; the current and
+next year are revalidated on every run.
+
+Usage:
+    python nepse_holidays.py                     # current and previous year
+    python nepse_holidays.py 2026 2025 2024
+    NEPALSTOCK_URL=http://127.0.0.1:8765 python nepse_holidays.py
+"""
+
+import argparse
+import html
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import nepse_http
+import nepse_metrics
+from nepse_common import NEPALSTOCK_URL
+
+HOLIDAY_API_URL = os.getenv("NEPSE_HOLIDAY_API_URL", f"{NEPALSTOCK_URL}/api/nots/holiday/list")
+WORKERS = 8
+PAST_YEAR_TTL = 30 * 24 * 3600
+
+# Exact field names, most specific first
+DATE_KEYS = ("holidayDate", "holiday_date", "date", "Holiday Date")
+NAME_KEYS = ("description", "holidayDescription", "holiday_description", "name", "title", "Holiday Description")
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+
+def _text(value):
+    """Return the visible text of a payload value (tags stripped, entities decoded)"""
+    return "" if value is None else html.unescape(TAG_PATTERN.sub("", str(value))).strip()
+
+
+def parse_holidays(payload):
+    """Return [{"Holiday Date", "Holiday Description"}] from a holiday payload"""
+    if isinstance(payload, dict):
+        payload = next((payload[key] for key in ("rows", "data", "content") if isinstance(payload.get(key), list)), [])
+    entries = []
+    for row in payload if isinstance(payload, list) else []:
+        if isinstance(row, dict):
+            date_key = next((key for key in DATE_KEYS if key in row), None)
+            if date_key is None:
+                raise ValueError(f"holiday row without a known date field: {sorted(row)}")
+            day = row[date_key]
+            name = next((row[key] for key in NAME_KEYS if key in row), "")
+        elif isinstance(row, (list, tuple)) and len(row) == 3:
+            day, name = row[1], row[2]
+        else:
+            continue
+        day = _text(day).split("T")[0]  # ISO timestamps keep only the date
+        if day:
+            entries.append({"Holiday Date": day, "Holiday Description": _text(name)})
+    return entries
+
+
+def fetch_year(year, url=None):
+    """Return the holidays of one year, following every page of a paged response"""
+    url = url or HOLIDAY_API_URL
+    ttl = PAST_YEAR_TTL if int(year) < date.today().year else 0
+    entries, page, pages = [], 1, 1
+    while page <= pages:
+        params = {"year": year} if page == 1 else {"year": year, "page": page}
+        response = nepse_http.get(url, params=params, ttl=ttl)
+        response.raise_for_status()
+        payload = response.json()
+        entries.extend(parse_holidays(payload))
+        if isinstance(payload, dict) and "pages" in payload:
+            pages = int(payload["pages"])
+        page += 1
+    return entries
+
+
+def fetch_years(years, url=None, workers=WORKERS):
+    """Return {year: holidays} for every year, fetched concurrently"""
+    years = list(years)
+    with nepse_metrics.timer("holiday_api", years=len(years)):
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(years)))) as pool:
+            return dict(zip(years, pool.map(lambda year: fetch_year(year, url), years)))
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Fetch nepalstock public holidays without a browser")
+    parser.add_argument("years", nargs="*", type=int, help="Years to fetch (default: this and last year)")
+    args = parser.parse_args()
+
+    years = args.years or [date.today().year, date.today().year - 1]
+    start = time.perf_counter()
+    holidays = fetch_years(years)
+    for year, entries in holidays.items():
+        print(f"📅 {year}: {len(entries)} holiday(s)")
+        for entry in entries:
+            print(f"   {entry['Holiday Date']}  {entry['Holiday Description']}")
+    print(f"✅ Fetched {len(years)} year(s) in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,223 @@
+"""
+Disk-backed HTTP cache for the browserless fetches.
+
+get(url) serves repeated GETs from .http_cache/ and revalidates them cheaply:
+1. A cached response younger than its TTL is returned without a request
+2. An older one is revalidated with If-None-Match / If-Modified-Since; a 304
+   refreshes it and the stored body is returned
+3. A 200 is stored (unless Cache-Control: no-store) with its ETag,
+   Last-Modified and max-age
+4. If the server cannot be reached, a stale cached copy is served
+5. The cache is bounded by MAX_CACHE_BYTES; the least recently used entries
+   are evicted first
+
+The TTL is the ttl argument, else the response's max-age, else DEFAULT_TTL.
+With NEPSE_HTTP_OFFLINE=1 nothing is fetched: cached responses are replayed
+whatever their age and a miss raises CacheMiss, so a recorded cache (see
+NEPSE_HTTP_CACHE_DIR) makes runs reproducible offline.
+
+The cache is a local, disposable store, so it is written with a plain
+temp-file rename rather than through nepse_staging.
+
+Usage:
+    import nepse_http
+    response = nepse_http.get(url, params={"year": 2025}, ttl=24 * 3600)
+    response.raise_for_status()
+    rows = response.json()
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import requests
+
+import nepse_metrics
+
+CACHE_FOLDER = os.getenv("NEPSE_HTTP_CACHE_DIR", ".http_cache")
+OFFLINE = os.getenv("NEPSE_HTTP_OFFLINE", "") not in ("", "0")
+DEFAULT_TTL = 3600
+MAX_CACHE_BYTES = int(os.getenv("NEPSE_HTTP_CACHE_BYTES", 200 * 2**20))
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+_lock = threading.Lock()
+_local = threading.local()
+_index = None
+
+
+class CacheMiss(requests.ConnectionError):
+    """Raised in offline mode when a URL is not in the cache"""
+
+
+class CachedResponse:
+    """The parts of a requests.Response the scrapers use, plus where it came from"""
+
+    def __init__(self, url, status_code, content, headers, source):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.source = source  # "network", "cache", "revalidated" or "stale"
+
+    @property
+    def from_cache(self):
+        return self.source != "network"
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for {self.url}", response=self)
+
+
+def _session():
+    """Return this thread's keep-alive session"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+        _local.session.headers["User-Agent"] = USER_AGENT
+    return _local.session
+
+
+def cache_key(url, params=None):
+    """Return the cache key of a GET (params are order-insensitive)"""
+    query = json.dumps(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return hashlib.sha1(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+def _index_path():
+    return os.path.join(CACHE_FOLDER, "index.json")
+
+
+def _body_path(key):
+    return os.path.join(CACHE_FOLDER, f"{key}.body")
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        _index = {}
+        if os.path.exists(_index_path()):
+            try:
+                with open(_index_path(), "r", encoding="utf-8") as file:
+                    _index = json.load(file)
+            except ValueError:
+                _index = {}  # A corrupt index only costs refetches
+    return _index
+
+
+def _save_index():
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    tmp_path = f"{_index_path()}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(_index, file)
+    os.replace(tmp_path, _index_path())
+
+
+def _max_age(headers):
+    """Return (max-age seconds or None, no-store) from Cache-Control"""
+    control = headers.get("Cache-Control", "").lower()
+    match = re.search(r"max-age=(\d+)", control)
+    return (int(match.group(1)) if match else None), "no-store" in control
+
+
+def _read_cached(key, entry, source):
+    with open(_body_path(key), "rb") as file:
+        content = file.read()
+    entry["last_access"] = time.time()
+    return CachedResponse(entry["url"], entry["status"], content, entry["headers"], source)
+
+
+def _store(key, url, response, ttl):
+    """Store a 200 response and evict least recently used entries over the size bound"""
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    tmp_path = f"{_body_path(key)}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(response.content)
+    os.replace(tmp_path, _body_path(key))
+    now = time.time()
+    _index[key] = {
+        "url": url,
+        "status": response.status_code,
+        "headers": {name: response.headers[name] for name in ("Content-Type", "ETag", "Last-Modified") if name in response.headers},
+        "stored_at": now,
+        "last_access": now,
+        "ttl": ttl,
+        "size": len(response.content),
+    }
+    total = sum(entry["size"] for entry in _index.values())
+    for old_key in sorted(_index, key=lambda k: _index[k]["last_access"]):
+        if total <= MAX_CACHE_BYTES or old_key == key:
+            break
+        total -= _index.pop(old_key)["size"]
+        if os.path.exists(_body_path(old_key)):
+            os.remove(_body_path(old_key))
+
+
+def get(url, params=None, ttl=None, timeout=10, headers=None):
+    """GET url through the cache; returns a CachedResponse"""
+    key = cache_key(url, params)
+    with _lock:
+        index = _load_index()
+        entry = index.get(key)
+        if entry and not os.path.exists(_body_path(key)):
+            index.pop(key)  # Body was removed by hand
+            entry = None
+        fresh_for = ttl if ttl is not None else entry["ttl"] if entry else 0
+        if entry and (OFFLINE or time.time() - entry["stored_at"] < fresh_for):
+            nepse_metrics.inc("http_requests", result="hit")
+            response = _read_cached(key, entry, "cache")
+            _save_index()
+            return response
+    if OFFLINE:
+        nepse_metrics.inc("http_requests", result="offline_miss")
+        raise CacheMiss(f"{url} is not cached (NEPSE_HTTP_OFFLINE is set)")
+
+    request_headers = dict(headers or {})
+    if entry:
+        if "ETag" in entry["headers"]:
+            request_headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            request_headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+    try:
+        with nepse_metrics.timer("http_get"):
+            response = _session().get(url, params=params, headers=request_headers, timeout=timeout)
+    except requests.RequestException as e:
+        if not entry:
+            raise
+        print(f"⚠️ {url} unreachable ({e}); using the cached copy")
+        nepse_metrics.inc("http_requests", result="stale")
+        with _lock:
+            return _read_cached(key, entry, "stale")
+
+    with _lock:
+        _load_index()
+        if response.status_code == 304 and entry:
+            nepse_metrics.inc("http_requests", result="revalidated")
+            entry["stored_at"] = time.time()
+            cached = _read_cached(key, entry, "revalidated")
+            _save_index()
+            return cached
+        nepse_metrics.inc("http_requests", result="miss")
+        max_age, no_store = _max_age(response.headers)
+        if response.status_code == 200 and not no_store:
+            _store(key, url, response, ttl if ttl is not None else (max_age if max_age is not None else DEFAULT_TTL))
+            _save_index()
+    return CachedResponse(response.url, response.status_code, response.content, dict(response.headers), "network")
+
+
+def clear():
+    """Remove every cached response"""
+    global _index
+    with _lock:
+        if os.path.isdir(CACHE_FOLDER):
+            for name in os.listdir(CACHE_FOLDER):
+                os.remove(os.path.join(CACHE_FOLDER, name))
+        _index = {}
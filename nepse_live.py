@@ -0,0 +1,342 @@
+"""
+Live market-watch poller: intraday ticks and the day's bar from live trading.
+
+The sharesansar live-trading page lists every traded symbol with its LTP,
+the day's open/high/low and cumulative volume. During market hours:
+1. poll() GETs the page every --interval seconds (through nepse_http, so an
+   unchanged page is a cheap 304) and parses its headFixed table; a snapshot
+   whose "As of" time was already seen is skipped
+2. MarketWatch.add_snapshot() appends each symbol's tick (time, LTP,
+   volume) to its row of fixed-size numpy ring buffers (the last RING_SIZE
+   ticks) and updates the running bar with O(1) work per tick: open, high,
+   low, close, volume, and turnover as the sum of LTP x volume increment
+3. When the market closes (the page says so, or the --close time in Nepal
+   time passes), flush() writes one bar per traded symbol into
+   Nepse_Data through the regular upsert, change feed, registry and
+   snapshot updates, in one staged commit
+
+A flushed bar is provisional: its Date is listed in
+other_nepse_detail/live_bars.csv until nepse_data_update.py re-scrapes that
+day from the price history and the official row replaces it.
+
+Usage:
+    python nepse_live.py                              # poll until the close, then flush
+    python nepse_live.py --interval 30 --close 15:00
+    python nepse_live.py --no-flush --once            # print one snapshot
+    SHARESANSAR_URL=http://127.0.0.1:8765 python nepse_live.py --interval 0
+"""
+
+import argparse
+import csv
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+import nepse_changes
+import nepse_http
+import nepse_merge
+import nepse_metrics
+import nepse_registry
+import nepse_shards
+import nepse_snapshot
+import nepse_staging
+from nepse_common import OTHER_DETAIL_FOLDER, PRICE_COLUMNS, SHARESANSAR_URL
+
+LIVE_URL = os.getenv("NEPSE_LIVE_URL", f"{SHARESANSAR_URL}/live-trading")
+LIVE_BARS_PATH = os.path.join(OTHER_DETAIL_FOLDER, "live_bars.csv")
+LIVE_BARS_COLUMNS = ["Symbol", "Date", "FlushedAt"]
+
+MARKET_TIMEZONE = ZoneInfo("Asia/Kathmandu")
+MARKET_CLOSE = "15:00"
+INTERVAL = 60
+RING_SIZE = 512
+GROW_BY = 256
+
+TABLE_PATTERN = re.compile(r'<table[^>]*id="headFixed"[^>]*>(.*?)</table>', re.S | re.I)
+ROW_PATTERN = re.compile(r"<tr[^>]*>(.*?)</tr>", re.S | re.I)
+CELL_PATTERN = re.compile(r"<t[hd][^>]*>(.*?)</t[hd]>", re.S | re.I)
+AS_OF_PATTERN = re.compile(r"As of\s*:?\s*(\d{4}-\d{2}-\d{2}(?:\s+\d{2}:\d{2}(?::\d{2})?)?)", re.I)
+CLOSED_PATTERN = re.compile(r"Market\s+Closed", re.I)
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+# Live table header → tick field
+HEADER_FIELDS = {"symbol": "symbol", "ltp": "ltp", "open": "open", "high": "high", "low": "low",
+                 "volume": "volume", "qty": "volume", "prev. close": "prev_close", "previous close": "prev_close"}
+
+_lock = threading.Lock()
+_provisional = None
+
+
+def _number(text):
+    try:
+        return float(str(text).replace(",", ""))
+    except ValueError:
+        return float("nan")
+
+
+def parse_live_page(html):
+    """Return (as_of, market_closed, ticks) of a live-trading page; ticks are dicts of HEADER_FIELDS"""
+    match = AS_OF_PATTERN.search(html)
+    as_of = match.group(1) if match else datetime.now(MARKET_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
+    table = TABLE_PATTERN.search(html)
+    rows = [[TAG_PATTERN.sub("", cell).strip() for cell in CELL_PATTERN.findall(row)]
+            for row in ROW_PATTERN.findall(table.group(1) if table else "")]
+    ticks = []
+    if rows:
+        fields = [HEADER_FIELDS.get(name.lower()) for name in rows[0]]
+        for row in rows[1:]:
+            tick = {field: value for field, value in zip(fields, row) if field}
+            if tick.get("symbol"):
+                ticks.append({"symbol": tick["symbol"], **{field: _number(tick.get(field, "nan")) for field in
+                                                            ("ltp", "open", "high", "low", "volume", "prev_close")}})
+    return as_of, bool(CLOSED_PATTERN.search(html)), ticks
+
+
+class MarketWatch:
+    """Per-symbol tick ring buffers and running intraday bars, one array row per symbol"""
+
+    def __init__(self, capacity=RING_SIZE):
+        self.capacity = capacity
+        self.slots = {}
+        self.symbols = []
+        self.times = np.zeros((0, capacity))
+        self.prices = np.zeros((0, capacity))
+        self.volumes = np.zeros((0, capacity))
+        self.ticks = np.zeros(0, dtype=np.int64)
+        self.bar = {name: np.zeros(0) for name in ("open", "high", "low", "close", "volume", "turnover", "prev_close")}
+
+    def _slot_rows(self, symbols):
+        """Return the array rows of symbols, adding rows (in GROW_BY blocks) for new ones"""
+        for symbol in symbols:
+            if symbol not in self.slots:
+                self.slots[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+        missing = len(self.symbols) - len(self.ticks)
+        if missing > 0:
+            grow = max(missing, GROW_BY)
+            self.times = np.vstack([self.times, np.zeros((grow, self.capacity))])
+            self.prices = np.vstack([self.prices, np.zeros((grow, self.capacity))])
+            self.volumes = np.vstack([self.volumes, np.zeros((grow, self.capacity))])
+            self.ticks = np.concatenate([self.ticks, np.zeros(grow, dtype=np.int64)])
+            for name, values in self.bar.items():
+                self.bar[name] = np.concatenate([values, np.full(grow, np.nan)])
+        return np.array([self.slots[symbol] for symbol in symbols], dtype=np.int64)
+
+    def add_snapshot(self, ticks, timestamp):
+        """Record one tick per symbol of a snapshot and update their bars"""
+        ticks = [tick for tick in ticks if tick["ltp"] > 0]
+        if not ticks:
+            return 0
+        rows = self._slot_rows([tick["symbol"] for tick in ticks])
+        ltp = np.array([tick["ltp"] for tick in ticks])
+        volume = np.array([tick["volume"] for tick in ticks])
+
+        # Ring buffers: the tick goes to slot ticks % capacity of the symbol's row
+        position = self.ticks[rows] % self.capacity
+        self.times[rows, position] = timestamp
+        self.prices[rows, position] = ltp
+        self.volumes[rows, position] = volume
+        first = self.ticks[rows] == 0
+        self.ticks[rows] += 1
+
+        # Running bar: a symbol has traded once its cumulative volume is positive
+        bar = self.bar
+        previous_volume = np.where(first, 0.0, np.nan_to_num(bar["volume"][rows]))
+        traded = volume > 0
+        day_open = np.array([tick["open"] for tick in ticks])
+        opening = traded & np.isnan(bar["open"][rows])
+        bar["open"][rows[opening]] = np.where(day_open[opening] > 0, day_open[opening], ltp[opening])
+        for name, day_value, combine in (("high", "high", np.fmax), ("low", "low", np.fmin)):
+            values = np.array([tick[day_value] for tick in ticks])
+            values = np.where(values > 0, combine(values, ltp), ltp)
+            bar[name][rows[traded]] = combine(bar[name][rows[traded]], values[traded])
+        bar["close"][rows] = ltp
+        bar["turnover"][rows] = np.nan_to_num(bar["turnover"][rows]) + ltp * np.maximum(volume - previous_volume, 0)
+        bar["volume"][rows] = np.maximum(volume, previous_volume)
+        bar["prev_close"][rows] = [tick["prev_close"] for tick in ticks]
+        return len(ticks)
+
+    def recent_ticks(self, symbol):
+        """Return the buffered ticks of symbol as (times, prices, volumes), oldest first"""
+        row = self.slots[symbol]
+        count = min(self.ticks[row], self.capacity)
+        order = (np.arange(self.ticks[row] - count, self.ticks[row])) % self.capacity
+        return self.times[row, order], self.prices[row, order], self.volumes[row, order]
+
+    def bars(self, day):
+        """Return the day's bar of every traded symbol as a PRICE_COLUMNS frame (Symbol added)"""
+        count = len(self.symbols)
+        bar = {name: values[:count] for name, values in self.bar.items()}
+        traded = np.flatnonzero(np.nan_to_num(bar["volume"]) > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = (bar["close"] / bar["prev_close"] - 1) * 100
+        return pd.DataFrame({
+            "Symbol": [self.symbols[idx] for idx in traded],
+            "S.N.": "1",
+            "Date": day,
+            "Open": [f"{value:,.2f}" for value in bar["open"][traded]],
+            "High": [f"{value:,.2f}" for value in bar["high"][traded]],
+            "Low": [f"{value:,.2f}" for value in bar["low"][traded]],
+            "Ltp": [f"{value:,.2f}" for value in bar["close"][traded]],
+            "% Change": [f"{value:.2f}" if np.isfinite(value) else "0.00" for value in change[traded]],
+            "Qty": [f"{value:,.2f}" for value in bar["volume"][traded]],
+            "Turnover": [f"{value:,.2f}" for value in bar["turnover"][traded]],
+        })
+
+
+def load_provisional(path=LIVE_BARS_PATH, reload=False):
+    """Return {(symbol, date): flushed_at} of the live bars not yet replaced by official rows"""
+    global _provisional
+    if _provisional is not None and not reload:
+        return _provisional
+    path = nepse_staging.current_path(path)
+    _provisional = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            _provisional = {(row["Symbol"], row["Date"]): row["FlushedAt"] for row in csv.DictReader(file)}
+    return _provisional
+
+
+def save_provisional(path=LIVE_BARS_PATH):
+    provisional = load_provisional()
+    with _lock:
+        rows = [{"Symbol": symbol, "Date": day, "FlushedAt": flushed_at} for (symbol, day), flushed_at in sorted(provisional.items())]
+    with nepse_staging.open_staged(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=LIVE_BARS_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def is_provisional(symbol, day):
+    """True if the stored row of symbol on day is a live bar"""
+    return (symbol, day) in load_provisional()
+
+
+def confirm(symbol):
+    """Forget the live bars of symbol after its official rows were written; returns True if any"""
+    provisional = load_provisional()
+    with _lock:
+        keys = [key for key in provisional if key[0] == symbol]
+        for key in keys:
+            del provisional[key]
+    return bool(keys)
+
+
+def flush(watch, day):
+    """Write the day's bars into Nepse_Data (one staged commit); returns the symbols written"""
+    bars = watch.bars(day)
+    registry = nepse_registry.load_registry()
+    provisional = load_provisional()
+    flushed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    written = []
+    for symbol, bar in bars.groupby("Symbol", sort=False):
+        record = registry.get(symbol)
+        if record is None or record["Status"] != nepse_registry.LISTED:
+            continue
+        if nepse_shards.exists(record["FilePath"]) and (nepse_shards.latest_stored_date(record["FilePath"]) or "") > day:
+            continue  # Never put a live bar under newer official rows
+        new_df = bar[PRICE_COLUMNS].reset_index(drop=True)
+        with nepse_metrics.timer("write", symbol=symbol):
+            changed = nepse_changes.changed_rows(record["FilePath"], new_df)
+            _, conflicts = nepse_shards.upsert(record["FilePath"], new_df, symbol)
+        nepse_changes.record(symbol, record["Sector"], changed)
+        if conflicts:
+            nepse_merge.log_conflicts(conflicts)
+        nepse_registry.update_dates(symbol, record["FilePath"])
+        nepse_snapshot.update(symbol, record["Sector"], record["FilePath"])
+        with _lock:
+            provisional[(symbol, day)] = flushed_at
+        written.append(symbol)
+    if written:
+        nepse_registry.save_registry()
+        nepse_snapshot.save_snapshot()
+        save_provisional()
+        nepse_changes.flush("nepse_live")
+        nepse_staging.commit()
+    return written
+
+
+def close_time(day, close=MARKET_CLOSE):
+    """Return the market close of day (YYYY-MM-DD) as an aware datetime in Nepal time"""
+    return datetime.strptime(f"{day} {close}", "%Y-%m-%d %H:%M").replace(tzinfo=MARKET_TIMEZONE)
+
+
+def snapshot_time(as_of):
+    """Return the epoch seconds of an "As of" stamp, which is in Nepal time (now if it has no time)"""
+    if len(as_of) <= 10:
+        return time.time()
+    return datetime.strptime(as_of[:16], "%Y-%m-%d %H:%M").replace(tzinfo=MARKET_TIMEZONE).timestamp()
+
+
+def poll(watch, url=LIVE_URL, interval=INTERVAL, close=MARKET_CLOSE, once=False):
+    """
+    Poll the live page into watch until the market closes; returns the session date.
+
+    Before the open the page still shows the previous session as closed, so
+    the poll only stops on a closed page after it has seen the market open
+    (or when the close time of today passes without an open session).
+    """
+    last_as_of = None
+    last_closed = True  # Until a page says otherwise
+    seen_open = False
+    today = datetime.now(MARKET_TIMEZONE).strftime("%Y-%m-%d")
+    day = today
+    while True:
+        started = time.perf_counter()
+        try:
+            with nepse_metrics.timer("live_poll"):
+                response = nepse_http.get(url, ttl=0)
+                response.raise_for_status()
+            as_of, closed, ticks = parse_live_page(response.text)
+            last_closed = closed
+        except Exception as e:
+            # A failed poll says nothing about the market: keep the last page's
+            # state and retry; only a "Market Closed" page or the close time stops
+            print(f"⚠️ Live page unavailable, retrying: {e}")
+            nepse_metrics.inc("failures", source="live")
+            as_of, closed, ticks = last_as_of, last_closed, []
+
+        if ticks and as_of != last_as_of and (seen_open or not closed or once):
+            day = as_of[:10]
+            timestamp = snapshot_time(as_of)
+            count = watch.add_snapshot(ticks, timestamp)
+            nepse_metrics.inc("live_ticks", count)
+            print(f"📡 {as_of}: {count} tick(s), {len(watch.symbols)} symbol(s) watched")
+            last_as_of = as_of
+        seen_open = seen_open or not closed
+        if once:
+            return day
+        if seen_open and (closed or (as_of or "")[11:16] >= close):
+            print(f"🔔 Market closed for {day}")
+            return day
+        if datetime.now(MARKET_TIMEZONE) >= close_time(today, close) and (not seen_open or day == today):
+            print(f"🔔 Past the {close} close of {today}")
+            return day
+        time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Poll the live market watch and flush the day's bars at the close")
+    parser.add_argument("--url", default=LIVE_URL, help="Live trading page")
+    parser.add_argument("--interval", type=float, default=INTERVAL, help="Seconds between polls")
+    parser.add_argument("--close", default=MARKET_CLOSE, help="Market close in Nepal time (HH:MM)")
+    parser.add_argument("--once", action="store_true", help="Take one snapshot and stop")
+    parser.add_argument("--no-flush", action="store_true", help="Do not write the bars to Nepse_Data")
+    args = parser.parse_args()
+    nepse_metrics.start_job("nepse_live")
+    nepse_staging.begin("nepse_live")
+
+    watch = MarketWatch()
+    day = poll(watch, args.url, args.interval, args.close, args.once)
+    bars = watch.bars(day)
+    print(bars.drop(columns=["S.N."]).to_string(index=False) if len(bars) else "⚠️ No symbol traded")
+    if not args.no_flush:
+        written = flush(watch, day)
+        print(f"✅ Flushed {len(written)} live bar(s) for {day} into Nepse_Data")
@@ -0,0 +1,219 @@
+"""
+Keyed upsert of scraped price rows into a symbol's history.
+
+Rows are keyed on Date. Both sides are already sorted (the CSVs are stored
+newest-first and the scraper reads pages newest-first), so the merge works on
+sorted Date arrays: matching keys are found with a binary search and the output
+positions of the kept and new rows are computed directly, without a concat and
+re-sort of the whole history.
+
+- Last write wins: a scraped row replaces the stored row with the same Date
+- A replaced row whose values differ is logged to other_nepse_detail/merge_conflicts.csv
+- Duplicate Dates on either side collapse to one row, so repeated or
+  overlapping runs (re-scrapes, partial pages, full-history scrapes) are idempotent
+
+All cells are kept as the strings read from the CSV/site, so untouched rows are
+written back byte-for-byte.
+
+stream_upsert() applies the same rules straight to a CSV file: the stored rows
+are copied through a staged file in one pass and only the scraped rows are held
+in memory, so peak memory stays flat however long the history is.
+
+Reads go through nepse_staging.current_path(), so a job sees its own staged,
+not yet committed writes.
+"""
+
+import csv
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import nepse_staging
+from nepse_common import OTHER_DETAIL_FOLDER, PRICE_COLUMNS
+
+CONFLICT_LOG_PATH = os.path.join(OTHER_DETAIL_FOLDER, "merge_conflicts.csv")
+CONFLICT_COLUMNS = ["LoggedAt", "Symbol", "Date", "Column", "Old", "New"]
+# Writer threads of several jobs log conflicts; each append restages the whole log
+_log_lock = threading.Lock()
+
+VALUE_COLUMNS = [col for col in PRICE_COLUMNS if col not in ("S.N.", "Date")]
+
+
+def read_history(csv_path):
+    """Read a price CSV with every cell as a string (None if the file is missing)"""
+    csv_path = nepse_staging.current_path(csv_path)
+    if not os.path.exists(csv_path):
+        return None
+    return pd.read_csv(csv_path, encoding="utf-8", dtype=str, keep_default_na=False)
+
+
+def _oldest_first_unique(df):
+    """Return (dates, values) sorted oldest-first with one row per Date"""
+    values = df[PRICE_COLUMNS].to_numpy(dtype=object)
+    dates = df["Date"].to_numpy(dtype=str)
+    if len(dates) > 1 and np.all(dates[1:] <= dates[:-1]):
+        # Stored newest-first: reversing is enough, no sort needed
+        dates, values = dates[::-1], values[::-1]
+    elif len(dates) > 1:
+        order = np.argsort(dates, kind="stable")
+        dates, values = dates[order], values[order]
+    # Last occurrence in oldest-first order is the row nearest the top of the file
+    keep = np.ones(len(dates), dtype=bool)
+    keep[:-1] = dates[:-1] != dates[1:]
+    return dates[keep], values[keep]
+
+
+def latest_stored_date(csv_path):
+    """Return the newest Date in a price CSV, reading one row at a time (None if missing/empty)"""
+    csv_path = nepse_staging.current_path(csv_path)
+    if not os.path.exists(csv_path):
+        return None
+    latest = None
+    with open(csv_path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if not header or "Date" not in header:
+            return None
+        date_idx = header.index("Date")
+        for row in reader:
+            if len(row) > date_idx and (latest is None or row[date_idx] > latest):
+                latest = row[date_idx]
+    return latest
+
+
+def upsert_rows(existing_df, new_df, symbol=""):
+    """
+    Upsert new_df into existing_df keyed on Date.
+
+    Returns (merged_df, conflicts): merged_df is newest-first with S.N.
+    renumbered from 1, conflicts lists the replaced rows whose values changed.
+    """
+    new_dates, new_values = _oldest_first_unique(new_df)
+    if existing_df is None or existing_df.empty:
+        old_dates, old_values = new_dates[:0], new_values[:0]
+    else:
+        old_dates, old_values = _oldest_first_unique(existing_df)
+
+    # Binary-search every new Date in the stored Dates
+    pos = np.searchsorted(old_dates, new_dates)
+    in_range = pos < len(old_dates)
+    hit = np.zeros(len(new_dates), dtype=bool)
+    hit[in_range] = old_dates[pos[in_range]] == new_dates[in_range]
+
+    conflicts = []
+    logged_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    value_idx = [PRICE_COLUMNS.index(col) for col in VALUE_COLUMNS]
+    for new_i, old_i in zip(np.flatnonzero(hit), pos[hit]):
+        for col, idx in zip(VALUE_COLUMNS, value_idx):
+            old, new = old_values[old_i, idx], new_values[new_i, idx]
+            if str(old) != str(new):
+                conflicts.append([logged_at, symbol, str(new_dates[new_i]), col, old, new])
+
+    keep = np.ones(len(old_dates), dtype=bool)
+    keep[pos[hit]] = False
+    kept_dates, kept_values = old_dates[keep], old_values[keep]
+
+    # Merge-join of two sorted, disjoint key sets: each row's output slot is
+    # its own rank plus the number of rows from the other side before it
+    total = len(kept_dates) + len(new_dates)
+    merged = np.empty((total, len(PRICE_COLUMNS)), dtype=object)
+    merged[np.arange(len(kept_dates)) + np.searchsorted(new_dates, kept_dates)] = kept_values
+    merged[np.arange(len(new_dates)) + np.searchsorted(kept_dates, new_dates)] = new_values
+
+    merged_df = pd.DataFrame(merged[::-1], columns=PRICE_COLUMNS)
+    merged_df["S.N."] = np.arange(1, total + 1)
+    return merged_df, conflicts
+
+
+def log_conflicts(conflicts, path=CONFLICT_LOG_PATH):
+    """Append conflict rows to the merge conflict log (staged; lands with the next commit)"""
+    if not conflicts:
+        return
+    with _log_lock:
+        write_header = not os.path.exists(nepse_staging.current_path(path))
+        with nepse_staging.open_appended(path, newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            if write_header:
+                writer.writerow(CONFLICT_COLUMNS)
+            writer.writerows(conflicts)
+
+
+class _UnsortedHistory(Exception):
+    """The stored CSV is not newest-first, so it cannot be merged in one pass"""
+
+
+def _stream_merge(source_path, tmp_path, new_dates, new_values, symbol):
+    """Write the merge of the stored file and the (newest-first) new rows to tmp_path"""
+    conflicts = []
+    logged_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    value_idx = [PRICE_COLUMNS.index(col) for col in VALUE_COLUMNS]
+    written = 0
+    next_new = 0
+
+    with open(tmp_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(PRICE_COLUMNS)
+
+        def emit(row):
+            nonlocal written
+            written += 1
+            writer.writerow([written] + list(row[1:]))
+
+        if os.path.exists(source_path):
+            with open(source_path, "r", encoding="utf-8", newline="") as src:
+                reader = csv.reader(src)
+                if next(reader, PRICE_COLUMNS) != PRICE_COLUMNS:
+                    raise _UnsortedHistory()
+                previous = None
+                for row in reader:
+                    if not row:
+                        continue
+                    date = row[1]
+                    if previous is not None and date > previous:
+                        raise _UnsortedHistory()
+                    while next_new < len(new_dates) and new_dates[next_new] > date:
+                        emit(new_values[next_new])
+                        next_new += 1
+                    if date == previous:
+                        # Duplicate stored Date: the row nearest the top (already handled) wins
+                        continue
+                    previous = date
+                    if next_new < len(new_dates) and new_dates[next_new] == date:
+                        # Last write wins; log the stored values it replaces
+                        new_row = new_values[next_new]
+                        for col, idx in zip(VALUE_COLUMNS, value_idx):
+                            if str(row[idx]) != str(new_row[idx]):
+                                conflicts.append([logged_at, symbol, date, col, row[idx], new_row[idx]])
+                        emit(new_row)
+                        next_new += 1
+                    else:
+                        emit(row)
+
+        for row in new_values[next_new:]:
+            emit(row)
+    return written, conflicts
+
+
+def stream_upsert(csv_path, new_df, symbol=""):
+    """
+    Upsert new_df into the CSV at csv_path without loading the stored history.
+
+    Same rules and output as upsert_rows() followed by to_csv(). Files that are
+    not sorted newest-first fall back to the in-memory merge. The result is
+    staged and lands on disk with nepse_staging.commit().
+    Returns (rows_written, conflicts).
+    """
+    new_dates, new_values = _oldest_first_unique(new_df)
+    new_dates, new_values = new_dates[::-1], new_values[::-1]
+    source_path = nepse_staging.current_path(csv_path)
+    with nepse_staging.staged(csv_path) as tmp_path:
+        try:
+            written, conflicts = _stream_merge(source_path, tmp_path, new_dates, new_values, symbol)
+        except _UnsortedHistory:
+            merged_df, conflicts = upsert_rows(read_history(csv_path), new_df, symbol)
+            merged_df.to_csv(tmp_path, index=False, encoding="utf-8")
+            written = len(merged_df)
+    return written, conflicts
@@ -0,0 +1,197 @@
+"""
+Structured metrics and per-stage timing for the scraping jobs.
+
+A job calls start_job() once, then:
+- timer(stage, **labels) times a block (driver_start, page_load, table_extract,
+  merge, write, git, ...) and records it in the <stage>_seconds histogram
+- inc(name, value, **labels) bumps a counter (pages, rows, retries, failures)
+- observe(name, value, **labels) records a value in a histogram
+
+Every event is appended as one JSON line to metrics/<job>_<timestamp>.jsonl.
+When the job exits, a summary table of stage timings and counters is printed
+and, if NEPSE_PROMETHEUS_FILE is set, all metrics are written to that file in
+the Prometheus text format (for node_exporter's textfile collector).
+
+Counters are kept per label set (e.g. failures per symbol/sector). Histograms
+are kept per name only; their labels go to the JSON lines.
+
+Usage:
+    import nepse_metrics
+    nepse_metrics.start_job("nepse_data_update")
+    with nepse_metrics.timer("page_load", symbol="NABIL"):
+        driver.get(url)
+    nepse_metrics.inc("rows", len(rows), sector="Commercial_Banks")
+"""
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import nepse_profiling
+
+METRICS_FOLDER = os.getenv("NEPSE_METRICS_DIR", "metrics")
+PROMETHEUS_FILE = os.getenv("NEPSE_PROMETHEUS_FILE")
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Counters listed per label set (not only as a total) in the summary table
+DETAIL_COUNTERS = ("failures", "retries", "stage_busy_seconds", "stage_starved_seconds", "stage_blocked_seconds")
+
+_lock = threading.Lock()
+_job = None
+_job_started = None
+_events_path = None
+_counters = {}
+_histograms = {}
+
+
+def _label_key(labels):
+    """Return a hashable, ordered form of a label dict"""
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _emit(event):
+    """Append one event as a JSON line (no-op before start_job)"""
+    if _events_path is None:
+        return
+    event = {"ts": datetime.now().isoformat(timespec="milliseconds"), "job": _job, **event}
+    with open(_events_path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(event, default=str) + "\n")
+
+
+def start_job(name, metrics_folder=METRICS_FOLDER):
+    """Start collecting metrics for a job; the summary is written at exit"""
+    global _job, _job_started, _events_path
+    _job = name
+    _job_started = time.perf_counter()
+    os.makedirs(metrics_folder, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    _events_path = os.path.join(metrics_folder, f"{name}_{stamp}.jsonl")
+    _counters.clear()
+    _histograms.clear()
+    _emit({"event": "job_start", "pid": os.getpid()})
+    atexit.register(finish)
+    return _events_path
+
+
+def inc(name, value=1, **labels):
+    """Add value to the counter name{labels}"""
+    with _lock:
+        key = (name, _label_key(labels))
+        _counters[key] = _counters.get(key, 0) + value
+        _emit({"event": "counter", "name": name, "value": value, "labels": labels})
+
+
+def observe(name, value, **labels):
+    """Record value in the histogram name"""
+    with _lock:
+        histogram = _histograms.setdefault(name, {"values": [], "buckets": [0] * len(LATENCY_BUCKETS)})
+        histogram["values"].append(value)
+        for idx, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][idx] += 1
+        _emit({"event": "observe", "name": name, "value": round(value, 6), "labels": labels})
+
+
+@contextmanager
+def timer(stage, **labels):
+    """Time a block and record it in <stage>_seconds (failures are counted too)"""
+    start = time.perf_counter()
+    try:
+        # With --profile every timed stage is also CPU/memory profiled
+        with nepse_profiling.stage(stage):
+            yield
+    except BaseException:
+        inc(f"{stage}_errors", **labels)
+        raise
+    finally:
+        observe(f"{stage}_seconds", time.perf_counter() - start, **labels)
+
+
+def _percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summary_table():
+    """Return the stage timing and counter summary as printable text"""
+    lines = [f"{'Stage':<24}{'Count':>8}{'Total s':>11}{'Mean s':>10}{'p50 s':>10}{'p95 s':>10}{'Max s':>10}"]
+    for name in sorted(_histograms):
+        values = sorted(_histograms[name]["values"])
+        stage = name[:-len("_seconds")] if name.endswith("_seconds") else name
+        total = sum(values)
+        lines.append(
+            f"{stage:<24}{len(values):>8}{total:>11.2f}{total / len(values):>10.3f}"
+            f"{_percentile(values, 0.5):>10.3f}{_percentile(values, 0.95):>10.3f}{values[-1]:>10.3f}"
+        )
+
+    totals = {}
+    for (name, _), value in _counters.items():
+        totals[name] = totals.get(name, 0) + value
+    lines.append("")
+    lines.append(f"{'Counter':<48}{'Value':>10}")
+    for name in sorted(totals):
+        lines.append(f"{name:<48}{totals[name]:>10g}")
+        if name in DETAIL_COUNTERS:
+            for (counter, labels), value in sorted(_counters.items()):
+                if counter == name and labels:
+                    label_text = ",".join(f"{key}={val}" for key, val in labels)
+                    lines.append(f"  {label_text:<46}{value:>10g}")
+    return "\n".join(lines)
+
+
+def _prometheus_labels(labels):
+    """Format labels as {key="value",...} including the job label"""
+    pairs = [("job", _job or "")] + list(labels)
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def write_prometheus(path):
+    """Write counters and histograms in the Prometheus text exposition format"""
+    lines = []
+    for name in sorted({name for name, _ in _counters}):
+        metric = f"nepse_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for (counter, labels), value in sorted(_counters.items()):
+            if counter == name:
+                lines.append(f"{metric}{_prometheus_labels(labels)} {value:g}")
+    for name, histogram in sorted(_histograms.items()):
+        metric = f"nepse_{name}"
+        lines.append(f"# TYPE {metric} histogram")
+        for bound, count in zip(LATENCY_BUCKETS, histogram["buckets"]):
+            lines.append(f"{metric}_bucket{_prometheus_labels([('le', bound)])} {count}")
+        lines.append(f"{metric}_bucket{_prometheus_labels([('le', '+Inf')])} {len(histogram['values'])}")
+        lines.append(f"{metric}_sum{_prometheus_labels([])} {sum(histogram['values']):.6f}")
+        lines.append(f"{metric}_count{_prometheus_labels([])} {len(histogram['values'])}")
+
+    # Write then rename so a scraper never reads a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def finish():
+    """Emit job_end, print the summary table and write the Prometheus file"""
+    global _events_path
+    if _events_path is None:
+        return
+    elapsed = time.perf_counter() - _job_started
+    _emit({"event": "job_end", "seconds": round(elapsed, 3)})
+    print(f"\n{'='*60}")
+    print(f"⏱️ Metrics for {_job} ({elapsed:.1f}s total, events in {_events_path})")
+    print(f"{'='*60}")
+    print(summary_table())
+    if PROMETHEUS_FILE:
+        write_prometheus(PROMETHEUS_FILE)
+        print(f"📈 Prometheus metrics written to {PROMETHEUS_FILE}")
+    _events_path = None
@@ -0,0 +1,240 @@
+"""
+Parallel re-normalization of every price CSV into one layout.
+
+Rewrites Nepse_Data/<Sector>/<SYMBOL>.csv files with a process pool, one file
+per task. A layout is chosen with:
+- --order   newest | oldest   row order (by Date, stable)
+- --serial  keep | drop       S.N. column, renumbered from 1 when kept
+- --numbers grouped | plain   "1,162.00" (thousands separators) or 1162.00
+Dates are always normalized to YYYY-MM-DD. The defaults are the layout the
+scrapers write, so a default run only repairs files that drifted from it.
+--order oldest and --serial drop are only accepted with --dry-run: the readers
+(load_price_dataset, validation, snapshots, the updaters) expect newest-first
+files with the S.N. column, so they can be previewed but not written.
+
+Every file is verified:
+1. A data fingerprint (sorted Date + value rows, separators removed) must be
+   the same before and after, so only the layout changes, never the data
+2. The source SHA-256 is rechecked before the new file is staged, so a file
+   changed during the run is left alone
+3. After the commit every written file's SHA-256 must match the output
+
+Running the same migration twice is a no-op: files already in the target
+layout are reported as unchanged and not rewritten. All rewrites are staged and
+committed as one batch (nepse_staging), so the tree never ends up half-migrated.
+--dry-run writes nothing and reports the size and row-count deltas.
+
+Year-sharded histories (nepse_shards) are not touched.
+
+Usage:
+    python nepse_migrate.py --dry-run                       # check the tree
+    python nepse_migrate.py --numbers plain --dry-run       # preview a change
+    python nepse_migrate.py --numbers plain --workers 8     # migrate
+    python nepse_migrate.py --report migration.csv          # per-file report
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import nepse_staging
+from nepse_common import BASE_FOLDER, PRICE_COLUMNS
+
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y")
+VALUE_COLUMNS = PRICE_COLUMNS[2:]
+# Columns whose integer part is grouped with thousands separators
+GROUPED_COLUMNS = ("Open", "High", "Low", "Ltp", "Qty", "Turnover")
+REPORT_COLUMNS = ["Path", "Status", "RowsBefore", "RowsAfter", "BytesBefore", "BytesAfter", "ShaBefore", "ShaAfter", "Error"]
+
+
+def normalize_date(value):
+    """Return value as YYYY-MM-DD (ValueError if no known format matches)"""
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date {value!r}")
+
+
+def format_number(value, grouped):
+    """Return a numeric cell with or without thousands separators, keeping its decimals"""
+    plain = value.strip().replace(",", "")
+    if not grouped or not plain:
+        return plain
+    sign = "-" if plain.startswith("-") else ""
+    whole, dot, decimals = plain.lstrip("-").partition(".")
+    if not whole.isdigit():
+        return plain
+    return f"{sign}{int(whole):,}{dot}{decimals}"
+
+
+def fingerprint(rows):
+    """Return a layout-independent SHA-256 of (Date, values) rows"""
+    digest = hashlib.sha256()
+    for row in sorted(rows):
+        digest.update("\x1f".join(row).encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def transform(data, layout):
+    """
+    Return (new bytes, rows) for the CSV bytes data in the given layout.
+
+    Raises ValueError when the file cannot be migrated without losing data.
+    """
+    reader = csv.reader(io.StringIO(data.decode("utf-8"), newline=""))
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("empty file")
+    missing = [col for col in PRICE_COLUMNS[1:] if col not in header]
+    if missing:
+        raise ValueError(f"missing column(s) {', '.join(missing)}")
+    value_idx = [header.index(col) for col in PRICE_COLUMNS[1:]]
+
+    before, records = [], []
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        cells = [row[idx] if idx < len(row) else "" for idx in value_idx]
+        date = normalize_date(cells[0])
+        before.append((date, *(cell.strip().replace(",", "") for cell in cells[1:])))
+        records.append([date] + [format_number(cell, layout["numbers"] == "grouped" and col in GROUPED_COLUMNS)
+                                 for col, cell in zip(VALUE_COLUMNS, cells[1:])])
+
+    records.sort(key=lambda record: record[0], reverse=layout["order"] == "newest")
+    after = [(record[0], *(cell.replace(",", "") for cell in record[1:])) for record in records]
+    if fingerprint(before) != fingerprint(after):
+        raise ValueError("data fingerprint changed")
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if layout["serial"] == "keep":
+        writer.writerow(PRICE_COLUMNS)
+        writer.writerows([idx] + record for idx, record in enumerate(records, start=1))
+    else:
+        writer.writerow(PRICE_COLUMNS[1:])
+        writer.writerows(records)
+    return out.getvalue().encode("utf-8"), len(records)
+
+
+def migrate_file(task):
+    """Worker: transform one file and write the result to the scratch folder"""
+    path, layout, scratch, dry_run = task
+    result = {"Path": path, "Status": "unchanged", "RowsBefore": 0, "RowsAfter": 0, "BytesBefore": 0,
+              "BytesAfter": 0, "ShaBefore": "", "ShaAfter": "", "Error": "", "Output": None}
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        result["BytesBefore"] = len(data)
+        result["ShaBefore"] = hashlib.sha256(data).hexdigest()
+        result["RowsBefore"] = max(0, data.count(b"\n") - 1)
+        new_data, rows = transform(data, layout)
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        result.update(Status="failed", Error=str(e))
+        return result
+
+    result.update(RowsAfter=rows, BytesAfter=len(new_data), ShaAfter=hashlib.sha256(new_data).hexdigest())
+    if new_data == data:
+        return result
+    result["Status"] = "changed"
+    if not dry_run:
+        output = os.path.join(scratch, hashlib.sha1(path.encode("utf-8")).hexdigest())
+        with open(output, "wb") as file:
+            file.write(new_data)
+        result["Output"] = output
+    return result
+
+
+def file_sha(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def migrate(paths, layout, workers=None, dry_run=False):
+    """Migrate paths in a process pool; returns the per-file results"""
+    # Scratch output sits next to the staging area so staging it is a rename
+    scratch = os.path.join(nepse_staging.STAGING_FOLDER, f"migrate_{os.getpid()}")
+    os.makedirs(scratch, exist_ok=True)
+    try:
+        tasks = [(path, layout, scratch, dry_run) for path in paths]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(migrate_file, tasks, chunksize=8))
+        if dry_run:
+            return results
+
+        for result in results:
+            if result["Status"] != "changed":
+                continue
+            if file_sha(result["Path"]) != result["ShaBefore"]:
+                result.update(Status="failed", Error="changed during the migration")
+                continue
+            with nepse_staging.staged(result["Path"]) as tmp_path:
+                os.replace(result["Output"], tmp_path)
+        nepse_staging.commit()
+
+        for result in results:
+            if result["Status"] == "changed" and file_sha(result["Path"]) != result["ShaAfter"]:
+                result.update(Status="failed", Error="checksum mismatch after writing")
+        return results
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def print_summary(results, dry_run, elapsed):
+    counts = {status: sum(1 for r in results if r["Status"] == status) for status in ("changed", "unchanged", "failed")}
+    bytes_before = sum(r["BytesBefore"] for r in results)
+    bytes_after = sum(r["BytesAfter"] if r["Status"] != "failed" else r["BytesBefore"] for r in results)
+    rows_before = sum(r["RowsBefore"] for r in results)
+    rows_after = sum(r["RowsAfter"] if r["Status"] != "failed" else r["RowsBefore"] for r in results)
+    verb = "would change" if dry_run else "changed"
+    print(f"📦 {len(results)} file(s) in {elapsed:.1f}s: {counts['changed']} {verb}, "
+          f"{counts['unchanged']} unchanged, {counts['failed']} failed")
+    print(f"   size {bytes_before / 2**20:.2f} MiB → {bytes_after / 2**20:.2f} MiB ({bytes_after - bytes_before:+,} bytes)")
+    print(f"   rows {rows_before:,} → {rows_after:,} ({rows_after - rows_before:+,})")
+    for result in [r for r in results if r["Status"] == "failed"][:20]:
+        print(f"   ❌ {result['Path']}: {result['Error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite every price CSV into one layout, in parallel")
+    parser.add_argument("--order", choices=["newest", "oldest"], default="newest", help="Row order by Date")
+    parser.add_argument("--serial", choices=["keep", "drop"], default="keep", help="Keep (renumbered) or drop S.N.")
+    parser.add_argument("--numbers", choices=["grouped", "plain"], default="grouped", help="Thousands separators or not")
+    parser.add_argument("--folder", nargs="*", default=[BASE_FOLDER], help="Data folders to migrate")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing")
+    parser.add_argument("--report", help="Write a per-file CSV report to this path")
+    args = parser.parse_args()
+    if not args.dry_run and (args.order, args.serial) != ("newest", "keep"):
+        parser.error("--order oldest and --serial drop make files the other scripts cannot read; "
+                     "use them with --dry-run only")
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    layout = {"order": args.order, "serial": args.serial, "numbers": args.numbers}
+    paths = sorted(path for folder in args.folder for path in glob.glob(os.path.join(folder, "*", "*.csv")))
+    nepse_staging.begin("nepse_migrate")
+    start = time.perf_counter()
+    results = migrate(paths, layout, args.workers, args.dry_run)
+    print_summary(results, args.dry_run, time.perf_counter() - start)
+
+    if args.report:
+        with open(args.report, "w", newline="", encoding="utf-8") as file:
+            writer = csv.DictWriter(file, fieldnames=REPORT_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"📝 Report written to {args.report}")
+    return 1 if any(r["Status"] == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
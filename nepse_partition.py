@@ -0,0 +1,175 @@
+"""
+Sharded runs of nepse_data_update.py across several runners, and their merge.
+
+`--shard i/N` gives runner i of N a deterministic slice of the listed symbols
+(a CRC32 of the symbol modulo N, identical on every machine and Python
+version); the N slices are disjoint and together cover every symbol:
+1. Each shard runner plans, scrapes and times only its own symbols, writes
+   nothing under Nepse_Data and commits nothing; record() queues what it
+   scraped and write_artifact() leaves it in
+       shard_results/shard_<i>_of_<N>/rows.csv       Symbol, Sector + price columns
+       shard_results/shard_<i>_of_<N>/checked.csv    Symbol, Sector, Seconds
+       shard_results/shard_<i>_of_<N>/manifest.json  shard, count, counts, sha256s
+   for the CI job to upload
+2. The merge job (`--merge-shards shard_results`) calls load_artifacts(),
+   which refuses a missing or duplicated shard, a checksum mismatch or a
+   symbol outside its shard, then feeds the rows through the same upsert,
+   validation and rollback as a single-runner run and commits once
+
+Usage:
+    python nepse_data_update.py --shard 1/4 --budget 5h     # on each of 4 runners
+    python nepse_data_update.py --merge-shards shard_results
+    python nepse_partition.py 4                             # symbols per shard
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+import nepse_scheduler
+from nepse_common import PRICE_COLUMNS
+
+ARTIFACT_FOLDER = "shard_results"
+ROW_COLUMNS = ["Symbol", "Sector"] + PRICE_COLUMNS
+CHECKED_COLUMNS = ["Symbol", "Sector", "Seconds"]
+
+_lock = threading.Lock()
+_rows = []
+_checked = []
+
+
+def parse_shard(text):
+    """Parse 'i/N' (1 <= i <= N) into (i, N)"""
+    try:
+        index, count = (int(part) for part in str(text).split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {text!r} (expected i/N, e.g. 2/4)")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard {text!r} (i must be between 1 and N)")
+    return index, count
+
+
+def shard_of(symbol, count):
+    """Return the 1-based shard of symbol among count shards"""
+    return zlib.crc32(symbol.strip().upper().encode("utf-8")) % count + 1
+
+
+def select(symbols, shard):
+    """Return the symbols of shard (i, N), in their original order"""
+    index, count = shard
+    return [symbol for symbol in symbols if shard_of(symbol, count) == index]
+
+
+def shard_folder(shard, folder=ARTIFACT_FOLDER):
+    index, count = shard
+    return os.path.join(folder, f"shard_{index}_of_{count}")
+
+
+def record(symbol, sector, rows, seconds):
+    """Queue the scraped rows (PRICE_COLUMNS lists) and the visit time of symbol"""
+    with _lock:
+        _rows.extend([symbol, sector, *row[:len(PRICE_COLUMNS)]] for row in rows)
+        _checked.append([symbol, sector, f"{seconds:.1f}"])
+
+
+def _write_csv(path, columns, rows):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def write_artifact(shard, planned, folder=ARTIFACT_FOLDER):
+    """Write the queued results of shard as its artifact folder; returns the folder"""
+    with _lock:
+        rows, checked = list(_rows), list(_checked)
+        _rows.clear()
+        _checked.clear()
+    target = shard_folder(shard, folder)
+    os.makedirs(target, exist_ok=True)
+    manifest = {
+        "shard": shard[0],
+        "count": shard[1],
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "planned": planned,
+        "checked": len(checked),
+        "rows": len(rows),
+        "sha256": {
+            "rows.csv": _write_csv(os.path.join(target, "rows.csv"), ROW_COLUMNS, rows),
+            "checked.csv": _write_csv(os.path.join(target, "checked.csv"), CHECKED_COLUMNS, checked),
+        },
+    }
+    # The manifest is written last: a folder without one is an unfinished shard
+    with open(os.path.join(target, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return target
+
+
+def _read_csv(path, expected_sha256):
+    with open(path, "rb") as file:
+        body = file.read()
+    if hashlib.sha256(body).hexdigest() != expected_sha256:
+        raise ValueError(f"checksum mismatch in {path}")
+    return list(csv.DictReader(body.decode("utf-8").splitlines()))
+
+
+def load_artifacts(folder=ARTIFACT_FOLDER):
+    """
+    Return (rows, checked) of every shard artifact under folder.
+
+    rows is {symbol: [PRICE_COLUMNS lists]} and checked is {symbol: (sector,
+    seconds)}. Raises ValueError unless shards 1..N of a single N are all
+    present exactly once and every file and symbol checks out.
+    """
+    manifests = []
+    for root, _, files in os.walk(folder):
+        if "manifest.json" in files:
+            with open(os.path.join(root, "manifest.json"), "r", encoding="utf-8") as file:
+                manifests.append((root, json.load(file)))
+    if not manifests:
+        raise ValueError(f"no shard artifacts under {folder}")
+
+    counts = {manifest["count"] for _, manifest in manifests}
+    if len(counts) != 1:
+        raise ValueError(f"artifacts of different shard counts: {sorted(counts)}")
+    count = counts.pop()
+    indexes = sorted(manifest["shard"] for _, manifest in manifests)
+    if indexes != list(range(1, count + 1)):
+        missing = sorted(set(range(1, count + 1)) - set(indexes))
+        raise ValueError(f"expected shards 1..{count} once each, found {indexes} (missing {missing})")
+
+    rows, checked = {}, {}
+    for root, manifest in manifests:
+        shard_rows = _read_csv(os.path.join(root, "rows.csv"), manifest["sha256"]["rows.csv"])
+        shard_checked = _read_csv(os.path.join(root, "checked.csv"), manifest["sha256"]["checked.csv"])
+        if len(shard_rows) != manifest["rows"] or len(shard_checked) != manifest["checked"]:
+            raise ValueError(f"row counts of {root} do not match its manifest")
+        for item in shard_checked:
+            if shard_of(item["Symbol"], count) != manifest["shard"]:
+                raise ValueError(f"{item['Symbol']} in {root} belongs to shard {shard_of(item['Symbol'], count)}/{count}")
+            checked[item["Symbol"]] = (item["Sector"], float(item["Seconds"]))
+        for item in shard_rows:
+            if item["Symbol"] not in checked:
+                raise ValueError(f"{item['Symbol']} has rows in {root} but no visit")
+            rows.setdefault(item["Symbol"], []).append([item[col] for col in PRICE_COLUMNS])
+    return rows, checked
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Show how the listed symbols split into shards")
+    parser.add_argument("count", type=int, help="Number of shards")
+    args = parser.parse_args()
+
+    schedule = nepse_scheduler.load_schedule()
+    for index in range(1, args.count + 1):
+        symbols = select(schedule, (index, args.count))
+        seconds = sum(nepse_scheduler.estimated_seconds(schedule[symbol]) for symbol in symbols)
+        print(f"🧩 Shard {index}/{args.count}: {len(symbols)} symbol(s), ~{seconds / 60:.0f} min at full visit")
@@ -0,0 +1,180 @@
+"""
+Staged pipeline with bounded queues for the scraping jobs.
+
+A job's per-symbol work is split into stages (fetch → parse → write) that run
+in their own threads, so pages load while earlier symbols are parsed, written
+and committed:
+1. Stage(name, fn, workers) runs fn(item) in workers threads; fn returns the
+   item for the next stage, or None to drop it
+2. Stages are connected by queues of at most queue_size items: a stage that
+   gets ahead blocks (backpressure) instead of piling up scraped pages, so a
+   slow writer throttles the browsers rather than memory growing
+3. run(items) feeds the items, waits for the last stage and returns the
+   per-stage statistics; an exception in any stage stops every stage and is
+   re-raised in the caller
+
+Every stage counts its busy time (inside fn), starved time (waiting for
+input) and blocked time (waiting for room downstream). They are recorded as
+the stage_busy_seconds / stage_starved_seconds / stage_blocked_seconds
+counters and printed as a utilization table, which shows how much the stages
+overlapped. threaded=False runs every item through all stages in the calling
+thread, where --profile can follow them.
+
+Usage:
+    pipeline = nepse_pipeline.Pipeline([
+        nepse_pipeline.Stage("fetch", fetch, workers=2),
+        nepse_pipeline.Stage("parse", parse),
+        nepse_pipeline.Stage("write", write),
+    ])
+    pipeline.run(symbols)
+    print(pipeline.summary())
+"""
+
+import queue
+import threading
+import time
+
+import nepse_metrics
+
+QUEUE_SIZE = 4
+POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline stage: fn applied to every item by workers threads"""
+
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items=0, busy=0.0, starved=0.0, blocked=0.0):
+        with self._lock:
+            self.items += items
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+
+
+class Pipeline:
+    """Stages connected by bounded queues"""
+
+    def __init__(self, stages, queue_size=QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.wall = 0.0
+        self.source_blocked = 0.0
+
+    def _put(self, outbox, item, stop):
+        """Put item downstream, waiting for room; returns the seconds blocked"""
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                outbox.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                continue
+        return time.perf_counter() - start
+
+    def _work(self, stage, inbox, outbox, stop, errors, finished):
+        while not stop.is_set():
+            wait_start = time.perf_counter()
+            try:
+                item = inbox.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                stage.add(starved=time.perf_counter() - wait_start)
+                continue
+            stage.add(starved=time.perf_counter() - wait_start)
+            if item is _DONE:
+                inbox.put(_DONE)  # for the stage's other workers
+                break
+
+            busy_start = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+                break
+            stage.add(items=1, busy=time.perf_counter() - busy_start)
+            if result is not None and outbox is not None:
+                stage.add(blocked=self._put(outbox, result, stop))
+
+        # The last worker of a stage tells the next stage that no more items come
+        with stage._lock:
+            finished[stage.name] += 1
+            last = finished[stage.name] == stage.workers
+        if last and outbox is not None:
+            self._put(outbox, _DONE, stop)
+
+    def run(self, items, threaded=True):
+        """Push every item through the stages; returns the stages with their statistics"""
+        started = time.perf_counter()
+        if not threaded:
+            for item in items:
+                for stage in self.stages:
+                    busy_start = time.perf_counter()
+                    item = stage.fn(item)
+                    stage.add(items=1, busy=time.perf_counter() - busy_start)
+                    if item is None:
+                        break
+            self.wall = time.perf_counter() - started
+            self._record()
+            return self.stages
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stop = threading.Event()
+        errors = []
+        finished = {stage.name: 0 for stage in self.stages}
+        threads = []
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(self.stages) else None
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(stage, queues[index], outbox, stop, errors, finished),
+                                          name=f"{stage.name}-{worker + 1}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                self.source_blocked += self._put(queues[0], item, stop)
+            self._put(queues[0], _DONE, stop)
+            for thread in threads:
+                thread.join()
+        except BaseException:
+            stop.set()  # e.g. Ctrl+C: let the workers drain out
+            raise
+        finally:
+            self.wall = time.perf_counter() - started
+            self._record()
+        if errors:
+            raise errors[0]
+        return self.stages
+
+    def _record(self):
+        for stage in self.stages:
+            nepse_metrics.inc("stage_busy_seconds", round(stage.busy, 3), stage=stage.name)
+            nepse_metrics.inc("stage_starved_seconds", round(stage.starved, 3), stage=stage.name)
+            nepse_metrics.inc("stage_blocked_seconds", round(stage.blocked, 3), stage=stage.name)
+
+    def summary(self):
+        """Return the per-stage utilization table as printable text"""
+        lines = [f"{'Stage':<12}{'Workers':>8}{'Items':>8}{'Busy s':>10}{'Busy %':>8}{'Starved %':>11}{'Blocked %':>11}"]
+        for stage in self.stages:
+            capacity = max(self.wall * stage.workers, 1e-9)
+            lines.append(
+                f"{stage.name:<12}{stage.workers:>8}{stage.items:>8}{stage.busy:>10.2f}{100 * stage.busy / capacity:>8.0f}"
+                f"{100 * stage.starved / capacity:>11.0f}{100 * stage.blocked / capacity:>11.0f}"
+            )
+        busy = sum(stage.busy for stage in self.stages)
+        lines.append(f"Overlap: {busy:.1f}s of stage work in {self.wall:.1f}s wall ({busy / max(self.wall, 1e-9):.2f}x)")
+        return "\n".join(lines)
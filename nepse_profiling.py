@@ -0,0 +1,208 @@
+"""
+Opt-in profiling of the main stages of every job (--profile).
+
+When enabled, each stage wrapped in stage(name) (scrape loop, merge/write,
+calendar build, git, ...) gets:
+1. A CPU profile: pyinstrument (sampling) when installed, cProfile otherwise.
+   Repeated runs of a stage accumulate into one profile.
+2. tracemalloc snapshots: the peak memory of every run of the stage and the
+   top allocation sites of its largest runs
+
+Everything is written at exit to profiles/<job>_<timestamp>/:
+- <stage>.speedscope.json + <stage>.html  (pyinstrument; open in speedscope.app)
+- <stage>.pstats + <stage>.txt            (cProfile; flameprof/snakeviz-ready)
+- allocations.txt                         (peak and top-N allocations per stage)
+
+Only the thread that enabled profiling is profiled, and a stage nested in
+another stage is counted in the outer stage's CPU profile.
+
+Usage:
+    python nepse_data_update.py --profile
+    NEPSE_PROFILE=1 python nepse_holiday_update.py
+"""
+
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_FOLDER = os.getenv("NEPSE_PROFILE_DIR", "profiles")
+
+# Allocation sites listed per stage, and traceback depth kept by tracemalloc
+TOP_ALLOCATIONS = 15
+TRACEMALLOC_FRAMES = 10
+# Allocation diffs are taken for the first runs of a stage (snapshots are slow)
+SNAPSHOT_RUNS = 3
+
+_run_folder = None
+_thread = None
+_active = []
+_profilers = {}
+_allocations = {}
+_overhead_seconds = 0.0
+
+
+def profile_requested(argv=None):
+    """Return True when --profile was passed or NEPSE_PROFILE is set"""
+    argv = sys.argv if argv is None else argv
+    return "--profile" in argv or os.getenv("NEPSE_PROFILE", "") not in ("", "0")
+
+
+def enabled():
+    """Return True once enable() has been called"""
+    return _run_folder is not None
+
+
+def enable(job, profile_folder=PROFILE_FOLDER):
+    """Start profiling for a job; reports are written at exit"""
+    global _run_folder, _thread
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    _run_folder = os.path.join(profile_folder, f"{job}_{stamp}")
+    os.makedirs(_run_folder, exist_ok=True)
+    _thread = threading.get_ident()
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    atexit.register(write_reports)
+    print(f"🔬 Profiling enabled, reports will be written to {_run_folder}")
+    return _run_folder
+
+
+def _new_profiler():
+    """Return (kind, profiler) preferring the pyinstrument sampling profiler"""
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return "cprofile", cProfile.Profile()
+    return "pyinstrument", Profiler()
+
+
+def _start(kind, profiler):
+    if kind == "pyinstrument":
+        profiler.start()
+    else:
+        profiler.enable()
+
+
+def _stop(kind, profiler):
+    if kind == "pyinstrument":
+        profiler.stop()
+    else:
+        profiler.disable()
+
+
+def _top_allocations(diff):
+    """Return the largest allocation diffs, without the profiler's own"""
+    own_files = (tracemalloc.__file__, __file__)
+    diff = [stat for stat in diff if stat.traceback[0].filename not in own_files]
+    return diff[:TOP_ALLOCATIONS]
+
+
+@contextmanager
+def _overhead():
+    """Pause the outer stage's CPU profile and count the time as profiler overhead"""
+    global _overhead_seconds
+    outer = _profilers.get(_active[0]) if _active else None
+    if outer:
+        _stop(*outer)
+    paused = time.perf_counter()
+    try:
+        yield
+    finally:
+        _overhead_seconds += time.perf_counter() - paused
+        if outer:
+            _start(*outer)
+
+
+@contextmanager
+def stage(name):
+    """Profile a block as stage name (no-op unless profiling is enabled)"""
+    if not enabled() or threading.get_ident() != _thread or name in _active:
+        yield
+        return
+
+    outermost = not _active
+    record = _allocations.setdefault(name, {"runs": 0, "max_peak": 0, "seconds": 0.0, "diffs": []})
+    before = None
+    if record["runs"] < SNAPSHOT_RUNS:
+        with _overhead():
+            before = tracemalloc.take_snapshot()
+    _active.append(name)
+    start_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    if outermost:
+        kind, profiler = _profilers.get(name) or _new_profiler()
+        _profilers[name] = (kind, profiler)
+        _start(kind, profiler)
+    started = time.perf_counter()
+    overhead_at_start = _overhead_seconds
+    try:
+        yield
+    finally:
+        if outermost:
+            _stop(kind, profiler)
+        _, peak = tracemalloc.get_traced_memory()
+        record["runs"] += 1
+        record["seconds"] += time.perf_counter() - started - (_overhead_seconds - overhead_at_start)
+        record["max_peak"] = max(record["max_peak"], peak - start_current)
+        _active.pop()
+        if before is not None:
+            with _overhead():
+                diff = tracemalloc.take_snapshot().compare_to(before, "lineno")
+            record["diffs"].append((peak - start_current, _top_allocations(diff)))
+
+
+def _format_size(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def write_reports():
+    """Write the CPU profiles and the allocation report of every stage"""
+    global _run_folder
+    if _run_folder is None:
+        return
+    for name, (kind, profiler) in _profilers.items():
+        stem = os.path.join(_run_folder, name)
+        if kind == "pyinstrument":
+            from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+            session = profiler.last_session
+            if session is None:
+                continue
+            with open(f"{stem}.speedscope.json", "w", encoding="utf-8") as file:
+                file.write(SpeedscopeRenderer().render(session))
+            with open(f"{stem}.html", "w", encoding="utf-8") as file:
+                file.write(HTMLRenderer().render(session))
+        else:
+            profiler.dump_stats(f"{stem}.pstats")
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(40)
+            with open(f"{stem}.txt", "w", encoding="utf-8") as file:
+                file.write(report.getvalue())
+
+    lines = []
+    for name, record in _allocations.items():
+        lines.append(f"== {name}: {record['runs']} run(s), {record['seconds']:.2f}s, max peak {_format_size(record['max_peak'])}")
+        if record["diffs"]:
+            peak, diff = max(record["diffs"], key=lambda item: item[0])
+            lines.append(f"   top allocations of the largest sampled run (peak {_format_size(peak)}):")
+            for stat in diff:
+                frame = stat.traceback[0]
+                lines.append(f"   {_format_size(stat.size_diff):>12}  {stat.count_diff:>+8} blocks  {frame.filename}:{frame.lineno}")
+        lines.append("")
+    current, peak = tracemalloc.get_traced_memory()
+    lines.append(f"Process traced memory: current {_format_size(current)}, peak {_format_size(peak)}")
+    with open(os.path.join(_run_folder, "allocations.txt"), "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+
+    tracemalloc.stop()
+    print(f"🔬 Profiles written to {_run_folder}")
+    _run_folder = None
@@ -0,0 +1,199 @@
+"""
+Row-oriented symbol registry.
+
+other_nepse_detail/symbol_registry.csv holds one row per symbol:
+Symbol, Sector, Status (listed/delisted), FilePath, FirstDate, LastDate.
+It is loaded once per process into a dict keyed by symbol, so lookups are
+O(1) and shared by every script. listed_company.csv (sectors as columns) is
+still produced from it by export_legacy_csv() for existing consumers.
+
+Usage:
+    python nepse_registry.py build   # rebuild from listed_company.csv and the data files
+    python nepse_registry.py export  # rewrite listed_company.csv from the registry
+"""
+
+import csv
+import os
+import sys
+
+import nepse_shards
+import nepse_staging
+from nepse_common import BASE_FOLDER, LISTED_COMPANY_PATH, OTHER_DETAIL_FOLDER, filename_safe
+
+REGISTRY_PATH = os.path.join(OTHER_DETAIL_FOLDER, "symbol_registry.csv")
+REGISTRY_COLUMNS = ["Symbol", "Sector", "Status", "FilePath", "FirstDate", "LastDate"]
+ARCHIVE_FOLDER = "Nepse_Data_Archive"
+
+LISTED = "listed"
+DELISTED = "delisted"
+
+_registry = None
+
+
+def data_path(sector, symbol, folder=BASE_FOLDER):
+    """Return the CSV path of a symbol inside folder/sector"""
+    return os.path.join(folder, sector, f"{filename_safe(symbol)}.csv")
+
+
+def file_date_range(csv_path):
+    """
+    Return (first_date, last_date) of a newest-first price CSV.
+
+    Only the first data line and the last line are read. Sharded histories
+    are read from their first and last shard.
+    """
+    if nepse_shards.is_sharded(csv_path):
+        return nepse_shards.date_range(csv_path)
+    csv_path = nepse_staging.current_path(csv_path)
+    if not os.path.exists(csv_path):
+        return "", ""
+    with open(csv_path, "rb") as file:
+        file.readline()
+        top = file.readline()
+        if not top.strip():
+            return "", ""
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - 4096))
+        bottom = file.read().splitlines()[-1]
+    last = top.decode("utf-8").split(",")[1]
+    first = bottom.decode("utf-8").split(",")[1]
+    return min(first, last), max(first, last)
+
+
+def load_registry(path=REGISTRY_PATH, reload=False):
+    """Return the registry {symbol: record}, reading it from disk once per process"""
+    global _registry
+    if _registry is not None and not reload:
+        return _registry
+    path = nepse_staging.current_path(path)
+    if not os.path.exists(path):
+        _registry = build_registry()
+        return _registry
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        _registry = {row["Symbol"]: row for row in csv.DictReader(file)}
+    return _registry
+
+
+def save_registry(registry=None, path=REGISTRY_PATH):
+    """Write the registry (listed symbols first, in sector then symbol order)"""
+    registry = load_registry() if registry is None else registry
+    rows = sorted(registry.values(), key=lambda r: (r["Status"] != LISTED, r["Sector"], r["Symbol"]))
+    with nepse_staging.open_staged(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=REGISTRY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def get(symbol):
+    """Return the registry record of a symbol, or None"""
+    return load_registry().get(symbol.strip())
+
+
+def sector_of(symbol):
+    """Return the sector of a symbol, or None"""
+    record = get(symbol)
+    return record["Sector"] if record else None
+
+
+def listed_symbols_by_sector(sector_order=None):
+    """Return {sector: [symbols]} for listed symbols, sectors in legacy column order"""
+    grouped = {}
+    for sector in sector_order or legacy_sector_order():
+        grouped[sector] = []
+    for record in load_registry().values():
+        if record["Status"] == LISTED:
+            grouped.setdefault(record["Sector"], []).append(record["Symbol"])
+    return {sector: sorted(symbols) for sector, symbols in grouped.items() if symbols}
+
+
+def make_record(symbol, sector, status=LISTED, folder=None):
+    """Return a registry record with the file fields read from the data file"""
+    folder = folder or (BASE_FOLDER if status == LISTED else ARCHIVE_FOLDER)
+    file_path = data_path(sector, symbol, folder)
+    first, last = file_date_range(file_path)
+    return {
+        "Symbol": symbol,
+        "Sector": sector,
+        "Status": status,
+        "FilePath": file_path.replace(os.sep, "/"),
+        "FirstDate": first,
+        "LastDate": last,
+    }
+
+
+def set_symbol(symbol, sector, status=LISTED, folder=None):
+    """Insert or update a symbol's sector/status and refresh its file fields"""
+    registry = load_registry()
+    registry[symbol] = make_record(symbol, sector, status, folder)
+    return registry[symbol]
+
+
+def update_dates(symbol, csv_path=None):
+    """Refresh FirstDate/LastDate of a symbol from its data file"""
+    record = get(symbol)
+    if record is None:
+        return None
+    record["FirstDate"], record["LastDate"] = file_date_range(csv_path or record["FilePath"])
+    return record
+
+
+def legacy_sector_order(path=LISTED_COMPANY_PATH):
+    """Return the sector column order of listed_company.csv"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        header = next(csv.reader(file), [])
+    return [sector.strip() for sector in header if sector.strip()]
+
+
+def build_registry(listed_company_path=LISTED_COMPANY_PATH, base_folder=BASE_FOLDER):
+    """Build the registry from listed_company.csv plus archived data files"""
+    registry = {}
+    if os.path.exists(listed_company_path):
+        with open(listed_company_path, "r", encoding="utf-8") as file:
+            reader = list(csv.reader(file))
+        for category, symbols in zip(reader[0], zip(*reader[1:])):
+            for symbol in symbols:
+                if symbol.strip():
+                    registry[symbol.strip()] = make_record(symbol.strip(), category.strip(), LISTED, base_folder)
+
+    if os.path.isdir(ARCHIVE_FOLDER):
+        for sector in sorted(os.listdir(ARCHIVE_FOLDER)):
+            sector_folder = os.path.join(ARCHIVE_FOLDER, sector)
+            for name in sorted(os.listdir(sector_folder)):
+                symbol = os.path.splitext(name)[0]
+                if name.endswith(".csv") and symbol not in registry:
+                    registry[symbol] = make_record(symbol, sector, DELISTED, ARCHIVE_FOLDER)
+    return registry
+
+
+def export_legacy_csv(path=LISTED_COMPANY_PATH, sector_order=None):
+    """Write listed symbols in the column-per-sector listed_company.csv layout"""
+    grouped = listed_symbols_by_sector(sector_order)
+    sectors = list(grouped)
+    columns = [grouped[sector] for sector in sectors]
+    max_rows = max((len(symbols) for symbols in columns), default=0)
+    with nepse_staging.open_staged(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(sectors)
+        for row_idx in range(max_rows):
+            writer.writerow([symbols[row_idx] if row_idx < len(symbols) else "" for symbols in columns])
+    return sectors
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        _registry = build_registry()
+        save_registry(_registry)
+        nepse_staging.commit()
+        listed = sum(1 for record in _registry.values() if record["Status"] == LISTED)
+        print(f"✅ Registry written to {REGISTRY_PATH}: {listed} listed, {len(_registry) - listed} delisted")
+    elif command == "export":
+        sectors = export_legacy_csv()
+        nepse_staging.commit()
+        print(f"✅ Exported {len(sectors)} sectors to {LISTED_COMPANY_PATH}")
+    else:
+        print(f"❌ Unknown command: {command} (use build or export)")
+        sys.exit(1)
@@ -0,0 +1,305 @@
+"""
+Calendar-aligned price and returns matrix of every symbol, memory-mapped.
+
+Research jobs all start by reindexing each symbol's Ltp onto the trading
+days and computing returns. This module does that once and keeps the result
+in returns_matrix/ as .npy arrays of shape (trading days x symbols):
+    ltp.npy     float64  raw Ltp of the day, NaN without a print
+    valid.npy   bool     the symbol printed that day
+    simple.npy  float64  return since the symbol's previous print
+    log.npy     float64  log(1 + simple)
+    dates.npy   datetime64[D] row labels; manifest.json has the column labels
+Row 0 is the oldest day. Returns are adjusted for the corporate actions of
+nepse_adjustments, so a bonus or rights ex-date is no drop. After a gap in
+prints, the return covers the whole gap. Rows without a print, and a
+symbol's first print, have a NaN return.
+
+The rows are the trading days of trading_calendar.csv, plus every day with a
+stored print that the calendar misses, up to the newest print. The calendar
+starts in 2007 and marks some Fridays that NEPSE did trade as weekends.
+
+update() extends the matrix incrementally. Each column keeps a fingerprint
+(CRC32 of the history files and of the adjustment events). Only symbols
+whose fingerprint changed are read and realigned; the other columns are
+copied over to the new rows. nepse_data_update.py calls it at the end of a
+run once the matrix has been built. The arrays are written through
+nepse_staging, with the manifest in the same batch, so readers never see a
+half-written matrix. ReturnsMatrix.load() memory-maps the arrays, so a job
+only reads the rows and columns it touches.
+
+Usage:
+    python nepse_returns.py build                 # full rebuild
+    python nepse_returns.py update                # realign changed symbols only
+    python nepse_returns.py info NABIL ADBL
+
+    matrix = nepse_returns.ReturnsMatrix.load()
+    returns = matrix.frame("simple", start="2024-01-01", symbols=["NABIL", "ADBL"])
+"""
+
+import argparse
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import nepse_adjustments
+import nepse_scheduler
+import nepse_shards
+import nepse_staging
+from nepse_common import BASE_FOLDER, load_price_dataset, symbol_csv_paths
+
+RETURNS_FOLDER = "returns_matrix"
+MANIFEST_NAME = "manifest.json"
+ARRAYS = {"ltp": np.float64, "valid": np.bool_, "simple": np.float64, "log": np.float64}
+FORMAT_VERSION = 1
+
+
+def _path(name, folder=RETURNS_FOLDER):
+    return os.path.join(folder, name if name == MANIFEST_NAME else f"{name}.npy")
+
+
+def exists(folder=RETURNS_FOLDER):
+    """Return True if a matrix has been built in folder"""
+    return os.path.exists(nepse_staging.current_path(_path(MANIFEST_NAME, folder)))
+
+
+def load_manifest(folder=RETURNS_FOLDER):
+    """Return the manifest of the matrix in folder (None if missing or of another format)"""
+    path = nepse_staging.current_path(_path(MANIFEST_NAME, folder))
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    return manifest if manifest.get("version") == FORMAT_VERSION else None
+
+
+def _open(name, folder=RETURNS_FOLDER):
+    return np.load(nepse_staging.current_path(_path(name, folder)), mmap_mode="r")
+
+
+def fingerprint(csv_path, events):
+    """Return the CRC32 of a symbol's history files and adjustment events, as hex"""
+    crc = 0
+    for path in nepse_shards.history_files(csv_path):
+        with open(path, "rb") as file:
+            crc = zlib.crc32(file.read(), crc)
+    crc = zlib.crc32(json.dumps(events).encode("utf-8"), crc)
+    return f"{crc:08x}"
+
+
+def simple_returns(adjusted, valid):
+    """
+    Return each print's return since the previous print, column by column.
+
+    adjusted is a (days x symbols) price block and valid its print mask; rows
+    without a print, and each column's first print, get NaN.
+    """
+    rows = np.arange(len(adjusted))[:, None]
+    last = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    previous = np.vstack([np.full((1, adjusted.shape[1]), -1), last[:-1]])
+    previous_price = np.take_along_axis(adjusted, np.maximum(previous, 0), axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(valid & (previous >= 0), adjusted / previous_price - 1, np.nan)
+
+
+def _read_prints(symbols, base_folder):
+    """Return (Symbol, Date, Ltp) of every print of symbols, one row per day"""
+    df = load_price_dataset(base_folder, symbols)[["Symbol", "Date", "Ltp"]]
+    # Unparseable dates are reported by nepse_validation; they are left out here
+    dates = pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce")
+    df = df[dates.notna() & (df["Ltp"] > 0)].assign(Date=dates.dt.strftime("%Y-%m-%d"))
+    # Files are newest first, so a repeated date keeps its newest row
+    return df.drop_duplicates(["Symbol", "Date"], keep="first")
+
+
+def update(base_folder=BASE_FOLDER, folder=RETURNS_FOLDER, rebuild=False):
+    """
+    Bring the matrix in folder up to date with the stored histories (staged).
+
+    Returns the symbols that were realigned; the caller commits the staged
+    arrays with nepse_staging.commit().
+    """
+    paths = symbol_csv_paths(base_folder)
+    symbols = sorted(paths, key=lambda s: (paths[s][0], s))
+
+    adjustment_cache = nepse_adjustments.load_cache()
+    if nepse_adjustments.refresh(symbols, cache=adjustment_cache, base_folder=base_folder):
+        nepse_adjustments.save_cache(adjustment_cache)
+    events = {symbol: adjustment_cache.get(symbol, {}).get("events", []) for symbol in symbols}
+    fingerprints = {symbol: fingerprint(paths[symbol][1], events[symbol]) for symbol in symbols}
+
+    old = None if rebuild else load_manifest(folder)
+    old_columns = {symbol: idx for idx, symbol in enumerate(old["symbols"])} if old else {}
+    kept = [s for s in symbols if s in old_columns and old["fingerprints"][s] == fingerprints[s]]
+    changed = [s for s in symbols if s not in set(kept)]
+
+    prints = _read_prints(changed, base_folder) if changed else None
+    print_days = set(prints["Date"].unique()) if prints is not None else set()
+    old_days = np.array([], dtype="datetime64[D]")
+    if kept:
+        old_days = _open("dates", folder)
+        old_valid = _open("valid", folder)
+        kept_columns = np.array([old_columns[s] for s in kept])
+        print_days |= set(old_days[np.asarray(old_valid[:, kept_columns]).any(axis=1)].astype(str))
+    if not print_days:
+        raise ValueError(f"no price history under {base_folder}")
+
+    # Trading days up to the newest print, plus the days with prints the calendar misses
+    newest = max(print_days)
+    calendar = {day for day in nepse_scheduler.trading_days() if day <= newest}
+    days = np.array(sorted(calendar | print_days), dtype="datetime64[D]")
+    calendar_start = min(calendar, default=newest)
+    off_calendar = sum(1 for day in print_days - calendar if day > calendar_start)
+    shape = (len(days), len(symbols))
+    columns = {symbol: idx for idx, symbol in enumerate(symbols)}
+
+    # Realign the changed symbols into a dense block
+    block = {}
+    if changed:
+        codes = prints["Symbol"].cat.codes.to_numpy()
+        print_dates = prints["Date"].to_numpy().astype("datetime64[D]")
+        rows = np.searchsorted(days, print_dates)
+        factor = np.ones(len(prints))
+        for code, symbol in enumerate(changed):
+            if events[symbol]:
+                mask = codes == code
+                factor[mask] = nepse_adjustments.cumulative_factors(print_dates[mask], events[symbol])
+        ltp = np.full((len(days), len(changed)), np.nan)
+        adjusted = np.full_like(ltp, np.nan)
+        ltp[rows, codes] = prints["Ltp"].to_numpy(dtype=float)
+        adjusted[rows, codes] = ltp[rows, codes] * factor
+        block["valid"] = ~np.isnan(ltp)
+        block["ltp"] = ltp
+        block["simple"] = simple_returns(adjusted, block["valid"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block["log"] = np.log1p(block["simple"])
+
+    # Copy the kept columns onto the new rows; a day is only ever added, or
+    # dropped when none of the kept symbols printed on it, so their returns hold
+    if kept:
+        old_rows = np.flatnonzero(np.isin(old_days, days))
+        new_rows = np.searchsorted(days, old_days[old_rows])
+        new_kept_columns = np.array([columns[s] for s in kept])
+    changed_columns = np.array([columns[s] for s in changed], dtype=int)
+
+    with nepse_staging.staged(_path("dates", folder)) as tmp_path:
+        np.save(tmp_path, days)
+    for name, dtype in ARRAYS.items():
+        fill = False if dtype is np.bool_ else np.nan
+        if kept:
+            kept_values = np.asarray(_open(name, folder)[np.ix_(old_rows, kept_columns)])
+        with nepse_staging.staged(_path(name, folder)) as tmp_path:
+            array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=dtype, shape=shape)
+            array[:] = fill
+            if kept:
+                array[np.ix_(new_rows, new_kept_columns)] = kept_values
+            if changed:
+                array[:, changed_columns] = block[name]
+            array.flush()
+            del array
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "built_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "shape": list(shape),
+        "first_date": str(days[0]),
+        "last_date": str(days[-1]),
+        "off_calendar_days": off_calendar,
+        "symbols": symbols,
+        "sectors": [paths[symbol][0] for symbol in symbols],
+        "fingerprints": fingerprints,
+    }
+    with nepse_staging.open_staged(_path(MANIFEST_NAME, folder), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1)
+        file.write("\n")
+    return changed
+
+
+class ReturnsMatrix:
+    """The memory-mapped matrix with its row and column labels"""
+
+    def __init__(self, manifest, arrays, dates):
+        self.manifest = manifest
+        self.arrays = arrays
+        self.dates = dates
+        self.symbols = manifest["symbols"]
+        self.sectors = manifest["sectors"]
+        self.columns = {symbol: idx for idx, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def load(cls, folder=RETURNS_FOLDER):
+        """Memory-map the matrix in folder; raises ValueError if it is missing or torn"""
+        manifest = load_manifest(folder)
+        if manifest is None:
+            raise ValueError(f"no returns matrix in {folder} (run: python nepse_returns.py build)")
+        arrays = {name: _open(name, folder) for name in ARRAYS}
+        dates = _open("dates", folder)
+        shape = tuple(manifest["shape"])
+        if len(dates) != shape[0] or any(array.shape != shape for array in arrays.values()):
+            raise ValueError(f"arrays in {folder} do not match its manifest (rebuild it)")
+        return cls(manifest, arrays, dates)
+
+    def rows(self, start=None, end=None):
+        """Return the row slice of the days in [start, end]"""
+        first = np.searchsorted(self.dates, np.datetime64(start, "D"), "left") if start else 0
+        last = np.searchsorted(self.dates, np.datetime64(end, "D"), "right") if end else len(self.dates)
+        return slice(first, last)
+
+    def array(self, name, start=None, end=None, symbols=None):
+        """Return one array (ltp, valid, simple or log) for a date range and symbols"""
+        rows = self.rows(start, end)
+        if symbols is None:
+            return self.arrays[name][rows]
+        missing = [symbol for symbol in symbols if symbol not in self.columns]
+        if missing:
+            raise KeyError(f"unknown symbol(s): {', '.join(missing)}")
+        return self.arrays[name][rows, [self.columns[symbol] for symbol in symbols]]
+
+    def frame(self, name, start=None, end=None, symbols=None):
+        """Return one array as a DataFrame indexed by Date with a column per symbol"""
+        rows = self.rows(start, end)
+        return pd.DataFrame(
+            self.array(name, start, end, symbols),
+            index=pd.DatetimeIndex(self.dates[rows], name="Date"),
+            columns=list(symbols) if symbols is not None else self.symbols,
+        )
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Build or update the calendar-aligned returns matrix")
+    parser.add_argument("action", choices=["build", "update", "info"])
+    parser.add_argument("symbols", nargs="*", help="Symbols to summarize (info)")
+    args = parser.parse_args()
+
+    if args.action in ("build", "update"):
+        start = time.perf_counter()
+        changed = update(rebuild=args.action == "build")
+        nepse_staging.commit()
+        manifest = load_manifest()
+        rows, cols = manifest["shape"]
+        print(f"✅ Returns matrix {rows} day(s) x {cols} symbol(s), {manifest['first_date']} to {manifest['last_date']}: "
+              f"{len(changed)} symbol(s) realigned in {time.perf_counter() - start:.1f}s")
+        if manifest["off_calendar_days"]:
+            print(f"📅 {manifest['off_calendar_days']} day(s) with prints are marked as holidays in the calendar")
+    else:
+        matrix = ReturnsMatrix.load()
+        print(f"📐 {len(matrix.dates)} day(s) x {len(matrix.symbols)} symbol(s), "
+              f"{matrix.manifest['first_date']} to {matrix.manifest['last_date']}, built {matrix.manifest['built_at']}")
+        print(f"{'Symbol':>10}{'Prints':>8}{'First':>12}{'Last':>12}{'Mean %':>9}{'Vol %':>8}")
+        for symbol in [s.strip().upper() for s in args.symbols]:
+            if symbol not in matrix.columns:
+                print(f"{symbol:>10}  ⚠️ not in the matrix")
+                continue
+            valid = np.asarray(matrix.array("valid", symbols=[symbol])[:, 0])
+            returns = np.asarray(matrix.array("simple", symbols=[symbol])[:, 0])
+            printed = np.flatnonzero(valid)
+            if not len(printed):
+                print(f"{symbol:>10}{0:>8}")
+                continue
+            print(f"{symbol:>10}{len(printed):>8}{str(matrix.dates[printed[0]]):>12}{str(matrix.dates[printed[-1]]):>12}"
+                  f"{100 * np.nanmean(returns):>9.3f}{100 * np.nanstd(returns):>8.2f}")
@@ -0,0 +1,257 @@
+"""
+Adaptive scrape scheduling from each symbol's trading frequency.
+
+The daily update does not need to visit every listed symbol: bonds,
+debentures, preference and promoter shares trade a few times a year. This
+module keeps other_nepse_detail/scrape_schedule.csv (one row per listed
+symbol) and decides which symbols a run visits, in which order:
+
+1. Learn the trading frequency of every symbol: the share of the last
+   LOOKBACK_TRADING_DAYS trading days (from trading_calendar.csv) on which its
+   stored history has a row
+2. Put it in a tier with a cadence in trading days:
+   - hot      >= 50% of days traded   every trading day
+   - warm     >= 10%                  every 2 trading days
+   - cold     traded at all           weekly (every 5 trading days)
+   - dormant  no trade in the window  every 20 trading days
+3. Plan a run: symbols whose cadence has elapsed since LastChecked, hot
+   tiers first and the most overdue first within a tier, cut off once the
+   estimated time (AvgSeconds learned per symbol) exceeds the budget
+4. mark_checked() records a finished visit and its duration
+
+With a run budget (--budget), the updater also stops before the deadline
+once the next symbol's estimated time no longer fits, keeping WRAP_UP_SECONDS
+for the last sector's validation and git commit. A symbol skipped by the
+budget stays due and gains priority next run. A symbol that was never checked
+is always due.
+
+Usage:
+    python nepse_scheduler.py                  # refresh tiers and print today's plan
+    python nepse_scheduler.py --budget 30m     # plan for a 30 minute run
+"""
+
+import argparse
+import csv
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import nepse_registry
+import nepse_shards
+import nepse_staging
+from nepse_common import OTHER_DETAIL_FOLDER
+
+SCHEDULE_PATH = os.path.join(OTHER_DETAIL_FOLDER, "scrape_schedule.csv")
+CALENDAR_PATH = os.path.join(OTHER_DETAIL_FOLDER, "trading_calendar.csv")
+SCHEDULE_COLUMNS = ["Symbol", "Sector", "Tier", "TradeFrequency", "CadenceDays", "LastChecked", "AvgSeconds"]
+
+# (tier, minimum trade frequency, cadence in trading days), checked in order
+TIERS = [("hot", 0.5, 1), ("warm", 0.1, 2), ("cold", 1e-9, 5), ("dormant", 0.0, 20)]
+TIER_RANK = {tier: rank for rank, (tier, _, _) in enumerate(TIERS)}
+
+LOOKBACK_TRADING_DAYS = 120
+# Per-symbol time estimate before a symbol has been timed, and the weight of
+# the newest run in the moving average
+DEFAULT_SECONDS = 20.0
+AVG_WEIGHT = 0.3
+# Estimated budget of a scheduled run (the Actions job limit is 6 hours)
+DEFAULT_BUDGET_SECONDS = float(os.getenv("NEPSE_SCRAPE_BUDGET", 3 * 3600))
+# Time kept free at the end of a budgeted run to commit what was scraped
+WRAP_UP_SECONDS = 300
+
+_trading_days = None
+
+
+def load_schedule(path=SCHEDULE_PATH):
+    """Return the schedule {symbol: row}, empty if missing"""
+    path = nepse_staging.current_path(path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return {row["Symbol"]: row for row in csv.DictReader(file)}
+
+
+def save_schedule(schedule, path=SCHEDULE_PATH):
+    """Write the schedule (staged), hottest tiers first"""
+    rows = sorted(schedule.values(), key=lambda r: (TIER_RANK.get(r["Tier"], len(TIERS)), r["Sector"], r["Symbol"]))
+    with nepse_staging.open_staged(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SCHEDULE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def trading_days(calendar_path=CALENDAR_PATH):
+    """Return the sorted trading dates (YYYY-MM-DD) of the trading calendar"""
+    global _trading_days
+    if _trading_days is None:
+        _trading_days = []
+        if os.path.exists(calendar_path):
+            with open(calendar_path, "r", encoding="utf-8", newline="") as file:
+                _trading_days = sorted(row["Date"] for row in csv.DictReader(file) if row["IsTradingDay"] == "True")
+    return _trading_days
+
+
+def trading_days_between(start, end):
+    """Count trading days in (start, end]; days past the calendar count Sunday-Thursday"""
+    days = trading_days()
+    last_known = days[-1] if days else ""
+    count = sum(1 for day in days if start < day <= end)
+    cursor = datetime.strptime(max(start, last_known or start), "%Y-%m-%d").date()
+    stop = datetime.strptime(end, "%Y-%m-%d").date()
+    while cursor < stop:
+        cursor += timedelta(days=1)
+        if cursor.weekday() not in (4, 5):  # NEPSE is closed Friday and Saturday
+            count += 1
+    return count
+
+
+def trade_frequency(csv_path, window_start, window_days):
+    """Return the share of window_days with a stored row since window_start"""
+    if not window_days:
+        return 0.0
+    # Rows are streamed newest-first and reading stops at the window start
+    dates = {row[1] for row in nepse_shards.iter_rows(csv_path, start=window_start) if len(row) > 1}
+    return min(1.0, len(dates) / window_days)
+
+
+def tier_for(frequency):
+    """Return (tier, cadence in trading days) for a trade frequency"""
+    for tier, minimum, cadence in TIERS:
+        if frequency >= minimum:
+            return tier, cadence
+    return TIERS[-1][0], TIERS[-1][2]
+
+
+def refresh(schedule=None):
+    """Recompute the tier of every listed symbol; unlisted symbols are dropped"""
+    schedule = load_schedule() if schedule is None else schedule
+    listed = [record for record in nepse_registry.load_registry().values() if record["Status"] == nepse_registry.LISTED]
+
+    # The window ends at the newest stored trading day, so a stale checkout
+    # does not make every symbol look dormant
+    latest = max((record["LastDate"] for record in listed if record["LastDate"]), default="")
+    window = [day for day in trading_days() if day <= latest][-LOOKBACK_TRADING_DAYS:]
+    window_start = window[0] if window else latest
+
+    for symbol in [symbol for symbol in schedule if symbol not in {record["Symbol"] for record in listed}]:
+        del schedule[symbol]
+    for record in listed:
+        frequency = trade_frequency(record["FilePath"], window_start, len(window))
+        tier, cadence = tier_for(frequency)
+        row = schedule.setdefault(record["Symbol"], {"Symbol": record["Symbol"], "LastChecked": "", "AvgSeconds": ""})
+        row.update({"Sector": record["Sector"], "Tier": tier, "TradeFrequency": f"{frequency:.3f}", "CadenceDays": str(cadence)})
+    return schedule
+
+
+def overdue(row, today):
+    """Return elapsed trading days / cadence (infinite if never checked)"""
+    if not row["LastChecked"]:
+        return float("inf")
+    return trading_days_between(row["LastChecked"], today) / max(1, int(row["CadenceDays"]))
+
+
+def estimated_seconds(row):
+    return float(row["AvgSeconds"]) if row.get("AvgSeconds") else DEFAULT_SECONDS
+
+
+def plan(schedule, today=None, budget_seconds=DEFAULT_BUDGET_SECONDS, force_all=False):
+    """
+    Return the symbols to visit this run, highest priority first.
+
+    Due symbols are ordered by tier, then by how overdue they are, then by
+    trade frequency; the list stops when the estimated time exceeds
+    budget_seconds (None for no limit). force_all ignores the cadences.
+    """
+    today = today or date.today().isoformat()
+    due = []
+    for row in schedule.values():
+        lateness = overdue(row, today)
+        if force_all or lateness >= 1:
+            due.append((TIER_RANK.get(row["Tier"], len(TIERS)), -lateness, -float(row["TradeFrequency"] or 0), row["Symbol"]))
+    due.sort()
+
+    planned = []
+    estimate = 0.0
+    for _, _, _, symbol in due:
+        cost = estimated_seconds(schedule[symbol])
+        if budget_seconds is not None and planned and estimate + cost > budget_seconds:
+            break
+        planned.append(symbol)
+        estimate += cost
+    return planned
+
+
+def group_by_sector(symbols, schedule):
+    """
+    Return [(sector, symbols)] batches in priority order.
+
+    Symbols are grouped by sector within each tier, so every sector's hot
+    symbols come before any sector's warm ones and a cut-off run has visited
+    the most traded symbols first.
+    """
+    batches = {}
+    for symbol in symbols:
+        row = schedule[symbol]
+        batches.setdefault((TIER_RANK.get(row["Tier"], len(TIERS)), row["Sector"]), []).append(symbol)
+    ordered = sorted(batches.items(), key=lambda item: item[0][0])  # stable: sectors keep first-seen order
+    return [(sector, batch) for (_, sector), batch in ordered]
+
+
+def parse_duration(text):
+    """Return seconds for a duration such as 5400, 90m or 4h"""
+    text = str(text).strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def out_of_time(schedule, symbol, deadline):
+    """Return True when symbol's estimated visit would run past deadline (None: no limit)"""
+    return deadline is not None and time.perf_counter() + estimated_seconds(schedule[symbol]) > deadline
+
+
+def mark_checked(schedule, symbol, seconds, today=None):
+    """Record a finished visit of symbol and fold its duration into AvgSeconds"""
+    row = schedule.get(symbol)
+    if row is None:
+        return
+    row["LastChecked"] = today or date.today().isoformat()
+    previous = float(row["AvgSeconds"]) if row["AvgSeconds"] else seconds
+    row["AvgSeconds"] = f"{(1 - AVG_WEIGHT) * previous + AVG_WEIGHT * seconds:.1f}"
+
+
+def mark_due(schedule, symbol):
+    """Make symbol due again on the next run (e.g. after its update was rolled back)"""
+    if symbol in schedule:
+        schedule[symbol]["LastChecked"] = ""
+
+
+def summary(schedule, planned):
+    """Return the planned/listed symbol count per tier as printable text"""
+    planned = set(planned)
+    lines = []
+    for tier, _, cadence in TIERS:
+        symbols = [symbol for symbol, row in schedule.items() if row["Tier"] == tier]
+        visiting = sum(1 for symbol in symbols if symbol in planned)
+        lines.append(f"  {tier:<8} every {cadence:>2} trading day(s): {visiting:>4} of {len(symbols):>4} planned")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Refresh the scrape schedule and print the plan for today")
+    parser.add_argument("--budget", type=parse_duration, default=DEFAULT_BUDGET_SECONDS, help="Run budget: seconds, or e.g. 90m, 4h")
+    parser.add_argument("--all", action="store_true", help="Ignore cadences and plan every listed symbol")
+    parser.add_argument("--no-save", action="store_true", help="Do not write the refreshed schedule")
+    args = parser.parse_args()
+
+    schedule = refresh()
+    planned = plan(schedule, budget_seconds=args.budget, force_all=args.all)
+    print(f"🗓️ {len(planned)} of {len(schedule)} listed symbol(s) planned for today:")
+    print(summary(schedule, planned))
+    print(", ".join(planned[:40]) + (" ..." if len(planned) > 40 else ""))
+    if not args.no_save:
+        save_schedule(schedule)
+        nepse_staging.commit()
+        print(f"✅ Schedule written to {SCHEDULE_PATH}")
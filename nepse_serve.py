@@ -0,0 +1,386 @@
+"""
+Local read API over the price dataset.
+
+Loads every Nepse_Data CSV once into numpy arrays (one set per symbol, oldest
+row first) and serves them over HTTP:
+- GET /ohlcv/<SYMBOL>?start=YYYY-MM-DD&end=YYYY-MM-DD   daily bars of a symbol
+- GET /sector/<Sector>?date=YYYY-MM-DD                  latest bar of every symbol
+                                                        in a sector on/before date
+- GET /calendar?start=...&end=...                       trading calendar rows
+- GET /symbols                                          symbol → sector
+- GET /screen?where=Ltp<500,Sector==Hydro_Power&sort=-AvgTurnover20&limit=20
+                                                        market screener over the
+                                                        latest snapshot (nepse_snapshot)
+- GET /stats                                            cache and reload counters
+
+Responses are columnar ({"Date": [...], "Open": [...], ...}) JSON, or Arrow
+IPC stream with ?format=arrow (or Accept: application/vnd.apache.arrow.stream)
+when pyarrow is installed.
+
+Performance:
+1. Encoded responses are kept in an LRU cache (CACHE_ENTRIES), so repeated
+   dashboard queries cost a dict lookup
+2. A background thread stats the CSVs every RELOAD_SECONDS and reloads only
+   the symbols whose file changed (the updaters replace files atomically, so
+   a changed mtime means a complete new file); cached responses of those
+   symbols and their sectors are dropped; the screener is rebuilt when
+   latest_snapshot.csv changes
+3. The server is threaded with keep-alive connections
+
+Usage:
+    python nepse_serve.py                       # http://127.0.0.1:8750
+    python nepse_serve.py --port 9000 --host 0.0.0.0
+    curl "http://127.0.0.1:8750/ohlcv/NABIL?start=2025-01-01"
+"""
+
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+
+import nepse_shards
+import nepse_snapshot
+from nepse_common import BASE_FOLDER, NUMERIC_COLUMNS, OTHER_DETAIL_FOLDER, load_price_dataset, read_price_csv, symbol_csv_paths
+
+CALENDAR_PATH = os.path.join(OTHER_DETAIL_FOLDER, "trading_calendar.csv")
+DEFAULT_PORT = int(os.getenv("NEPSE_SERVE_PORT", 8750))
+CACHE_ENTRIES = int(os.getenv("NEPSE_SERVE_CACHE_ENTRIES", 1024))
+RELOAD_SECONDS = float(os.getenv("NEPSE_SERVE_RELOAD_SECONDS", 5))
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class Dataset:
+    """In-memory price arrays per symbol, reloadable per changed file"""
+
+    def __init__(self, base_folder=BASE_FOLDER, calendar_path=CALENDAR_PATH, cache_entries=CACHE_ENTRIES,
+                 snapshot_path=nepse_snapshot.SNAPSHOT_PATH):
+        self.base_folder = base_folder
+        self.calendar_path = calendar_path
+        self.snapshot_path = snapshot_path
+        self.cache_entries = cache_entries
+        self.symbols = {}  # symbol -> {"sector", "path", "stamp", "Date", <numeric columns>}
+        self.calendar = {}
+        self.calendar_stamp = None
+        self.screener = None
+        self.screener_stamp = None
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "reloaded_symbols": 0, "loaded_at": ""}
+        self._cache = OrderedDict()  # key -> (tags, content type, body)
+        self._generation = 0  # Bumped whenever data changes; responses built before are not cached
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def _history_stamp(cls, csv_path):
+        """Return the stamps of every file holding the symbol (flat file or year shards)"""
+        files = nepse_shards.history_files(csv_path)
+        if not files:
+            raise FileNotFoundError(csv_path)
+        return tuple(cls._stamp(path) for path in files)
+
+    @staticmethod
+    def _arrays(df):
+        """Return {"Date": datetime64[D], column: float64} sorted by date, bad dates dropped"""
+        dates = pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce")
+        keep = dates.notna().to_numpy()
+        order = np.argsort(dates.to_numpy()[keep], kind="stable")
+        arrays = {"Date": dates.to_numpy()[keep].astype("datetime64[D]")[order]}
+        for col in NUMERIC_COLUMNS:
+            arrays[col] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")[keep][order]
+        return arrays
+
+    def load(self):
+        """Load every symbol in a single parse"""
+        paths = symbol_csv_paths(self.base_folder)
+        df = load_price_dataset(self.base_folder)
+        symbols = {}
+        for symbol, group in df.groupby("Symbol", observed=True, sort=False):
+            sector, path = paths[symbol]
+            symbols[symbol] = {"sector": sector, "path": path, "stamp": self._history_stamp(path), **self._arrays(group)}
+        calendar, calendar_stamp = self._read_calendar()
+        screener, screener_stamp = self._read_screener()
+        with self._lock:
+            self.symbols = symbols
+            self.calendar, self.calendar_stamp = calendar, calendar_stamp
+            self.screener, self.screener_stamp = screener, screener_stamp
+            self._cache.clear()
+            self._generation += 1
+            self.stats["loaded_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        return len(symbols)
+
+    def _read_calendar(self):
+        if not os.path.exists(self.calendar_path):
+            return {"Date": [], "IsTradingDay": [], "HolidayName": []}, None
+        with open(self.calendar_path, "r", encoding="utf-8", newline="") as file:
+            rows = sorted(csv.DictReader(file), key=lambda row: row["Date"])
+        calendar = {
+            "Date": [row["Date"] for row in rows],
+            "IsTradingDay": [row["IsTradingDay"] == "True" for row in rows],
+            "HolidayName": [row["HolidayName"] for row in rows],
+        }
+        return calendar, self._stamp(self.calendar_path)
+
+    def _read_screener(self):
+        if not os.path.exists(self.snapshot_path):
+            return None, None
+        return nepse_snapshot.Screener.load(self.snapshot_path), self._stamp(self.snapshot_path)
+
+    def reload_changed(self):
+        """Reload symbols whose file changed, appeared or disappeared; returns the changed symbols"""
+        paths = symbol_csv_paths(self.base_folder)
+        changed = {}
+        for symbol, (sector, path) in paths.items():
+            current = self.symbols.get(symbol)
+            try:
+                stamp = self._history_stamp(path)
+            except FileNotFoundError:
+                continue
+            if current and current["path"] == path and current["stamp"] == stamp:
+                continue
+            try:
+                changed[symbol] = {"sector": sector, "path": path, "stamp": stamp, **self._arrays(read_price_csv(path))}
+            except (OSError, ValueError, KeyError, pd.errors.ParserError) as e:
+                print(f"⚠️ Could not reload {symbol}: {e}")
+        removed = [symbol for symbol in self.symbols if symbol not in paths]
+
+        calendar = None
+        if os.path.exists(self.calendar_path) and self._stamp(self.calendar_path) != self.calendar_stamp:
+            calendar = self._read_calendar()
+        screener = None
+        if os.path.exists(self.snapshot_path) and self._stamp(self.snapshot_path) != self.screener_stamp:
+            screener = self._read_screener()
+
+        if not changed and not removed and calendar is None and screener is None:
+            return []
+        with self._lock:
+            tags = set()
+            for symbol in list(changed) + removed:
+                tags.update({symbol, self.symbols.get(symbol, changed.get(symbol, {})).get("sector")})
+                if symbol in changed:
+                    tags.add(changed[symbol]["sector"])
+            self.symbols.update(changed)
+            for symbol in removed:
+                del self.symbols[symbol]
+            if calendar is not None:
+                self.calendar, self.calendar_stamp = calendar
+                tags.add("calendar")
+            if screener is not None:
+                self.screener, self.screener_stamp = screener
+                tags.add("screen")
+            for key in [key for key, (entry_tags, _, _) in self._cache.items() if entry_tags & tags]:
+                del self._cache[key]
+            self._generation += 1
+            self.stats["reloads"] += 1
+            self.stats["reloaded_symbols"] += len(changed) + len(removed)
+        return sorted(changed) + sorted(removed)
+
+    def watch(self, interval=RELOAD_SECONDS):
+        """Start a daemon thread that reloads changed files every interval seconds"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    changed = self.reload_changed()
+                except OSError as e:
+                    print(f"⚠️ Reload failed: {e}")
+                    continue
+                if changed:
+                    print(f"🔄 Reloaded {len(changed)} symbol(s): {', '.join(changed[:10])}{' ...' if len(changed) > 10 else ''}")
+
+        thread = threading.Thread(target=loop, name="nepse-serve-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def cached(self, key, build):
+        """Return (content type, body) for key, building and caching it on a miss"""
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1], entry[2]
+            self.stats["misses"] += 1
+            generation = self._generation
+        tags, content_type, body = build()
+        with self._lock:
+            # A reload during build() may have made the body stale: serve it, but don't keep it
+            if self._generation == generation:
+                self._cache[key] = (tags, content_type, body)
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        return content_type, body
+
+    def ohlcv(self, symbol, start=None, end=None):
+        """Return the columns of symbol between start and end (inclusive)"""
+        arrays = self.symbols[symbol]
+        dates = arrays["Date"]
+        lo = np.searchsorted(dates, np.datetime64(start, "D"), "left") if start else 0
+        hi = np.searchsorted(dates, np.datetime64(end, "D"), "right") if end else len(dates)
+        return {"Date": dates[lo:hi], **{col: arrays[col][lo:hi] for col in NUMERIC_COLUMNS}}
+
+    def sector(self, name, on=None):
+        """Return the latest bar on or before on (default: newest) of every symbol in sector name"""
+        columns = {"Symbol": [], "Date": [], **{col: [] for col in NUMERIC_COLUMNS}}
+        limit = np.datetime64(on, "D") if on else None
+        for symbol in sorted(s for s, arrays in self.symbols.items() if arrays["sector"] == name):
+            arrays = self.symbols[symbol]
+            idx = (np.searchsorted(arrays["Date"], limit, "right") if limit is not None else len(arrays["Date"])) - 1
+            if idx < 0:
+                continue
+            columns["Symbol"].append(symbol)
+            columns["Date"].append(arrays["Date"][idx])
+            for col in NUMERIC_COLUMNS:
+                columns[col].append(arrays[col][idx])
+        return {key: np.array(values) if key != "Symbol" else values for key, values in columns.items()}
+
+    def calendar_range(self, start=None, end=None):
+        dates = self.calendar["Date"]
+        keep = [idx for idx, day in enumerate(dates) if (not start or day >= start) and (not end or day <= end)]
+        return {col: [values[idx] for idx in keep] for col, values in self.calendar.items()}
+
+    def screen(self, where="", sort=None, limit=None):
+        """Return the snapshot rows matching the comma-separated filters in where"""
+        if self.screener is None:
+            raise ValueError("no snapshot yet (run python nepse_snapshot.py build)")
+        filters = [part for part in where.split(",") if part.strip()]
+        return self.screener.screen(filters, sort, int(limit) if limit else None)
+
+
+def _json_values(values):
+    """Return a JSON-ready list (dates as YYYY-MM-DD, NaN as null)"""
+    if isinstance(values, np.ndarray):
+        if values.dtype.kind == "M":
+            return np.datetime_as_string(values, unit="D").tolist()
+        if values.dtype.kind == "f":
+            return np.where(np.isnan(values), None, values).tolist()
+        return values.tolist()
+    return list(values)
+
+
+def encode(columns, fmt):
+    """Return (content type, body) of a columnar result"""
+    if fmt == "arrow":
+        import pyarrow as pa  # Optional: only needed for Arrow responses
+
+        table = pa.table({name: values.astype("datetime64[D]") if isinstance(values, np.ndarray) and values.dtype.kind == "M" else values
+                          for name, values in columns.items()})
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return ARROW_TYPE, sink.getvalue()
+    body = json.dumps({name: _json_values(values) for name, values in columns.items()}, separators=(",", ":"))
+    return "application/json", body.encode("utf-8")
+
+
+def _arrow_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    dataset = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, "application/json", json.dumps({"error": message}).encode("utf-8"))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        fmt = query.get("format") or ("arrow" if ARROW_TYPE in self.headers.get("Accept", "") else "json")
+        if fmt not in ("json", "arrow"):
+            return self._error(400, f"unknown format {fmt!r}")
+        if fmt == "arrow" and not _arrow_available():
+            return self._error(406, "Arrow responses need pyarrow (pip install pyarrow)")
+
+        dataset = self.dataset
+        try:
+            for name in ("start", "end", "date"):
+                if query.get(name):
+                    np.datetime64(query[name], "D")
+            if parts[:1] == ["ohlcv"] and len(parts) == 2:
+                symbol = parts[1].upper()
+                if symbol not in dataset.symbols:
+                    return self._error(404, f"unknown symbol {parts[1]!r}")
+                key = ("ohlcv", symbol, query.get("start"), query.get("end"), fmt)
+                build = lambda: ({symbol}, *encode(dataset.ohlcv(symbol, query.get("start"), query.get("end")), fmt))
+            elif parts[:1] == ["sector"] and len(parts) == 2:
+                sector = parts[1]
+                if sector not in {arrays["sector"] for arrays in dataset.symbols.values()}:
+                    return self._error(404, f"unknown sector {sector!r}")
+                key = ("sector", sector, query.get("date"), fmt)
+                build = lambda: ({sector}, *encode(dataset.sector(sector, query.get("date")), fmt))
+            elif parts == ["calendar"]:
+                key = ("calendar", query.get("start"), query.get("end"), fmt)
+                build = lambda: ({"calendar"}, *encode(dataset.calendar_range(query.get("start"), query.get("end")), fmt))
+            elif parts == ["screen"]:
+                key = ("screen", query.get("where", ""), query.get("sort"), query.get("limit"), fmt)
+                build = lambda: ({"screen"}, *encode(dataset.screen(query.get("where", ""), query.get("sort"), query.get("limit")), fmt))
+            elif parts == ["symbols"]:
+                items = sorted(dataset.symbols.items())
+                return self._send(200, *encode({"Symbol": [s for s, _ in items], "Sector": [a["sector"] for _, a in items]}, "json"))
+            elif parts == ["stats"]:
+                body = json.dumps({**dataset.stats, "symbols": len(dataset.symbols), "cached": len(dataset._cache)})
+                return self._send(200, "application/json", body.encode("utf-8"))
+            else:
+                return self._error(404, "endpoints: /ohlcv/<symbol>, /sector/<name>, /calendar, /screen, /symbols, /stats")
+            content_type, body = dataset.cached(key, build)
+        except ValueError as e:
+            return self._error(400, str(e))
+        self._send(200, content_type, body)
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, base_folder=BASE_FOLDER, reload_seconds=RELOAD_SECONDS, verbose=False):
+    """Load the dataset and serve it until interrupted"""
+    dataset = Dataset(base_folder)
+    start = time.perf_counter()
+    count = dataset.load()
+    print(f"📦 Loaded {count} symbol(s) in {time.perf_counter() - start:.1f}s")
+    if reload_seconds > 0:
+        dataset.watch(reload_seconds)
+    handler = type("Handler", (RequestHandler,), {"dataset": dataset, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"🌐 Serving on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Serve the price dataset over a local HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--reload", type=float, default=RELOAD_SECONDS, help="Seconds between file change checks (0: off)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+    serve(args.host, args.port, reload_seconds=args.reload, verbose=args.verbose)
@@ -0,0 +1,277 @@
+"""
+Optional year-sharded storage of a symbol's price history.
+
+A flat history file (Nepse_Data/<Sector>/<SYMBOL>.csv) is newest-first with
+S.N. renumbered from 1, so adding one day rewrites every line of it. In the
+sharded layout the same history lives in one small file per calendar year:
+
+    Nepse_Data/<Sector>/<SYMBOL>/<YEAR>.csv
+
+Shards have the usual columns but are oldest-first with S.N. counting up, so
+a daily update appends one line to the current year's shard and leaves every
+other file untouched.
+
+The layout is decided per symbol from what is on disk: a symbol with a shard
+folder is sharded, any other symbol follows NEPSE_LAYOUT ("flat" by default;
+with "sharded" a flat file is split on its next write). The symbol's flat
+path stays its identity everywhere (registry FilePath, scrapers); the helpers
+here map it to the files that actually hold its rows:
+- upsert() / latest_stored_date() store and look up rows in either layout
+- iter_rows() streams rows of a date range lazily, opening only the shards
+  that overlap it
+- history_files() / date_range() back the dataset loaders and the registry
+
+Reads go through nepse_staging, so a job sees its own uncommitted shards.
+
+Usage:
+    python nepse_shards.py split               # shard every flat history
+    python nepse_shards.py join --sector Hydro_Power
+    NEPSE_LAYOUT=sharded python nepse_data_update.py
+"""
+
+import argparse
+import csv
+import glob
+import os
+import shutil
+
+import nepse_merge
+import nepse_staging
+from nepse_common import BASE_FOLDER, PRICE_COLUMNS
+
+LAYOUT = os.getenv("NEPSE_LAYOUT", "flat")
+
+
+def shard_folder(csv_path):
+    """Return the shard folder of a symbol's flat CSV path"""
+    return os.path.splitext(csv_path)[0]
+
+
+def shard_path(csv_path, year):
+    return os.path.join(shard_folder(csv_path), f"{year}.csv")
+
+
+def shard_files(csv_path):
+    """Return {year: current path} of the symbol's shards, including staged ones"""
+    folder = shard_folder(csv_path)
+    names = set(os.listdir(folder)) if os.path.isdir(folder) else set()
+    prefix = os.path.normpath(os.path.relpath(folder)) + os.sep
+    names.update(key[len(prefix):] for key in nepse_staging.pending() if key.startswith(prefix))
+    shards = {}
+    for name in names:
+        year, ext = os.path.splitext(name)
+        if ext == ".csv" and year.isdigit() and os.sep not in name:
+            path = nepse_staging.current_path(os.path.join(folder, name))
+            if os.path.exists(path):
+                shards[year] = path
+    return dict(sorted(shards.items()))
+
+
+def is_sharded(csv_path):
+    return bool(shard_files(csv_path))
+
+
+def exists(csv_path):
+    """Return True if the symbol has a stored history in either layout"""
+    return is_sharded(csv_path) or os.path.exists(nepse_staging.current_path(csv_path))
+
+
+def storage_path(csv_path):
+    """Return the file or shard folder holding the symbol's history (for git)"""
+    return shard_folder(csv_path) if is_sharded(csv_path) else csv_path
+
+
+def history_files(csv_path):
+    """Return the current files holding the symbol's rows: its shards oldest year first, else the flat file"""
+    shards = shard_files(csv_path)
+    if shards:
+        return list(shards.values())
+    csv_path = nepse_staging.current_path(csv_path)
+    return [csv_path] if os.path.exists(csv_path) else []
+
+
+def _read_rows(path):
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return [row for row in reader if row]
+
+
+def iter_rows(csv_path, start=None, end=None, newest_first=True):
+    """
+    Yield the symbol's rows (lists of PRICE_COLUMNS cells) with start <= Date <= end.
+
+    Shards outside the range are never opened; a flat file is streamed and
+    left at the first row past the range.
+    """
+    shards = shard_files(csv_path)
+    if not shards:
+        path = nepse_staging.current_path(csv_path)
+        if not os.path.exists(path):
+            return
+        if not newest_first:
+            rows = [row for row in _read_rows(path) if (not start or row[1] >= start) and (not end or row[1] <= end)]
+            yield from reversed(rows)
+            return
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            for row in reader:
+                if not row or (end and row[1] > end):
+                    continue
+                if start and row[1] < start:
+                    break
+                yield row
+        return
+
+    years = [year for year in shards if (not start or year >= start[:4]) and (not end or year <= end[:4])]
+    for year in reversed(years) if newest_first else years:
+        rows = [row for row in _read_rows(shards[year]) if (not start or row[1] >= start) and (not end or row[1] <= end)]
+        yield from reversed(rows) if newest_first else rows
+
+
+def latest_stored_date(csv_path):
+    """Return the newest stored Date in either layout (None if there is none)"""
+    shards = shard_files(csv_path)
+    if not shards:
+        return nepse_merge.latest_stored_date(csv_path)
+    return next(iter_rows(csv_path, start=list(shards)[-1]), [None, None])[1]
+
+
+def date_range(csv_path):
+    """Return (first_date, last_date) of a sharded history"""
+    shards = shard_files(csv_path)
+    if not shards:
+        return "", ""
+    first = next(iter_rows(csv_path, start=list(shards)[0], newest_first=False), None)
+    last = next(iter_rows(csv_path, start=list(shards)[-1]), None)
+    return (first[1], last[1]) if first and last else ("", "")
+
+
+def _write_shard(path, merged_df):
+    """Stage a shard from a newest-first merged frame: oldest-first, S.N. counting up"""
+    shard_df = merged_df.iloc[::-1].reset_index(drop=True)
+    shard_df["S.N."] = range(1, len(shard_df) + 1)
+    with nepse_staging.open_staged(path, "w", encoding="utf-8", newline="") as file:
+        shard_df.to_csv(file, index=False, lineterminator="\n")
+
+
+def split(csv_path):
+    """
+    Stage the conversion of a flat history into year shards; returns the shard count.
+
+    Duplicate Dates collapse to one row as in nepse_merge (the row nearest the
+    top of the flat file wins).
+    """
+    history = nepse_merge.read_history(csv_path)
+    if history is None:
+        return 0
+    history = history[history["Date"].str.len() >= 4]
+    for year, rows in history.groupby(history["Date"].str[:4]):
+        merged_df, _ = nepse_merge.upsert_rows(None, rows)
+        _write_shard(shard_path(csv_path, year), merged_df)
+    nepse_staging.remove(csv_path)
+    return history["Date"].str[:4].nunique()
+
+
+def join(csv_path):
+    """Stage the conversion of year shards back into one flat history; returns the row count"""
+    shards = shard_files(csv_path)
+    if not shards:
+        return 0
+    rows = list(iter_rows(csv_path))
+    with nepse_staging.open_staged(csv_path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(PRICE_COLUMNS)
+        writer.writerows([idx] + row[1:] for idx, row in enumerate(rows, start=1))
+    for year in shards:
+        nepse_staging.remove(shard_path(csv_path, year))
+    return len(rows)
+
+
+def move(source, destination):
+    """Stage moving a sharded history; rows already stored at the destination win"""
+    if not is_sharded(destination) and exists(destination):
+        split(destination)
+    for year, path in shard_files(source).items():
+        target = shard_path(destination, year)
+        existing = nepse_merge.read_history(target)
+        if existing is None:
+            merged_df, _ = nepse_merge.upsert_rows(None, nepse_merge.read_history(path))
+        else:
+            merged_df, _ = nepse_merge.upsert_rows(nepse_merge.read_history(path), existing)
+        _write_shard(target, merged_df)
+        nepse_staging.remove(shard_path(source, year))
+
+
+def relocate(source, destination):
+    """Stage moving a symbol's history (either layout); if the destination exists, upsert the source into it"""
+    if is_sharded(source) or is_sharded(destination):
+        if not is_sharded(source):
+            split(source)
+        move(source, destination)
+        return
+    with nepse_staging.staged(destination) as tmp_path:
+        if os.path.exists(nepse_staging.current_path(destination)):
+            merged, _ = nepse_merge.upsert_rows(nepse_merge.read_history(source), nepse_merge.read_history(destination))
+            merged.to_csv(tmp_path, index=False, encoding="utf-8")
+        else:
+            shutil.copyfile(nepse_staging.current_path(source), tmp_path)
+    nepse_staging.remove(source)
+
+
+def upsert(csv_path, new_df, symbol="", layout=None):
+    """
+    Upsert scraped rows into the symbol's history in its layout.
+
+    Flat histories go through nepse_merge.stream_upsert(); sharded ones are
+    merged per year with nepse_merge.upsert_rows() (same keying and conflict
+    rules), touching only the shards of the years in new_df.
+    Returns (rows written, conflicts).
+    """
+    layout = layout or LAYOUT
+    if not is_sharded(csv_path):
+        if layout != "sharded":
+            return nepse_merge.stream_upsert(csv_path, new_df, symbol)
+        split(csv_path)
+
+    written, conflicts = 0, []
+    new_df = new_df[new_df["Date"].astype(str).str.len() >= 4]
+    for year, rows in new_df.groupby(new_df["Date"].astype(str).str[:4]):
+        path = shard_path(csv_path, year)
+        merged_df, shard_conflicts = nepse_merge.upsert_rows(nepse_merge.read_history(path), rows, symbol)
+        _write_shard(path, merged_df)
+        written += len(merged_df)
+        conflicts.extend(shard_conflicts)
+    return written, conflicts
+
+
+def _flat_paths(base_folder, sector=None):
+    """Return the flat identity paths of every stored symbol (either layout)"""
+    sector = sector or "*"
+    flat = glob.glob(os.path.join(base_folder, sector, "*.csv"))
+    sharded = [f"{folder}.csv" for folder in glob.glob(os.path.join(base_folder, sector, "*")) if os.path.isdir(folder)]
+    return sorted(set(flat) | set(sharded))
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Convert price histories between the flat and the year-sharded layout")
+    parser.add_argument("action", choices=["split", "join"])
+    parser.add_argument("--sector", help="Only convert this sector folder")
+    parser.add_argument("--symbols", nargs="*", help="Only convert these symbols")
+    args = parser.parse_args()
+
+    nepse_staging.begin("nepse_shards")
+    converted = 0
+    for csv_path in _flat_paths(BASE_FOLDER, args.sector):
+        if args.symbols and os.path.splitext(os.path.basename(csv_path))[0] not in args.symbols:
+            continue
+        if (args.action == "split") != is_sharded(csv_path):
+            converted += bool(split(csv_path) if args.action == "split" else join(csv_path))
+    nepse_staging.commit()
+    if args.action == "join":
+        for folder in glob.glob(os.path.join(BASE_FOLDER, args.sector or "*", "*")):
+            if os.path.isdir(folder) and not os.listdir(folder):
+                os.rmdir(folder)
+    print(f"✅ {args.action.capitalize()} {converted} symbol history(ies)")
@@ -0,0 +1,247 @@
+"""
+Latest-snapshot table of every symbol and a vectorized market screener.
+
+other_nepse_detail/latest_snapshot.csv has one row per listed symbol:
+Symbol, Sector, LastDate, Ltp, ChangePct (the last % Change), High52w /
+Low52w (from the High/Low columns over the 365 days up to LastDate),
+AvgQty20 / AvgTurnover20 (the last 20 stored rows).
+
+It is kept up to date incrementally:
+1. update(symbol, sector, csv_path) recomputes one symbol after a write; the
+   history is read newest-first and reading stops at the 52-week edge, so the
+   cost is bounded by the window, not by the length of the history; if the
+   newest Date does not parse, the symbol is reported and keeps its old row
+2. The writers call it next to nepse_registry.update_dates() and save the
+   table with the registry; build() recomputes every symbol
+
+Screener loads the table into numpy arrays once, adds DaysSinceTrade (trading
+days between LastDate and the newest LastDate) and FromHigh52w / FromLow52w
+(% from the 52-week high / low), and filters the whole market with boolean
+masks, in microseconds. It also backs the /screen endpoint of nepse_serve.
+
+Usage:
+    python nepse_snapshot.py build
+    python nepse_snapshot.py screen "FromHigh52w > -5" "AvgTurnover20 > 10000000" --sort=-AvgTurnover20
+    python nepse_snapshot.py screen "Sector == Hydro_Power" "DaysSinceTrade == 0" --limit 10
+"""
+
+import argparse
+import csv
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import nepse_registry
+import nepse_scheduler
+import nepse_shards
+import nepse_staging
+from nepse_common import OTHER_DETAIL_FOLDER
+
+SNAPSHOT_PATH = os.path.join(OTHER_DETAIL_FOLDER, "latest_snapshot.csv")
+SNAPSHOT_COLUMNS = ["Symbol", "Sector", "LastDate", "Ltp", "ChangePct", "High52w", "Low52w", "AvgQty20", "AvgTurnover20"]
+NUMBER_COLUMNS = SNAPSHOT_COLUMNS[3:]
+TEXT_COLUMNS = ("Symbol", "Sector", "LastDate")
+
+WINDOW_DAYS = 365
+AVERAGE_ROWS = 20
+
+FILTER_PATTERN = re.compile(r"^\s*([\w%]+)\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*$")
+OPERATORS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal, "==": np.equal, "!=": np.not_equal}
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def load_snapshot(path=SNAPSHOT_PATH, reload=False):
+    """Return the snapshot {symbol: row}, reading it from disk once per process"""
+    global _snapshot
+    if _snapshot is not None and not reload:
+        return _snapshot
+    path = nepse_staging.current_path(path)
+    if not os.path.exists(path):
+        _snapshot = {}
+        return _snapshot
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        _snapshot = {row["Symbol"]: row for row in csv.DictReader(file)}
+    return _snapshot
+
+
+def save_snapshot(snapshot=None, path=SNAPSHOT_PATH):
+    """Write the snapshot (staged) in sector then symbol order"""
+    snapshot = load_snapshot() if snapshot is None else snapshot
+    with _lock:
+        rows = sorted(snapshot.values(), key=lambda r: (r["Sector"], r["Symbol"]))
+    with nepse_staging.open_staged(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SNAPSHOT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _number(text):
+    try:
+        return float(str(text).replace(",", ""))
+    except ValueError:
+        return float("nan")
+
+
+def symbol_row(symbol, sector, csv_path):
+    """
+    Return the snapshot row of one symbol from its newest rows (None without history).
+
+    Raises ValueError if the newest row's Date is not YYYY-MM-DD.
+    """
+    rows = []
+    window_start = None
+    for row in nepse_shards.iter_rows(csv_path):
+        if window_start is None:
+            window_start = (datetime.strptime(row[1], "%Y-%m-%d") - timedelta(days=WINDOW_DAYS)).strftime("%Y-%m-%d")
+        elif row[1] <= window_start and len(rows) >= AVERAGE_ROWS:
+            break
+        rows.append(row)
+    if not rows:
+        return None
+
+    in_window = [row for row in rows if row[1] > window_start]
+    recent = rows[:AVERAGE_ROWS]
+    return {
+        "Symbol": symbol,
+        "Sector": sector,
+        "LastDate": rows[0][1],
+        "Ltp": f"{_number(rows[0][5]):.2f}",
+        "ChangePct": f"{_number(rows[0][6]):.2f}",
+        "High52w": f"{np.nanmax([_number(row[3]) for row in in_window]):.2f}",
+        "Low52w": f"{np.nanmin([_number(row[4]) for row in in_window]):.2f}",
+        "AvgQty20": f"{np.nanmean([_number(row[7]) for row in recent]):.1f}",
+        "AvgTurnover20": f"{np.nanmean([_number(row[8]) for row in recent]):.1f}",
+    }
+
+
+def update(symbol, sector, csv_path):
+    """Recompute one symbol's row after its history changed (dropped if it has none)"""
+    snapshot = load_snapshot()
+    try:
+        row = symbol_row(symbol, sector, csv_path)
+    except ValueError as e:
+        # Runs in the writers' threads: keep the previous row rather than fail the update
+        print(f"⚠️ Snapshot not updated for {symbol}: {e}")
+        return None
+    with _lock:
+        if row is None:
+            snapshot.pop(symbol, None)
+        else:
+            snapshot[symbol] = row
+    return row
+
+
+def remove(symbol):
+    snapshot = load_snapshot()
+    with _lock:
+        snapshot.pop(symbol, None)
+
+
+def build():
+    """Recompute the row of every listed symbol"""
+    global _snapshot
+    _snapshot = {}
+    for record in nepse_registry.load_registry().values():
+        if record["Status"] == nepse_registry.LISTED:
+            update(record["Symbol"], record["Sector"], record["FilePath"])
+    return _snapshot
+
+
+def parse_filter(text):
+    """Parse 'Column op value' (op: < <= > >= == !=) into (column, op, value)"""
+    match = FILTER_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"cannot parse filter {text!r} (expected e.g. 'Ltp < 500')")
+    column, op, value = match.groups()
+    return column, op, value
+
+
+class Screener:
+    """The snapshot as column arrays, filtered with numpy masks"""
+
+    def __init__(self, snapshot, calendar_days=None):
+        rows = sorted(snapshot.values(), key=lambda r: (r["Sector"], r["Symbol"]))
+        self.columns = {col: np.array([row[col] for row in rows], dtype=object) for col in TEXT_COLUMNS}
+        for col in NUMBER_COLUMNS:
+            self.columns[col] = np.array([_number(row[col]) for row in rows], dtype=float)
+
+        # Trading days since the last trade, counted against the newest LastDate
+        days = np.array(calendar_days if calendar_days is not None else nepse_scheduler.trading_days(), dtype="datetime64[D]")
+        last = self.columns["LastDate"].astype("datetime64[D]") if rows else np.array([], dtype="datetime64[D]")
+        as_of = last.max() if len(last) else None
+        if len(days) and as_of is not None:
+            self.columns["DaysSinceTrade"] = (np.searchsorted(days, as_of, "right") - np.searchsorted(days, last, "right")).astype(float)
+        else:
+            self.columns["DaysSinceTrade"] = np.zeros(len(rows))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.columns["FromHigh52w"] = (self.columns["Ltp"] / self.columns["High52w"] - 1) * 100
+            self.columns["FromLow52w"] = (self.columns["Ltp"] / self.columns["Low52w"] - 1) * 100
+        self.as_of = str(as_of) if as_of is not None else ""
+
+    @classmethod
+    def load(cls, path=SNAPSHOT_PATH):
+        return cls(load_snapshot(path, reload=True))
+
+    def mask(self, filters):
+        """Return the boolean mask of rows matching every (column, op, value) filter"""
+        keep = np.ones(len(self.columns["Symbol"]), dtype=bool)
+        for column, op, value in filters:
+            if column not in self.columns:
+                raise ValueError(f"unknown column {column!r} (one of {', '.join(self.columns)})")
+            values = self.columns[column]
+            if values.dtype == object:
+                keep &= OPERATORS[op](values, value)
+            else:
+                keep &= OPERATORS[op](values, float(value))
+        return keep
+
+    def screen(self, filters=(), sort=None, limit=None):
+        """
+        Return the matching rows as {column: array}.
+
+        sort is a column name, prefixed with '-' for descending order.
+        """
+        filters = [parse_filter(f) if isinstance(f, str) else f for f in filters]
+        idx = np.flatnonzero(self.mask(filters))
+        if sort:
+            column = sort.lstrip("-")
+            if column not in self.columns:
+                raise ValueError(f"unknown sort column {column!r}")
+            order = np.argsort(self.columns[column][idx], kind="stable")
+            idx = idx[order[::-1] if sort.startswith("-") else order]
+        if limit:
+            idx = idx[:limit]
+        return {col: values[idx] for col, values in self.columns.items()}
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Build the latest-snapshot table or screen the market")
+    parser.add_argument("action", choices=["build", "screen"])
+    parser.add_argument("filters", nargs="*", help="Filters such as 'Ltp < 500' or 'Sector == Hydro_Power'")
+    parser.add_argument("--sort", help="Sort column, '-' prefix for descending")
+    parser.add_argument("--limit", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.action == "build":
+        start = time.perf_counter()
+        snapshot = build()
+        save_snapshot(snapshot)
+        nepse_staging.commit()
+        print(f"✅ Snapshot of {len(snapshot)} symbol(s) written to {SNAPSHOT_PATH} in {time.perf_counter() - start:.1f}s")
+    else:
+        screener = Screener.load()
+        start = time.perf_counter()
+        result = screener.screen(args.filters, args.sort, args.limit)
+        elapsed = time.perf_counter() - start
+        shown = ["Symbol", "Sector", "LastDate", "Ltp", "ChangePct", "High52w", "Low52w", "FromHigh52w", "AvgTurnover20", "DaysSinceTrade"]
+        print("".join(f"{col:>16}" for col in shown))
+        for idx in range(len(result["Symbol"])):
+            print("".join(f"{result[col][idx]:>16.2f}" if isinstance(result[col][idx], float) else f"{result[col][idx]:>16}" for col in shown))
+        print(f"🔎 {len(result['Symbol'])} match(es) as of {screener.as_of}, screened in {elapsed * 1e6:.0f}µs")
@@ -0,0 +1,299 @@
+"""
+Crash-safe file writes through a write-ahead staging directory.
+
+Writers never overwrite a file in place. Instead:
+1. staged(path) / open_staged(path) give a temp file under
+   .staging/<job>_<timestamp>_<pid>/ to write the new content to; it joins
+   the pending batch when the with-block exits cleanly. open_appended(path)
+   does the same for logs: it copies the current content, then appends.
+   remove(path) stages a deletion.
+2. commit() flushes the batch together: every staged file is fsynced, the
+   current targets are hard-linked as backups, the batch is recorded in the
+   run's manifest.json as "committing", then each target is replaced with
+   os.replace() (atomic) and the manifest is marked "committed".
+3. rollback() drops the pending batch. A commit that fails part-way restores
+   the backups, so a batch lands completely or not at all.
+4. begin(job) starts a run and first recovers runs that were killed: batches
+   left "committing" are rolled back from their backups, pending ones dropped.
+
+current_path(path) returns the pending version of a file (if any), so a job
+reads its own uncommitted writes. Workers may stage files concurrently, but
+callers must serialize writes to the same path.
+
+Scrape checkpoints (company_full_data_scrap.py) are the one exception: they
+are resume state that has to survive a crash straight away, so they are
+appended in place and only cleared after the batch they feed has committed.
+
+The staging folder must be on the same filesystem as the data (it lives in
+the repo), so the final rename is atomic.
+
+Usage:
+    nepse_staging.begin("nepse_data_update")
+    with nepse_staging.staged(csv_path) as tmp_path:
+        df.to_csv(tmp_path, index=False)
+    nepse_staging.commit()
+"""
+
+import atexit
+import json
+import os
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+STAGING_FOLDER = os.getenv("NEPSE_STAGING_DIR", ".staging")
+MANIFEST_NAME = "manifest.json"
+
+_lock = threading.Lock()
+_run_folder = None
+_batch = {}
+_batch_number = 0
+_file_number = 0
+_manifest = None
+
+
+def _key(path):
+    """Return the normalized, repo-relative form of a target path"""
+    return os.path.normpath(os.path.relpath(path))
+
+
+def _fsync_file(path):
+    with open(path, "rb") as file:
+        os.fsync(file.fileno())
+
+
+def _fsync_folder(folder):
+    """Persist renames in a folder (not supported on Windows, where it is skipped)"""
+    if os.name == "nt":
+        return
+    fd = os.open(folder or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_manifest():
+    """Atomically rewrite the run manifest"""
+    path = os.path.join(_run_folder, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(_manifest, file, indent=1)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f"{path}.tmp", path)
+    _fsync_folder(_run_folder)
+
+
+def _pid_alive(pid):
+    """Return True if pid is a running process (assumed dead on Windows)"""
+    if os.name == "nt" or pid == os.getpid():
+        return pid == os.getpid()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _restore(entries):
+    """Undo the replaced/removed targets of a batch from its backups"""
+    for entry in entries:
+        target, staged_file, backup = entry["target"], entry["staged"], entry["backup"]
+        if backup and os.path.exists(backup):
+            os.replace(backup, target)
+        elif staged_file and not os.path.exists(staged_file) and os.path.exists(target):
+            # Created by the batch (its staged file was already moved in)
+            os.remove(target)
+
+
+def recover(staging_folder=STAGING_FOLDER):
+    """Roll back interrupted commits of dead runs and drop their staged files"""
+    if not os.path.isdir(staging_folder):
+        return 0
+    restored = 0
+    for name in sorted(os.listdir(staging_folder)):
+        folder = os.path.join(staging_folder, name)
+        if folder == _run_folder or not os.path.isdir(folder):
+            continue
+        manifest_path = os.path.join(folder, MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        if _pid_alive(manifest.get("pid", -1)):
+            continue
+        for batch in manifest.get("batches", []):
+            if batch["state"] == "committing":
+                _restore(batch["entries"])
+                restored += len(batch["entries"])
+                print(f"↩️ Rolled back an interrupted write of {len(batch['entries'])} file(s) from {name}")
+        shutil.rmtree(folder, ignore_errors=True)
+    return restored
+
+
+def begin(job, staging_folder=STAGING_FOLDER):
+    """Start a staged-write run for job, recovering killed runs first"""
+    global _run_folder, _manifest, _batch_number, _file_number
+    _finish()
+    recover(staging_folder)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    _run_folder = os.path.join(staging_folder, f"{job}_{stamp}_{os.getpid()}")
+    os.makedirs(_run_folder, exist_ok=True)
+    _manifest = {"job": job, "pid": os.getpid(), "started": stamp, "batches": []}
+    _batch_number = 0
+    _file_number = 0
+    _batch.clear()
+    _write_manifest()
+    atexit.register(_finish)
+    return _run_folder
+
+
+def _ensure_run():
+    if _run_folder is None:
+        begin(os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python")
+
+
+def current_path(path):
+    """Return the path holding the newest content of path (its pending version if staged)"""
+    with _lock:
+        return _batch.get(_key(path)) or path
+
+
+@contextmanager
+def staged(path):
+    """Yield a temp path for the new content of path; it joins the batch if the block succeeds"""
+    global _file_number
+    with _lock:
+        _ensure_run()
+        _file_number += 1
+        files_folder = os.path.join(_run_folder, "files")
+        os.makedirs(files_folder, exist_ok=True)
+        tmp_path = os.path.join(files_folder, f"{_file_number}_{os.path.basename(path)}")
+    try:
+        yield tmp_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if not os.path.exists(tmp_path):
+        return
+    with _lock:
+        previous = _batch.get(_key(path))
+        _batch[_key(path)] = tmp_path
+    if previous and previous != tmp_path and os.path.exists(previous):
+        os.remove(previous)
+
+
+@contextmanager
+def open_staged(path, mode="w", **kwargs):
+    """Open a staged file for writing path; it joins the batch when closed without error"""
+    with staged(path) as tmp_path:
+        with open(tmp_path, mode, **kwargs) as file:
+            yield file
+
+
+@contextmanager
+def open_appended(path, mode="a", **kwargs):
+    """Open a staged copy of path's newest content for appending; it joins the batch when closed without error"""
+    source = current_path(path)
+    with staged(path) as tmp_path:
+        if os.path.exists(source):
+            shutil.copyfile(source, tmp_path)
+        with open(tmp_path, mode, **kwargs) as file:
+            yield file
+
+
+def remove(path):
+    """Stage the deletion of path"""
+    with _lock:
+        _ensure_run()
+        previous = _batch.get(_key(path))
+        _batch[_key(path)] = None
+    if previous and os.path.exists(previous):
+        os.remove(previous)
+
+
+def pending():
+    """Return the targets with staged, uncommitted changes"""
+    with _lock:
+        return sorted(_batch)
+
+
+def commit():
+    """Apply the pending batch atomically; returns the number of files changed"""
+    global _batch_number
+    with _lock:
+        if not _batch:
+            return 0
+        _batch_number += 1
+        backup_folder = os.path.join(_run_folder, f"backup_{_batch_number}")
+        os.makedirs(backup_folder, exist_ok=True)
+        entries = []
+        for idx, (target, staged_file) in enumerate(sorted(_batch.items())):
+            if staged_file:
+                _fsync_file(staged_file)
+            backup = None
+            if os.path.exists(target):
+                backup = os.path.join(backup_folder, f"{idx}_{os.path.basename(target)}")
+                try:
+                    os.link(target, backup)
+                except OSError:
+                    shutil.copy2(target, backup)
+            entries.append({"target": target, "staged": staged_file, "backup": backup})
+
+        batch = {"batch": _batch_number, "state": "committing", "entries": entries}
+        _manifest["batches"].append(batch)
+        _write_manifest()
+        try:
+            for entry in entries:
+                if entry["staged"]:
+                    os.makedirs(os.path.dirname(entry["target"]) or ".", exist_ok=True)
+                    if os.path.exists(entry["target"]):
+                        # Keep the target's mode (git tracks some CSVs as 100755)
+                        shutil.copymode(entry["target"], entry["staged"])
+                    os.replace(entry["staged"], entry["target"])
+                elif os.path.exists(entry["target"]):
+                    os.remove(entry["target"])
+            for folder in {os.path.dirname(entry["target"]) for entry in entries}:
+                if os.path.isdir(folder or "."):
+                    _fsync_folder(folder)
+        except BaseException:
+            _restore(entries)
+            batch["state"] = "rolled_back"
+            _write_manifest()
+            _batch.clear()
+            raise
+
+        batch["state"] = "committed"
+        batch["entries"] = [{"target": entry["target"], "removed": entry["staged"] is None} for entry in entries]
+        _write_manifest()
+        shutil.rmtree(backup_folder, ignore_errors=True)
+        _batch.clear()
+        return len(entries)
+
+
+def rollback():
+    """Drop the pending batch; returns the number of discarded changes"""
+    with _lock:
+        discarded = len(_batch)
+        for staged_file in _batch.values():
+            if staged_file and os.path.exists(staged_file):
+                os.remove(staged_file)
+        _batch.clear()
+        return discarded
+
+
+def _finish():
+    """At exit: discard uncommitted writes and remove the run's staging folder"""
+    global _run_folder
+    if _run_folder is None:
+        return
+    discarded = rollback()
+    if discarded:
+        print(f"⚠️ Discarded {discarded} uncommitted staged write(s)")
+    shutil.rmtree(_run_folder, ignore_errors=True)
+    _run_folder = None
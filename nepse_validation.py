@@ -0,0 +1,220 @@
+"""
+Vectorized data-quality checks for the Nepse_Data price history.
+
+Runs after every update: all symbols are loaded in a single parse and checked
+with column-wise operations, so the full dataset validates in well under a
+second.
+
+Hard failures (block the commit):
+- bad_date:        Date does not parse as YYYY-MM-DD
+- duplicate_date:  the same Date appears more than once for a symbol
+- high_below_low:  High < Low
+- bad_price:       Ltp is missing or not positive
+
+Soft warnings (reported only):
+- zero_qty:             Qty is missing or zero
+- ltp_outside_range:    Ltp lies outside [Low, High]
+- pct_change_mismatch:  reported % Change disagrees with consecutive Ltps
+                        (known adjustment ex-dates are excluded)
+- unsorted:             row breaks the order of its file (newest-first for a
+                        flat history, oldest-first for a year shard)
+
+Known legacy violations are listed in other_nepse_detail/validation_baseline.csv
+and never block. Every run writes other_nepse_detail/validation_report.csv.
+
+Usage:
+    python nepse_validation.py                       # exit 1 on any new hard failure
+    python nepse_validation.py --symbols NABIL ADBL  # block only on these symbols
+    python nepse_validation.py --write-baseline      # accept current hard failures
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import nepse_staging
+from nepse_common import BASE_FOLDER, OTHER_DETAIL_FOLDER, load_price_dataset
+
+REPORT_PATH = os.path.join(OTHER_DETAIL_FOLDER, "validation_report.csv")
+BASELINE_PATH = os.path.join(OTHER_DETAIL_FOLDER, "validation_baseline.csv")
+
+HARD_CHECKS = ["bad_date", "duplicate_date", "high_below_low", "bad_price"]
+SOFT_CHECKS = ["zero_qty", "ltp_outside_range", "pct_change_mismatch", "unsorted"]
+
+# Percentage points of slack for rounding in the reported % Change
+PCT_TOLERANCE = 0.5
+
+REPORT_COLUMNS = ["Symbol", "Sector", "Date", "Check", "Severity"]
+
+
+def _adjustment_ex_dates():
+    """Return the set of (symbol, date) ex-dates from the adjustment cache"""
+    try:
+        import nepse_adjustments
+    except ImportError:
+        return set()
+    cache = nepse_adjustments.load_cache()
+    return {(symbol, date) for symbol, entry in cache.items() for date, _ in entry["events"]}
+
+
+def run_checks(df, ex_dates=frozenset()):
+    """Return a violations frame (REPORT_COLUMNS) for a load_price_dataset() frame"""
+    n = len(df)
+    if n == 0:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    code = df["Symbol"].cat.codes.to_numpy()
+    sector_code = df["Sector"].cat.codes.to_numpy()
+    raw_dates = df["Date"].to_numpy(dtype=object, na_value="")
+    dates = pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce").to_numpy()
+    date_ok = ~np.isnat(dates)
+    high = df["High"].to_numpy(dtype=float)
+    low = df["Low"].to_numpy(dtype=float)
+    ltp = df["Ltp"].to_numpy(dtype=float)
+    qty = df["Qty"].to_numpy(dtype=float)
+    pct = df["% Change"].to_numpy(dtype=float)
+
+    masks = {
+        "bad_date": ~date_ok,
+        "high_below_low": high < low,
+        "bad_price": ~(ltp > 0),
+        "zero_qty": ~(qty > 0),
+        "ltp_outside_range": (high >= low) & ((ltp > high) | (ltp < low)),
+    }
+
+    # Compare neighbours within each file in its own order: flat files are
+    # newest-first, year shards oldest-first (frames without file info are
+    # taken as one newest-first file per symbol)
+    file_rows = df.attrs.get("file_rows")
+    if file_rows is not None and sum(file_rows) == n:
+        file_id = np.repeat(np.arange(len(file_rows)), file_rows)
+        oldest_first = np.repeat(np.asarray(df.attrs["file_oldest_first"], dtype=bool), file_rows)
+    else:
+        file_id = code
+        oldest_first = np.zeros(n, dtype=bool)
+    unsorted = np.zeros(n, dtype=bool)
+    out_of_order = np.where(oldest_first[1:], dates[1:] < dates[:-1], dates[1:] > dates[:-1])
+    unsorted[1:] = (file_id[1:] == file_id[:-1]) & date_ok[1:] & date_ok[:-1] & out_of_order
+    masks["unsorted"] = unsorted
+
+    # Sort once by (symbol, date); duplicates and % Change both use neighbours
+    order = np.lexsort((dates, code))
+    o_code = code[order]
+    o_dates = dates[order]
+    o_ok = date_ok[order]
+    same_symbol = np.zeros(n, dtype=bool)
+    same_symbol[1:] = (o_code[1:] == o_code[:-1]) & o_ok[1:] & o_ok[:-1]
+
+    same_date = np.zeros(n, dtype=bool)
+    same_date[1:] = same_symbol[1:] & (o_dates[1:] == o_dates[:-1])
+    duplicate = same_date.copy()
+    duplicate[:-1] |= same_date[1:]
+    masks["duplicate_date"] = np.zeros(n, dtype=bool)
+    masks["duplicate_date"][order] = duplicate
+
+    o_ltp = ltp[order]
+    o_pct = pct[order]
+    prev_ltp = np.empty(n)
+    prev_ltp[0] = np.nan
+    prev_ltp[1:] = o_ltp[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = (o_ltp / prev_ltp - 1) * 100
+    mismatch = same_symbol & ~same_date & (o_pct != 0) & (np.abs(o_pct - expected) > PCT_TOLERANCE)
+    masks["pct_change_mismatch"] = np.zeros(n, dtype=bool)
+    masks["pct_change_mismatch"][order] = mismatch
+
+    symbol_names = np.asarray(df["Symbol"].cat.categories, dtype=object)
+    sector_names = np.asarray(df["Sector"].cat.categories, dtype=object)
+    frames = []
+    for check in HARD_CHECKS + SOFT_CHECKS:
+        idx = np.flatnonzero(masks[check])
+        if check == "pct_change_mismatch" and ex_dates:
+            idx = np.array([i for i in idx if (symbol_names[code[i]], raw_dates[i]) not in ex_dates], dtype=int)
+        if len(idx) == 0:
+            continue
+        frames.append(pd.DataFrame({
+            "Symbol": symbol_names[code[idx]],
+            "Sector": sector_names[sector_code[idx]],
+            "Date": raw_dates[idx],
+            "Check": check,
+            "Severity": "hard" if check in HARD_CHECKS else "soft",
+        }))
+    if not frames:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    violations = pd.concat(frames, ignore_index=True).drop_duplicates()
+    return violations.sort_values(["Symbol", "Date", "Check"]).reset_index(drop=True)
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Return the set of accepted (Symbol, Date, Check) hard violations"""
+    if not os.path.exists(path):
+        return set()
+    baseline = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return set(zip(baseline["Symbol"], baseline["Date"], baseline["Check"]))
+
+
+def new_hard_failures(violations, baseline, symbols=None):
+    """Return hard violations not in the baseline, optionally limited to symbols"""
+    hard = violations[violations["Severity"] == "hard"]
+    if symbols is not None:
+        hard = hard[hard["Symbol"].astype(str).isin(symbols)]
+    keys = zip(hard["Symbol"].astype(str), hard["Date"], hard["Check"])
+    return hard[[key not in baseline for key in keys]]
+
+
+def validate(symbols=None, base_folder=BASE_FOLDER, report_path=REPORT_PATH):
+    """
+    Validate the full dataset and write the report.
+
+    Returns (violations, blocking) where blocking holds the hard failures that
+    are not in the baseline (limited to symbols when given).
+    """
+    df = load_price_dataset(base_folder)
+    violations = run_checks(df, _adjustment_ex_dates())
+    with nepse_staging.staged(report_path) as tmp_path:
+        violations.to_csv(tmp_path, index=False, encoding="utf-8")
+    blocking = new_hard_failures(violations, load_baseline(), symbols)
+    return violations, blocking
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the Nepse_Data price history")
+    parser.add_argument("--symbols", nargs="*", help="Only block on hard failures for these symbols")
+    parser.add_argument("--write-baseline", action="store_true", help="Accept all current hard failures")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    violations, blocking = validate(args.symbols)
+    elapsed = time.perf_counter() - start
+    nepse_staging.commit()
+
+    print(f"🔎 Validated dataset in {elapsed:.2f}s, report written to {REPORT_PATH}")
+    for check in HARD_CHECKS + SOFT_CHECKS:
+        count = int((violations["Check"] == check).sum())
+        if count:
+            print(f"  - {check}: {count}")
+
+    if args.write_baseline:
+        hard = violations[violations["Severity"] == "hard"]
+        with nepse_staging.staged(BASELINE_PATH) as tmp_path:
+            hard[["Symbol", "Date", "Check"]].to_csv(tmp_path, index=False, encoding="utf-8")
+        nepse_staging.commit()
+        print(f"✅ Baseline written with {len(hard)} accepted hard failure(s)")
+        return 0
+
+    if len(blocking):
+        print(f"❌ {len(blocking)} new hard failure(s):")
+        print(blocking.head(20).to_string(index=False))
+        return 1
+    print("✅ No new hard failures")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
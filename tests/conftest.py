@@ -0,0 +1,48 @@
+"""
+Shared fixtures: every test runs in a scratch repo folder with its own staging run.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_FOLDER = os.path.join(REPO_ROOT, "benchmarks")
+FIXTURE_FOLDER = os.path.join(BENCHMARK_FOLDER, "fixtures")
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCHMARK_FOLDER)
+
+import nepse_staging  # noqa: E402
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Chdir into an empty scratch repo folder; staged writes go to its .staging"""
+    monkeypatch.chdir(tmp_path)
+    nepse_staging.begin("tests", str(tmp_path / ".staging"))
+    yield tmp_path
+    nepse_staging._finish()
+
+
+@pytest.fixture
+def nabil_csv(workspace):
+    """Copy the NABIL fixture history into the workspace; returns its repo-relative path"""
+    path = os.path.join("Nepse_Data", "Commercial_Banks", "NABIL.csv")
+    os.makedirs(os.path.dirname(path))
+    shutil.copy(os.path.join(FIXTURE_FOLDER, "price_history", "NABIL.csv"), path)
+    return path
+
+
+@pytest.fixture
+def mock_site(workspace, monkeypatch):
+    """Serve the recorded pages (benchmarks/mock_server.py); returns its base URL"""
+    import mock_server
+    import nepse_http
+
+    monkeypatch.setattr(nepse_http, "CACHE_FOLDER", str(workspace / ".http_cache"))
+    monkeypatch.setattr(nepse_http, "_index", None)
+    server, base_url = mock_server.start_server()
+    yield base_url
+    server.shutdown()
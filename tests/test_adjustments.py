@@ -0,0 +1,23 @@
+import os
+
+import nepse_adjustments
+import nepse_shards
+import nepse_staging
+
+
+def test_refresh_reads_a_split_symbol(nabil_csv, monkeypatch):
+    flat_cache = {}
+    assert nepse_adjustments.refresh(["NABIL"], cache=flat_cache) == ["NABIL"]
+
+    nepse_shards.split(nabil_csv)
+    nepse_staging.commit()
+    assert not os.path.exists(nabil_csv)
+
+    sharded_cache = {}
+    assert nepse_adjustments.refresh(["NABIL"], cache=sharded_cache) == ["NABIL"]
+    assert sharded_cache["NABIL"]["events"] == flat_cache["NABIL"]["events"]
+    # Unchanged shards are not recomputed
+    assert nepse_adjustments.refresh(["NABIL"], cache=sharded_cache) == []
+
+    monkeypatch.setattr(nepse_adjustments, "_cache", sharded_cache)
+    assert len(nepse_adjustments.adjusted_history("NABIL")) > 0
@@ -0,0 +1,40 @@
+import csv
+import os
+
+import pytest
+
+import nepse_holidays
+from conftest import FIXTURE_FOLDER
+
+
+def recorded_holidays(year):
+    with open(os.path.join(FIXTURE_FOLDER, "holidays.csv"), newline="", encoding="utf-8") as file:
+        rows = [row for row in csv.DictReader(file) if row["Date"].startswith(year)]
+    return [{"Holiday Date": row["Date"], "Holiday Description": row["HolidayName"]} for row in sorted(rows, key=lambda row: row["Date"])]
+
+
+def test_parse_holidays_uses_the_holiday_date_field():
+    payload = [{"id": 1, "createdDate": "2025-12-01T08:00:00", "holidayDate": "2026-01-11", "description": "Prithvi Jayanti",
+                "updatedDate": "2025-12-02T08:00:00"}]
+    assert nepse_holidays.parse_holidays(payload) == [{"Holiday Date": "2026-01-11", "Holiday Description": "Prithvi Jayanti"}]
+
+
+def test_parse_holidays_rejects_rows_without_a_date_field():
+    with pytest.raises(ValueError):
+        nepse_holidays.parse_holidays({"data": [{"createdDate": "2025-12-01", "description": "Prithvi Jayanti"}]})
+
+
+def test_parse_holidays_array_rows():
+    assert nepse_holidays.parse_holidays([[1, "2026-01-11", "Prithvi <b>Jayanti</b>"]]) == [
+        {"Holiday Date": "2026-01-11", "Holiday Description": "Prithvi Jayanti"}]
+
+
+def test_fetch_years_parses_the_recorded_api(mock_site):
+    holidays = nepse_holidays.fetch_years(["2026", "2025"], url=f"{mock_site}/api/nots/holiday/list")
+    for year in ("2026", "2025"):
+        assert holidays[year] and holidays[year] == recorded_holidays(year)
+
+
+def test_fetch_year_follows_every_page(mock_site):
+    # 45 recorded holidays in 2025: three pages of the paged listing
+    assert nepse_holidays.fetch_year("2025", url=f"{mock_site}/holiday-data") == recorded_holidays("2025")
@@ -0,0 +1,37 @@
+import pytest
+import requests
+
+import nepse_http
+
+
+def test_fresh_then_revalidated(mock_site):
+    url = f"{mock_site}/holiday-listing"
+    first = nepse_http.get(url, ttl=60)
+    assert first.source == "network" and first.headers["ETag"]
+
+    assert nepse_http.get(url, ttl=60).source == "cache"
+
+    # Past its TTL the copy is revalidated with If-None-Match; the server answers 304
+    stored_at = nepse_http._index[nepse_http.cache_key(url)]["stored_at"]
+    again = nepse_http.get(url, ttl=0)
+    assert again.source == "revalidated"
+    assert again.status_code == 200 and again.content == first.content
+    assert nepse_http._index[nepse_http.cache_key(url)]["stored_at"] > stored_at
+
+
+def test_stale_copy_when_the_server_is_unreachable(mock_site, monkeypatch):
+    url = f"{mock_site}/holiday-listing"
+    first = nepse_http.get(url)
+
+    class Unreachable:
+        def get(self, *args, **kwargs):
+            raise requests.ConnectionError("connection refused")
+
+    monkeypatch.setattr(nepse_http, "_session", Unreachable)
+    stale = nepse_http.get(url, ttl=0)
+    assert stale.source == "stale" and stale.from_cache
+    assert stale.content == first.content
+
+    # Nothing cached: the error is raised
+    with pytest.raises(requests.ConnectionError):
+        nepse_http.get(f"{mock_site}/company-list", ttl=0)
@@ -0,0 +1,87 @@
+import csv
+import os
+from datetime import datetime, timezone
+
+import requests
+
+import nepse_http
+import nepse_live
+import nepse_registry
+import nepse_snapshot
+from conftest import FIXTURE_FOLDER
+
+
+def test_snapshot_time_is_nepal_time():
+    # 11:00 in Kathmandu (UTC+05:45) is 05:15 UTC, whatever the runner's zone
+    expected = datetime(2026, 5, 5, 5, 15, tzinfo=timezone.utc).timestamp()
+    assert nepse_live.snapshot_time("2026-05-05 11:00:00") == expected
+    assert nepse_live.snapshot_time("2026-05-05 11:00") == expected
+
+
+def test_poll_retries_a_failed_page_during_the_session(mock_site, monkeypatch):
+    real_get = nepse_http.get
+    calls = []
+
+    def flaky_get(url, **kwargs):
+        calls.append(url)
+        if len(calls) == 3:  # After the market opened
+            response = requests.Response()
+            response.status_code = 503
+            response.url = url
+            return response
+        return real_get(url, **kwargs)
+
+    monkeypatch.setattr(nepse_http, "get", flaky_get)
+    watch = nepse_live.MarketWatch()
+    day = nepse_live.poll(watch, f"{mock_site}/live-trading", interval=0)
+
+    with open(os.path.join(FIXTURE_FOLDER, "live_session.csv"), newline="") as file:
+        session = list(csv.DictReader(file))
+    snapshots = sorted({row["Time"] for row in session})
+    last = {row["Symbol"]: row for row in session if row["Time"] == snapshots[-1]}
+    assert day == snapshots[-1][:10]
+    assert len(calls) == len(snapshots) + 1  # Every snapshot was read despite the 503
+    bars = watch.bars(day).set_index("Symbol")
+    assert bars.loc["NABIL", "Qty"] == f"{float(last['NABIL']['Volume']):,.2f}"
+
+
+def expected_bar(session, symbol):
+    """The day's bar of symbol rebuilt tick by tick from the recorded session"""
+    ticks = [row for row in session if row["Symbol"] == symbol and float(row["Volume"]) > 0]
+    ltp = [float(row["LTP"]) for row in ticks]
+    volume = [float(row["Volume"]) for row in ticks]
+    first_open = float(ticks[0]["Open"])
+    turnover = sum(price * max(vol - prev, 0) for price, vol, prev in zip(ltp, volume, [0.0] + volume[:-1]))
+    return {
+        "Open": f"{first_open if first_open > 0 else ltp[0]:,.2f}",
+        "High": f"{max(max(float(row['High']), price) for row, price in zip(ticks, ltp)):,.2f}",
+        "Low": f"{min(min(float(row['Low']), price) for row, price in zip(ticks, ltp)):,.2f}",
+        "Ltp": f"{ltp[-1]:,.2f}",
+        "% Change": f"{(ltp[-1] / float(ticks[-1]['PrevClose']) - 1) * 100:.2f}",
+        "Qty": f"{max(volume):,.2f}",
+        "Turnover": f"{turnover:,.2f}",
+    }
+
+
+def test_replayed_session_bars_are_flushed(mock_site, nabil_csv, monkeypatch):
+    monkeypatch.setattr(nepse_registry, "_registry", {"NABIL": nepse_registry.make_record("NABIL", "Commercial_Banks")})
+    monkeypatch.setattr(nepse_snapshot, "_snapshot", {})
+    monkeypatch.setattr(nepse_live, "_provisional", {})
+    with open(os.path.join(FIXTURE_FOLDER, "live_session.csv"), newline="") as file:
+        session = sorted(csv.DictReader(file), key=lambda row: row["Time"])
+
+    watch = nepse_live.MarketWatch()
+    day = nepse_live.poll(watch, f"{mock_site}/live-trading", interval=0)
+    bars = watch.bars(day).set_index("Symbol")
+    assert sorted(bars.index) == sorted({row["Symbol"] for row in session if float(row["Volume"]) > 0})
+    for symbol in bars.index:
+        assert bars.loc[symbol, list(expected_bar(session, symbol))].to_dict() == expected_bar(session, symbol)
+
+    # Only registered symbols are written, as the newest row of their history
+    assert nepse_live.flush(watch, day) == ["NABIL"]
+    with open(nabil_csv, newline="") as file:
+        top = next(csv.DictReader(file))
+    assert top["Date"] == day
+    assert {col: top[col] for col in expected_bar(session, "NABIL")} == expected_bar(session, "NABIL")
+    assert nepse_live.is_provisional("NABIL", day)
+    assert nepse_registry.get("NABIL")["LastDate"] == day
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+import nepse_pipeline
+
+
+def make_stages(written, parse=lambda item: item * 10):
+    return [
+        nepse_pipeline.Stage("fetch", lambda item: item if item % 3 else None, workers=2),
+        nepse_pipeline.Stage("parse", parse),
+        nepse_pipeline.Stage("write", written.append),
+    ]
+
+
+@pytest.mark.parametrize("threaded", [True, False])
+def test_every_item_reaches_the_last_stage(threaded):
+    written = []
+    pipeline = nepse_pipeline.Pipeline(make_stages(written), queue_size=2)
+    stages = pipeline.run(range(1, 21), threaded=threaded)
+
+    kept = [item * 10 for item in range(1, 21) if item % 3]
+    assert sorted(written) == kept
+    assert [stage.items for stage in stages] == [20, len(kept), len(kept)]
+    assert "Overlap" in pipeline.summary()
+
+
+@pytest.mark.parametrize("threaded", [True, False])
+def test_a_stage_error_is_raised_in_the_caller(threaded):
+    def parse(item):
+        if item == 7:
+            raise ValueError("bad page")
+        return item
+
+    written = []
+    pipeline = nepse_pipeline.Pipeline(make_stages(written, parse), queue_size=1)
+    with pytest.raises(ValueError, match="bad page"):
+        pipeline.run(range(1, 1000), threaded=threaded)
+    assert len(written) < 1000
+
+
+def test_a_slow_stage_blocks_the_ones_before_it():
+    release = threading.Event()
+    fetched, written = [], []
+
+    def write(item):
+        release.wait(5)
+        written.append(item)
+
+    pipeline = nepse_pipeline.Pipeline([
+        nepse_pipeline.Stage("fetch", lambda item: fetched.append(item) or item),
+        nepse_pipeline.Stage("write", write),
+    ], queue_size=1)
+    runner = threading.Thread(target=pipeline.run, args=(range(50),))
+    runner.start()
+    time.sleep(0.5)
+    # One item in the writer, one queued for it and one waiting for room
+    assert len(fetched) <= 3
+    release.set()
+    runner.join(10)
+
+    assert written == list(range(50))
+    assert pipeline.stages[0].blocked > 0.3
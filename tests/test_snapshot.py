@@ -0,0 +1,16 @@
+import nepse_snapshot
+
+
+def test_bad_newest_date_keeps_the_previous_row(nabil_csv, monkeypatch):
+    monkeypatch.setattr(nepse_snapshot, "_snapshot", {})
+    row = nepse_snapshot.update("NABIL", "Commercial_Banks", nabil_csv)
+    assert row["LastDate"] == "2026-05-04"
+
+    with open(nabil_csv, "r", encoding="utf-8") as file:
+        lines = file.readlines()
+    lines[1] = lines[1].replace("2026-05-04", "05/04/2026")
+    with open(nabil_csv, "w", encoding="utf-8") as file:
+        file.writelines(lines)
+
+    assert nepse_snapshot.update("NABIL", "Commercial_Banks", nabil_csv) is None
+    assert nepse_snapshot.load_snapshot()["NABIL"] == row
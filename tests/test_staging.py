@@ -0,0 +1,48 @@
+import os
+import stat
+
+import pytest
+
+import nepse_merge
+import nepse_staging
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX file modes")
+def test_commit_keeps_the_target_mode(workspace):
+    path = "listed_company.csv"
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("old\n")
+    os.chmod(path, 0o755)
+
+    with nepse_staging.open_staged(path, "w", encoding="utf-8") as file:
+        file.write("new\n")
+    assert nepse_staging.commit() == 1
+
+    with open(path, "r", encoding="utf-8") as file:
+        assert file.read() == "new\n"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o755
+
+
+def test_commit_of_a_new_file(workspace):
+    with nepse_staging.open_staged("new.csv", "w", encoding="utf-8") as file:
+        file.write("row\n")
+    nepse_staging.commit()
+    assert os.path.exists("new.csv")
+
+
+def test_log_appends_are_staged_until_commit(workspace):
+    path = "merge_conflicts.csv"
+    nepse_merge.log_conflicts([["t", "NABIL", "2024-01-01", "Close", "1", "2"]], path)
+    nepse_merge.log_conflicts([["t", "NABIL", "2024-01-02", "Close", "3", "4"]], path)
+    assert not os.path.exists(path)
+
+    nepse_staging.commit()
+    with open(path, "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert lines[0].startswith("LoggedAt")
+    assert len(lines) == 3
+
+    nepse_merge.log_conflicts([["t", "NABIL", "2024-01-03", "Close", "5", "6"]], path)
+    nepse_staging.rollback()
+    with open(path, "r", encoding="utf-8") as file:
+        assert len(file.read().splitlines()) == 3
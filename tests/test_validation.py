@@ -0,0 +1,27 @@
+import nepse_shards
+import nepse_staging
+from nepse_common import load_price_dataset
+from nepse_validation import run_checks
+
+
+def unsorted_dates(violations):
+    return list(violations.loc[violations["Check"] == "unsorted", "Date"])
+
+
+def test_unsorted_follows_each_file_order(nabil_csv):
+    assert unsorted_dates(run_checks(load_price_dataset("Nepse_Data"))) == []
+
+    nepse_shards.split(nabil_csv)
+    nepse_staging.commit()
+    df = load_price_dataset("Nepse_Data")
+    assert len(df.attrs["file_rows"]) > 1
+    assert unsorted_dates(run_checks(df)) == []
+
+    # A row moved to the top of its (oldest-first) shard is flagged
+    path = nepse_shards.history_files(nabil_csv)[-1]
+    with open(path, "r", encoding="utf-8") as file:
+        lines = file.readlines()
+    lines.insert(1, lines.pop())
+    with open(path, "w", encoding="utf-8") as file:
+        file.writelines(lines)
+    assert unsorted_dates(run_checks(load_price_dataset("Nepse_Data"))) == [lines[2].split(",")[1]]